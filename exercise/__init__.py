@@ -0,0 +1,4 @@
+# Loads the Celery app when Django starts, so tasks queued by the app use its settings.
+from .celery import app as celery_app
+
+__all__ = ("celery_app",)
@@ -13,6 +13,20 @@ app.conf.beat_schedule = {
         'task': 'game_stats.tasks.simulate_stats_task',
         'schedule': crontab(minute='*/5'),
     },
+    'expire-leaderboard-buckets': {
+        'task': 'game_stats.tasks.expire_leaderboard_buckets_task',
+        'schedule': crontab(minute=5),
+    },
+    # Queued stats are flushed shortly after being queued: this only catches flushes that were lost.
+    'flush-stat-queue': {
+        'task': 'game_stats.tasks.flush_stat_queue_task',
+        'schedule': crontab(),
+    },
+    # Score analytics are refreshed when stats have been written, off the request path.
+    'refresh-analytics': {
+        'task': 'game_stats.tasks.refresh_analytics_task',
+        'schedule': crontab(),
+    },
 }
 
 
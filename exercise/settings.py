@@ -6,6 +6,7 @@ from pathlib import Path
 from datetime import timedelta
 from . import secrets
 import os
+import sys
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "game_stats.middleware.RequestMetricsMiddleware",  # first, so that it measures the other middleware too
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -48,6 +50,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "game_stats.middleware.ReplicaRoutingMiddleware",
 ]
 
 ROOT_URLCONF = "exercise.urls"
@@ -88,6 +91,13 @@ DATABASES = {
     },
 }
 
+# Read replicas of "default" (aliases of DATABASES). Safe requests to game_stats views read from one of them, and
+# clients that have written read from "default" for the next REPLICA_PIN_SECONDS, the time replicas may lag behind it
+# (see game_stats.routers).
+DATABASE_ROUTERS = ["game_stats.routers.ReplicaRouter"]
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -134,6 +144,32 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 CELERY_BROKER_URL = "redis://127.0.0.1:6379/0"
 CELERY_RESULT_BACKEND = "redis://127.0.0.1:6379/0"
 CELERYD_REDIRECT_STDOUTS_LEVEL = DEBUG  # don't run with debug level in production!
+CELERY_TASK_ALWAYS_EAGER = "test" in sys.argv  # tests run tasks right away, in the test process
+
+# Cache settings (the Redis server used by Celery, on a separate database). Tests use a local memory cache instead.
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/1",
+    },
+}
+
+if "test" in sys.argv:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+    # A second test database, which the replica routing tests use as a replica (one that never catches up).
+    DATABASES["replica"] = {**DATABASES["default"], "TEST": {"NAME": f"test_{DATABASES['default']['NAME']}_replica"}}
+
+# Request metrics (see game_stats.metrics), exported in the Prometheus format at /metrics/. With Server-Timing, each
+# response also carries its own timings: keep it off in production, where it would reveal them to every client.
+REQUEST_METRICS_SERVER_TIMING = DEBUG
+# Seconds between the flushes of each process' metrics to the cache, by a background thread. Tests flush explicitly.
+REQUEST_METRICS_FLUSH_INTERVAL = None if "test" in sys.argv else 10
 
 # Swagger documentation (drf_spectacular package) settings:
 REST_FRAMEWORK = {
@@ -144,6 +180,18 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # JSON is rendered and parsed with orjson. MessagePack is available to clients asking for "application/msgpack".
+    "DEFAULT_RENDERER_CLASSES": [
+        "game_stats.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "game_stats.renderers.MessagePackRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "game_stats.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        "game_stats.renderers.MessagePackParser",
+    ],
 }
 
 SPECTACULAR_SETTINGS = {
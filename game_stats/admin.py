@@ -1,7 +1,10 @@
 from django.contrib import admin
-from game_stats.models import Player, Stat, Game
+from game_stats.models import Player, Stat, Game, LeaderboardEntry, PlayerSummary, ScoreCount, ScoreTreeNode
 
 admin.site.register(Player)
 admin.site.register(Stat)
 admin.site.register(Game)
-
+admin.site.register(LeaderboardEntry)
+admin.site.register(PlayerSummary)
+admin.site.register(ScoreCount)
+admin.site.register(ScoreTreeNode)
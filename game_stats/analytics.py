@@ -0,0 +1,236 @@
+"""
+Score analytics: distributions, percentiles and per-player moments of the scores of all time, or of the current day,
+week or month (the leaderboard periods, see `leaderboard`).
+
+The scores and players of a window's scored stats are read `CHUNK_SIZE` rows at a time into NumPy arrays, and
+everything is then computed on whole arrays into the window's "summary": the number, moments, percentiles and histogram
+of the scores, and the cumulative counts of its distinct scores and of the distinct means of its players' scores, which
+give percentile ranks by binary search. Summaries hold a few values per distinct score and mean rather than per stat.
+
+Summaries are cached, and computed off the request path by a Celery task (see `refresh`), which runs every minute and
+whenever a request finds a summary older than MAX_STALENESS seconds that doesn't include the last written stats. The
+stale summary is served meanwhile. Only windows without any summary yet (e.g. a new day) are computed by the request
+asking for them.
+"""
+import time
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, StdDev
+from .models import Stat
+from . import caching, leaderboard
+
+Period = leaderboard.Period
+
+# Number of stats read from the database at once.
+CHUNK_SIZE = 100000
+
+# Percentiles of the scores included in distributions.
+PERCENTILES = [1, 5, 10, 25, 50, 75, 90, 95, 99]
+
+HISTOGRAM_BINS = 10
+MAX_HISTOGRAM_BINS = 100
+
+# Seconds cached values are kept.
+CACHE_TIMEOUT = 60 * 60
+
+# Seconds a summary is served without being refreshed after stats are written.
+MAX_STALENESS = 60
+
+# Seconds after which a scheduled refresh that didn't run (e.g. its worker crashed) can be scheduled again.
+REFRESH_LOCK_TIMEOUT = 10 * 60
+
+VERSION_NAME = "collection:stat"
+
+# Fields of the summaries included in distributions.
+DISTRIBUTION_FIELDS = ["count", "min", "max", "mean", "std", "percentiles"]
+
+
+def get_stats(window=Period.ALL_TIME):
+    """
+    Returns the scored stats of a window's current bucket.
+    """
+    stats = Stat.objects.exclude(score=None)
+    if window != Period.ALL_TIME:
+        start, end = leaderboard.get_bucket_range(window, leaderboard.get_bucket(window))
+        stats = stats.filter(creation_date__gte=start, creation_date__lt=end)
+    return stats
+
+
+def load(stats, chunk_size=CHUNK_SIZE):
+    """
+    Reads the scores and player ids of the given stats, `chunk_size` at a time, seeking past the last id read.
+
+    Returns:
+    tuple: Arrays of scores and of player ids, in stat id order.
+    """
+    rows = stats.order_by("id").values_list("id", "score", "player_id")
+    chunks = []
+    last_id = 0
+    while chunk := list(rows.filter(id__gt=last_id)[:chunk_size]):
+        chunks.append(np.array(chunk, dtype=np.int64))
+        last_id = chunk[-1][0]
+    data = np.concatenate(chunks) if chunks else np.empty((0, 3), dtype=np.int64)
+    return data[:, 1], data[:, 2]
+
+
+def _cumulate(counts):
+    return np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+def get_histogram(values, cumulative_counts, bins):
+    """
+    Returns the histogram, with the given number of equal width bins, of distinct values and their cumulative counts.
+    """
+    counts, edges = np.histogram(values, bins=bins, weights=np.diff(cumulative_counts))
+    return {"edges": [round(float(edge), 2) for edge in edges], "counts": counts.astype(np.int64).tolist()}
+
+
+def analyze(scores, player_ids):
+    """
+    Computes the summary of the given scores: their number, minimum, maximum, mean, standard deviation, percentiles
+    (see PERCENTILES) and histogram (with HISTOGRAM_BINS bins), their distinct values ("scores") with the number of
+    scores up to each of them ("score_counts", starting with 0), and likewise for the means of each player's scores,
+    rounded to 2 decimals ("means" and "mean_counts").
+    """
+    _, indices, counts = np.unique(player_ids, return_inverse=True, return_counts=True)
+    means = np.round(np.bincount(indices, weights=scores, minlength=len(counts)) / np.maximum(counts, 1), 2)
+    values, value_counts = np.unique(scores, return_counts=True)
+    mean_values, mean_counts = np.unique(means, return_counts=True)
+    score_counts = _cumulate(value_counts)
+    return {
+        "count": len(scores),
+        "min": int(values[0]) if len(values) else None,
+        "max": int(values[-1]) if len(values) else None,
+        "mean": round(float(scores.mean()), 2) if len(scores) else None,
+        "std": round(float(scores.std()), 2) if len(scores) else None,
+        "percentiles": {
+            str(percentile): float(value)
+            for percentile, value in zip(PERCENTILES, np.percentile(scores, PERCENTILES) if len(scores) else [])
+        },
+        "histogram": get_histogram(values, score_counts, HISTOGRAM_BINS),
+        "scores": values,
+        "score_counts": score_counts,
+        "means": mean_values,
+        "mean_counts": _cumulate(mean_counts),
+    }
+
+
+def percentile_rank(values, cumulative_counts, value):
+    """
+    Returns the percentage of the counted values below the given one, counting half of the values equal to it, or None
+    if there are no values.
+
+    Parameters:
+    values (ndarray): Distinct values, sorted.
+    cumulative_counts (ndarray): Number of values up to each of `values`, starting with 0 (see `analyze`).
+    """
+    if not cumulative_counts[-1]:
+        return None
+    below = cumulative_counts[np.searchsorted(values, value, side="left")]
+    at_or_below = cumulative_counts[np.searchsorted(values, value, side="right")]
+    return round(float(50 * (below + at_or_below) / cumulative_counts[-1]), 2)
+
+
+def _get_key(window, *parts):
+    return ":".join(map(str, ["analytics", window, leaderboard.get_bucket(window), *parts]))
+
+
+def refresh(window=Period.ALL_TIME):
+    """
+    Computes the summary of a window's scores from the stats table, and caches it. Summaries read from a replica that
+    may be behind (see `caching.is_settled`) are cached without a version, so they are refreshed like outdated ones.
+    """
+    version = caching.get_version(VERSION_NAME) if caching.is_settled([VERSION_NAME]) else None
+    summary = {"version": version, "computed_at": time.time(), **analyze(*load(get_stats(window)))}
+    cache.set(_get_key(window), summary, CACHE_TIMEOUT)
+    cache.delete(_get_key(window, "refresh-scheduled"))
+    return summary
+
+
+def refresh_outdated():
+    """
+    Refreshes the summaries of the windows that have none, or that don't include the last written stats.
+
+    Returns:
+    list: The refreshed windows.
+    """
+    version = caching.get_version(VERSION_NAME)
+    windows = []
+    for window in Period:
+        summary = cache.get(_get_key(window))
+        if summary is None or summary["version"] != version:
+            refresh(window)
+            windows.append(window)
+    return windows
+
+
+def schedule_refresh(window):
+    """
+    Schedules a refresh of a window's summary, unless one is already scheduled.
+    """
+    if cache.add(_get_key(window, "refresh-scheduled"), True, timeout=REFRESH_LOCK_TIMEOUT):
+        from .tasks import refresh_analytics_task
+        refresh_analytics_task.delay(window)
+
+
+def get_summary(window=Period.ALL_TIME):
+    """
+    Returns the cached summary (see `analyze`) of a window's scores, scheduling its refresh if it is out of date. It is
+    only computed right away if there is none.
+    """
+    summary = cache.get(_get_key(window))
+    if summary is None:
+        return refresh(window)
+    outdated = summary["version"] != caching.get_version(VERSION_NAME)
+    if outdated and time.time() - summary["computed_at"] >= MAX_STALENESS:
+        schedule_refresh(window)
+    return summary
+
+
+def get_distribution(window=Period.ALL_TIME, bins=HISTOGRAM_BINS, score=None):
+    """
+    Returns the number, minimum, maximum, mean, standard deviation and percentiles (see PERCENTILES) of a window's
+    scores, and their histogram with the given number of equal width bins. When a score is given, its percentile rank
+    (see `percentile_rank`) among the window's scores is included.
+    """
+    summary = get_summary(window)
+    distribution = {"window": window, **{field: summary[field] for field in DISTRIBUTION_FIELDS}}
+    distribution["histogram"] = summary["histogram"] if bins == HISTOGRAM_BINS else \
+        get_histogram(summary["scores"], summary["score_counts"], bins)
+    if score is not None:
+        distribution.update(score=score, percentile=percentile_rank(summary["scores"], summary["score_counts"], score))
+    return distribution
+
+
+def get_player_percentiles(player_id, window=Period.ALL_TIME):
+    """
+    Returns the number, mean, standard deviation and best of a player's scores in a window, along with the percentile
+    ranks of its best score among the window's scores, and of its mean among the means of the window's players. All
+    but the number are None for players without scores in the window.
+
+    The player's figures are aggregated from its own stats (through the player index), and cached along with the
+    summary they are ranked against.
+    """
+    summary = get_summary(window)
+    key = _get_key(window, "player", player_id)
+    cached = cache.get(key)
+    if cached is not None and cached["computed_at"] == summary["computed_at"]:
+        return cached["value"]
+
+    moments = get_stats(window).filter(player_id=player_id).aggregate(
+        count=Count("id"), mean=Avg("score"), std=StdDev("score"), best_score=Max("score"))
+    percentiles = {"player": player_id, "window": window, "count": moments["count"], "mean": None, "std": None,
+                   "best_score": None, "best_score_percentile": None, "mean_percentile": None}
+    if moments["count"]:
+        mean = round(float(moments["mean"]), 2)
+        percentiles.update({
+            "mean": mean,
+            "std": round(float(moments["std"]), 2),
+            "best_score": moments["best_score"],
+            "best_score_percentile": percentile_rank(summary["scores"], summary["score_counts"],
+                                                     moments["best_score"]),
+            "mean_percentile": percentile_rank(summary["means"], summary["mean_counts"], mean),
+        })
+    if caching.is_settled([VERSION_NAME]):
+        cache.set(key, {"computed_at": summary["computed_at"], "value": percentiles}, CACHE_TIMEOUT)
+    return percentiles
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GameStatsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "game_stats"
+
+    def ready(self):
+        # Connects the signal handlers that keep derived tables (e.g. the leaderboard) up to date.
+        from . import signals  # noqa: F401
@@ -0,0 +1,16 @@
+"""
+Bulk write helpers working on every supported database (MySQL in production, SQLite in tests).
+"""
+from django.db import connections, router
+
+
+def upsert(model, objs, unique_fields, update_fields):
+    """
+    Inserts the given instances, updating `update_fields` of the rows that already exist. `unique_fields` names the
+    unique fields identifying existing rows; databases that can't target a constraint (MySQL, whose ON DUPLICATE KEY
+    UPDATE applies to every unique key) aren't given them, as Django refuses them there.
+    """
+    features = connections[router.db_for_write(model)].features
+    unique_fields = unique_fields if features.supports_update_conflicts_with_target else None
+    return model.objects.bulk_create(objs, update_conflicts=True, unique_fields=unique_fields,
+                                     update_fields=update_fields)
@@ -0,0 +1,85 @@
+"""
+Helpers for caching rendered responses in the Django cache (Redis in production).
+
+Cached entries are keyed by a version number, which writers bump whenever the cached data changes: entries of older
+versions are never read again and simply expire. Versions start from the current time, so a version lost along with
+the rest of the cache (e.g. after a Redis restart) is never reused. Versions also make the ETags of conditional
+requests. Hits and misses are counted per cache name.
+
+Requests reading from a lagging replica (see `routers`) may not see the last writes yet, even though those have bumped
+the versions: what they read is only cached (or given an ETag) once the data is settled, see `is_settled`.
+"""
+import time
+from django.core.cache import cache
+from django.db import transaction
+from . import routers
+
+
+def get_versions(names):
+    """
+    Returns the current versions of the named data, in the order of `names`, in a single cache read.
+    """
+    keys = [f"version:{name}" for name in names]
+    values = cache.get_many(keys)
+    if len(values) < len(keys):
+        for key in keys:
+            cache.add(key, time.time_ns(), timeout=None)
+        values = cache.get_many(keys)
+    return [values[key] for key in keys]
+
+
+def get_version(name):
+    """
+    Returns the current version of the named data.
+    """
+    return get_versions([name])[0]
+
+
+def _bump(name):
+    try:
+        cache.incr(f"version:{name}")
+    except ValueError:
+        # No version yet: any new one is unused.
+        get_version(name)
+    cache.set(f"bumped-at:{name}", time.time(), timeout=routers.get_pin_seconds())
+
+
+def is_settled(names):
+    """
+    Tells whether what the request being handled reads can be cached under the current versions of the named data: it
+    can, unless it reads from a replica and any of the data was written less than REPLICA_PIN_SECONDS ago (the time
+    replicas may take to catch up with the writes).
+    """
+    if routers.get_read_database() is None:
+        return True
+    bumped_at = cache.get_many([f"bumped-at:{name}" for name in names])
+    return all(time.time() - moment >= routers.get_pin_seconds() for moment in bumped_at.values())
+
+
+def bump_version(name):
+    """
+    Invalidates the cached entries of the named data. The version is bumped right away, and again when the current
+    transaction commits, so entries cached by concurrent requests that read the data before the commit are dropped too.
+    """
+    _bump(name)
+    transaction.on_commit(lambda: _bump(name))
+
+
+def record(name, hit):
+    """
+    Counts a hit (or a miss) on the named cache.
+    """
+    key = f"cache-stats:{name}:{'hits' if hit else 'misses'}"
+    if not cache.add(key, 1, timeout=None):
+        cache.incr(key)
+
+
+def get_counters(name):
+    """
+    Returns the number of hits and misses counted on the named cache.
+    """
+    counters = cache.get_many([f"cache-stats:{name}:hits", f"cache-stats:{name}:misses"])
+    return {
+        "hits": counters.get(f"cache-stats:{name}:hits", 0),
+        "misses": counters.get(f"cache-stats:{name}:misses", 0),
+    }
@@ -0,0 +1,148 @@
+"""
+Export of the players, games and stats tables as columnar files, Parquet or Arrow IPC, for loading them into analytics
+tools (pandas, Polars, DuckDB, Spark...) in one go.
+
+Rows are read `chunk_size` at a time, seeking past the last id read, and each chunk is written as its own record batch
+(a row group, in Parquet files), so memory use doesn't depend on the size of the table. Ids are written as 64-bit
+integers, scores as 32-bit unsigned integers and dates as UTC timestamps (in microseconds), so files are compact and
+need no parsing when loaded.
+"""
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .models import Player, Stat, Game
+
+FORMATS = ["parquet", "arrow"]
+
+# Number of rows read from the database and written as a single record batch.
+CHUNK_SIZE = 50000
+
+STAT_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("player_id", pa.int64()),
+    ("game_id", pa.int64()),
+    ("score", pa.uint32()),
+    ("creation_date", pa.timestamp("us", tz="UTC")),
+])
+
+GAME_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("winner_id", pa.int64()),
+    ("player_ids", pa.list_(pa.int64())),
+])
+
+PLAYER_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("user_id", pa.int64()),
+    ("nickname", pa.string()),
+    ("profile_image", pa.string()),
+])
+
+# Model and schema of each exported table. The schema's fields are the model's columns, except for the games' players.
+TABLES = {
+    "players": (Player, PLAYER_SCHEMA),
+    "games": (Game, GAME_SCHEMA),
+    "stats": (Stat, STAT_SCHEMA),
+}
+
+
+def get_chunks(table, queryset=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields the rows of a table (or of the given queryset of its model), `chunk_size` at a time, in id order, as lists of
+    tuples with the fields of the table's schema.
+    """
+    model, schema = TABLES[table]
+    queryset = model.objects.all() if queryset is None else queryset
+    columns = [name for name in schema.names if name != "player_ids"]
+    rows = queryset.order_by("id").values_list(*columns)
+    last_id = 0
+    while chunk := list(rows.filter(id__gt=last_id)[:chunk_size]):
+        if table == "games":
+            # The players of the whole chunk of games are read at once, by range of game ids.
+            players = {row[0]: [] for row in chunk}
+            for game_id, player_id in Game.players.through.objects \
+                    .filter(game_id__gt=last_id, game_id__lte=chunk[-1][0]).order_by("game_id", "player_id") \
+                    .values_list("game_id", "player_id"):
+                if game_id in players:
+                    players[game_id].append(player_id)
+            chunk = [row + (players[row[0]],) for row in chunk]
+        last_id = chunk[-1][0]
+        yield chunk
+
+
+def get_batches(table, queryset=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields the rows of a table (or of the given queryset of its model) as Arrow record batches of up to `chunk_size`
+    rows.
+    """
+    schema = TABLES[table][1]
+    for chunk in get_chunks(table, queryset, chunk_size):
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(zip(*chunk), schema)], schema=schema)
+
+
+def _write_batches(table, sink, file_format, queryset, chunk_size):
+    """
+    Writes the record batches of a table to `sink`, yielding the number of rows of each batch once it's written. The
+    file is complete (its footer is written) once the generator is exhausted.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown format: {file_format}. Choose among: {', '.join(FORMATS)}.")
+    schema = TABLES[table][1]
+    writer = pq.ParquetWriter(sink, schema) if file_format == "parquet" else pa.ipc.new_file(sink, schema)
+    with writer:
+        for batch in get_batches(table, queryset, chunk_size):
+            writer.write_batch(batch)
+            yield batch.num_rows
+
+
+def write(table, sink, file_format="parquet", queryset=None, chunk_size=CHUNK_SIZE):
+    """
+    Writes a table (or the given queryset of its model) to `sink`, a path or a binary file, in the given format
+    ("parquet" or "arrow", for the Arrow IPC file format).
+
+    Returns:
+    int: The number of rows written.
+    """
+    return sum(_write_batches(table, sink, file_format, queryset, chunk_size))
+
+
+class _StreamSink:
+    """
+    A write-only binary file holding what was written to it until it is taken.
+    """
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream(table, file_format="parquet", queryset=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields a table (or the given queryset of its model) as a file in the given format, one record batch at a time, e.g.
+    for sending it over HTTP as it is read from the database.
+    """
+    sink = _StreamSink()
+    for _ in _write_batches(table, sink, file_format, queryset, chunk_size):
+        yield sink.take()
+    yield sink.take()
@@ -0,0 +1,163 @@
+"""
+Fast, offline generation of synthetic players, games and stats, written with batched inserts, for load testing
+and benchmarks. Nicknames and avatars are made up locally, so no network access is needed, and the same random seed
+always generates the same data (ids and creation dates are relative to the existing rows and the current time).
+"""
+import random
+from itertools import islice
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import Player, Stat, Game
+from . import caching, leaderboard, rollups
+
+ADJECTIVES = [
+    "angry", "brave", "calm", "clever", "crazy", "dark", "eager", "fast", "fierce", "golden", "happy", "jolly", "lazy",
+    "lucky", "mighty", "proud", "quiet", "rapid", "sneaky", "silent", "swift", "tiny", "wild", "wise",
+]
+
+NOUNS = [
+    "badger", "bear", "cat", "dragon", "eagle", "falcon", "fox", "ghost", "goblin", "hawk", "knight", "lion", "ninja",
+    "owl", "panda", "pirate", "rabbit", "raven", "shark", "tiger", "viking", "wizard", "wolf", "zombie",
+]
+
+MAX_PLAYERS_PER_GAME = 10
+
+
+def next_id(model):
+    """
+    Returns the first primary key after the highest one in use. Generated rows get explicit ids so they can be related
+    to each other without reading them back.
+    """
+    return (model.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+
+
+def insert_rows(model, fields, rows, batch_size):
+    """
+    Inserts the value tuples yielded by `rows` into the given fields of the model's table, in transactions of
+    `batch_size` rows. This skips the model instances and SQL compilation of bulk_create, which take most of the time
+    spent inserting millions of rows, and doesn't build the whole list of rows in memory.
+    """
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(quote_name(model._meta.get_field(field).column) for field in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    sql = f"INSERT INTO {quote_name(model._meta.db_table)} ({columns}) VALUES ({placeholders})"
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            with transaction.atomic():
+                cursor.executemany(sql, batch)
+
+
+def random_nickname(rng, player_id):
+    """
+    Makes up a nickname (letters, numbers and underscores only) for the player with the given id.
+    """
+    return f"{rng.choice(ADJECTIVES)}_{rng.choice(NOUNS)}{player_id}"
+
+
+def random_profile_image(rng):
+    """
+    Picks one of the randomuser.me portraits, without calling its API.
+    """
+    return f"https://randomuser.me/api/portraits/{rng.choice(['men', 'women'])}/{rng.randrange(100)}.jpg"
+
+
+def create_players(count, batch_size=5000, rng=random):
+    """
+    Creates `count` players, each with its own user.
+
+    Returns:
+    list: Ids of the created players.
+    """
+    first_user_id = next_id(User)
+    first_player_id = next_id(Player)
+    password = make_password(None)
+    date_joined = connection.ops.adapt_datetimefield_value(timezone.now())
+    insert_rows(
+        User,
+        ["id", "username", "password", "first_name", "last_name", "email", "is_staff", "is_active", "is_superuser",
+         "date_joined"],
+        ((first_user_id + i, f"generated_user_{first_user_id + i}", password, "", "", "", False, True, False,
+          date_joined)
+         for i in range(count)),
+        batch_size)
+    insert_rows(
+        Player,
+        ["id", "user", "nickname", "profile_image"],
+        ((first_player_id + i, first_user_id + i, random_nickname(rng, first_player_id + i), random_profile_image(rng))
+         for i in range(count)),
+        batch_size)
+    return list(range(first_player_id, first_player_id + count))
+
+
+def create_games(count, player_ids, batch_size=5000, rng=random):
+    """
+    Creates `count` games, each with 0 to MAX_PLAYERS_PER_GAME random players among `player_ids` and, when it has
+    players, a random winner among them.
+
+    Returns:
+    list: (game id, list of player ids) tuples for the created games.
+    """
+    first_game_id = next_id(Game)
+    games = []
+    for i in range(count):
+        players = rng.sample(player_ids, rng.randint(0, min(MAX_PLAYERS_PER_GAME, len(player_ids))))
+        games.append((first_game_id + i, players))
+
+    insert_rows(
+        Game,
+        ["id", "winner"],
+        ((game_id, rng.choice(players) if players else None) for game_id, players in games),
+        batch_size)
+    insert_rows(
+        Game.players.through,
+        ["game", "player"],
+        ((game_id, player_id) for game_id, players in games for player_id in players),
+        batch_size)
+    return games
+
+
+def create_stats(count, player_ids, games=None, days=365, batch_size=5000, rng=random):
+    """
+    Creates `count` stats with random scores, spread over the last `days` days. When `games` (as returned by
+    `create_games`) are given, each stat belongs to a random game and one of its players; otherwise (or for games
+    without players), to a random player among `player_ids` and no game.
+    """
+    # Naive datetimes in the database time zone are adapted without time zone conversions, which are slow per row.
+    now = timezone.make_naive(timezone.now(), connection.timezone)
+    seconds = days * 24 * 60 * 60
+
+    def random_stat():
+        game_id, players = rng.choice(games) if games else (None, [])
+        creation_date = connection.ops.adapt_datetimefield_value(now - timedelta(seconds=rng.randrange(seconds)))
+        return rng.choice(players or player_ids), game_id if players else None, rng.randint(0, 100), creation_date
+
+    insert_rows(Stat, ["player", "game", "score", "creation_date"], (random_stat() for _ in range(count)), batch_size)
+
+
+def rebuild_derived_tables():
+    """
+    Rebuilds the tables derived from stats and games, which bulk inserts don't keep up to date, and bumps the versions
+    of the players, games and stats collections, which bulk inserts don't bump either (see `views.ConditionalGetMixin`).
+    """
+    leaderboard.rebuild_all()
+    rollups.rebuild()
+    for name in ["player", "game", "stat"]:
+        caching.bump_version(f"collection:{name}")
+
+
+def generate(players, games, stats, batch_size=5000, seed=None, days=365):
+    """
+    Generates players, games and stats (see `create_players`, `create_games` and `create_stats`), then rebuilds the
+    tables derived from them.
+    """
+    rng = random.Random(seed)
+    player_ids = create_players(players, batch_size, rng)
+    created_games = create_games(games, player_ids, batch_size, rng)
+    if player_ids:
+        create_stats(stats, player_ids, created_games, days, batch_size, rng)
+    rebuild_derived_tables()
@@ -0,0 +1,182 @@
+"""
+Creation of stats in bulk, either right away or through a queue drained by a Celery task.
+
+Queued submissions (lists of stats whose fields have been validated) are stored in the Django cache (Redis in
+production), each in its own numbered slot: `enqueue` takes the next slot with an atomic increment, and `flush` reads
+the slots after the last one flushed, checks the players and games of all their stats at once and inserts them with a
+single bulk insert (split into INSERT_BATCH_SIZE rows per statement). A flush is scheduled FLUSH_DELAY seconds after
+the first submission queued since the previous one, so bursts of submissions turn into a few large inserts. Submissions
+are written at least once: a flush interrupted between inserting stats and marking their slots as flushed inserts them
+again.
+
+A slot is taken before its submission is stored, so a flush can find it empty. It then waits for the next flush, which
+skips the slot by storing a marker in it, unless the submission has been stored meanwhile. Submissions are only stored
+in free slots (both writes are atomic adds), so a submission whose slot has been skipped is queued in the next one.
+"""
+import time
+from django.core.cache import cache
+from django.db import transaction
+from .models import Stat
+from .serializers import BulkStatSerializer
+from .signals import stats_bulk_created
+
+# Seconds between the first submission queued since the last flush and the flush that writes it.
+FLUSH_DELAY = 1
+
+# Maximum number of submissions written by each insert of a flush.
+FLUSH_BATCH_SIZE = 500
+
+# Maximum number of rows inserted by each statement, keeping them below MySQL's max_allowed_packet.
+INSERT_BATCH_SIZE = 1000
+
+# Seconds during which skipped slots are kept marked as such, long after any request queueing a submission has ended.
+SKIPPED_SLOT_TIMEOUT = 24 * 60 * 60
+
+# Value stored in the skipped slots.
+SKIPPED = "skipped"
+
+# Seconds after which the lock of a flush that didn't release it (e.g. its worker crashed) expires.
+FLUSH_LOCK_TIMEOUT = 5 * 60
+
+
+def create(stats):
+    """
+    Inserts validated stats (see BulkStatSerializer) with a single bulk insert (INSERT_BATCH_SIZE rows per statement),
+    and updates the tables derived from them.
+
+    Returns:
+    list: The created Stat instances.
+    """
+    with transaction.atomic():
+        created = Stat.objects.bulk_create([
+            Stat(player_id=stat["player"], game_id=stat.get("game"), score=stat.get("score")) for stat in stats
+        ], batch_size=INSERT_BATCH_SIZE)
+        stats_bulk_created.send(sender=Stat, stats=created)
+    return created
+
+
+def _incr(key, delta=1):
+    if not cache.add(key, delta, timeout=None):
+        cache.incr(key, delta)
+
+
+def schedule_flush():
+    """
+    Schedules a flush, unless one is already scheduled.
+    """
+    if cache.add("stat-queue:flush-scheduled", True, timeout=FLUSH_LOCK_TIMEOUT):
+        from .tasks import flush_stat_queue_task
+        flush_stat_queue_task.apply_async(countdown=FLUSH_DELAY)
+
+
+def enqueue(stats):
+    """
+    Queues stats whose fields have been validated (see BulkStatSerializer.validate_fields) to be created by the next
+    flush, and schedules it.
+
+    Returns:
+    int: The number of the submission.
+    """
+    cache.add("stat-queue:tail", 0, timeout=None)
+    submission = {"stats": stats, "queued_at": time.time()}
+    slot = cache.incr("stat-queue:tail")
+    while not cache.add(f"stat-queue:{slot}", submission, timeout=None):
+        # A flush has skipped the slot (see `flush`).
+        slot = cache.incr("stat-queue:tail")
+    _incr("stat-queue:pending-stats", len(stats))
+    schedule_flush()
+    return slot
+
+
+def flush():
+    """
+    Creates the stats of the queued submissions, FLUSH_BATCH_SIZE submissions at a time. Stats whose player or game
+    isn't valid anymore (e.g. it was deleted after they were queued) are dropped and counted as rejected. Does nothing if
+    another flush is running.
+
+    Returns:
+    int: The number of stats created.
+    """
+    if not cache.add("stat-queue:lock", True, timeout=FLUSH_LOCK_TIMEOUT):
+        return 0
+    try:
+        # Submissions queued from now on schedule another flush.
+        cache.delete("stat-queue:flush-scheduled")
+        started = time.time()
+        created_count = rejected_count = submissions_count = 0
+        oldest_queued_at = None
+        stalled = False
+        head = cache.get("stat-queue:head", 0)
+        tail = cache.get("stat-queue:tail", 0)
+        while head < tail and not stalled:
+            slots = range(head + 1, min(head + FLUSH_BATCH_SIZE, tail) + 1)
+            submissions = cache.get_many([f"stat-queue:{slot}" for slot in slots])
+            stats, last_slot, skipped = [], head, []
+            for slot in slots:
+                submission = submissions.get(f"stat-queue:{slot}")
+                if submission is None and cache.get("stat-queue:missing") != slot:
+                    # The slot was taken but its submission isn't stored yet: it's left for the next flush, which skips
+                    # it if it's still missing (its request failed or is slow).
+                    cache.set("stat-queue:missing", slot, timeout=None)
+                    stalled = True
+                    break
+                if submission is None and not cache.add(f"stat-queue:{slot}", SKIPPED, timeout=SKIPPED_SLOT_TIMEOUT):
+                    # The submission has been stored meanwhile.
+                    submission = cache.get(f"stat-queue:{slot}")
+                if submission is None or submission == SKIPPED:
+                    skipped.append(slot)
+                else:
+                    stats += submission["stats"]
+                    submissions_count += 1
+                    oldest_queued_at = min(oldest_queued_at or submission["queued_at"], submission["queued_at"])
+                last_slot = slot
+
+            errors = [{} for _ in stats]
+            valid_stats = list(stats)
+            BulkStatSerializer.validate_relations(valid_stats, errors)
+            valid_stats = [stat for stat in valid_stats if stat is not None]
+            if valid_stats:
+                create(valid_stats)
+            created_count += len(valid_stats)
+            rejected_count += len(stats) - len(valid_stats)
+
+            cache.set("stat-queue:head", last_slot, timeout=None)
+            # Skipped slots keep their marker until it expires, so no submission is stored in them.
+            cache.delete_many([f"stat-queue:{slot}" for slot in range(head + 1, last_slot + 1) if slot not in skipped])
+            _incr("stat-queue:pending-stats", -len(stats))
+            head = last_slot
+
+        if submissions_count:
+            _incr("stat-queue:created-stats", created_count)
+            _incr("stat-queue:rejected-stats", rejected_count)
+            finished = time.time()
+            cache.set("stat-queue:last-flush", {
+                "submissions": submissions_count,
+                "created_stats": created_count,
+                "rejected_stats": rejected_count,
+                "duration_ms": round((finished - started) * 1000, 2),
+                "latency_ms": round((finished - oldest_queued_at) * 1000, 2),
+                "finished_at": finished,
+            }, timeout=None)
+    finally:
+        cache.delete("stat-queue:lock")
+    if stalled:
+        schedule_flush()
+    return created_count
+
+
+def get_metrics():
+    """
+    Returns the queue's depth (submissions and stats waiting to be flushed), the number of stats created and rejected by
+    flushes, and the figures of the last flush, including its latency: the time between queueing its oldest submission
+    and writing it.
+    """
+    values = cache.get_many(["stat-queue:head", "stat-queue:tail", "stat-queue:pending-stats",
+                             "stat-queue:created-stats", "stat-queue:rejected-stats", "stat-queue:last-flush"])
+    return {
+        "queued_submissions": values.get("stat-queue:tail", 0) - values.get("stat-queue:head", 0),
+        "queued_stats": values.get("stat-queue:pending-stats", 0),
+        "created_stats": values.get("stat-queue:created-stats", 0),
+        "rejected_stats": values.get("stat-queue:rejected-stats", 0),
+        "last_flush": values.get("stat-queue:last-flush"),
+    }
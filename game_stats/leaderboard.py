@@ -0,0 +1,316 @@
+"""
+Maintenance of the materialized leaderboards (LeaderboardEntry).
+
+There is an all time leaderboard, plus one per day, week and month ("buckets" of the period, in the TIME_ZONE
+setting's calendar). Each leaderboard holds the LEADERBOARD_CAPACITY best stats of its bucket (highest score first,
+lowest stat id breaking ties). Leaderboards are updated incrementally whenever a stat is written, and only rebuilt from
+the stats table when an entry's score goes down, since the next best stat is unknown at that point. Leaderboards that
+lose entries to deleted stats are refilled with the stats ranking below their lowest entry. Only the current day, week
+and month are served: older buckets are deleted by `expire_buckets`, which runs periodically. Every change to a
+leaderboard bumps the version of its period (see `caching`), which invalidates the cached rankings.
+"""
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import LeaderboardEntry, PlayerSummary, Stat
+from . import caching
+
+Period = LeaderboardEntry.Period
+
+# Number of entries served by the ranking endpoint.
+LEADERBOARD_SIZE = 10
+
+# Number of entries stored. Keeping more entries than served means deleting a stat rarely changes the served ones.
+LEADERBOARD_CAPACITY = 100
+
+
+def get_bucket(period, moment=None):
+    """
+    Returns the first day of the bucket of the given period containing `moment` (now by default), or None for the all
+    time period.
+    """
+    if period == Period.ALL_TIME:
+        return None
+    day = timezone.localdate(moment)
+    if period == Period.WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == Period.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def get_bucket_range(period, bucket):
+    """
+    Returns the (start, end) datetimes of the given bucket, the end being excluded.
+    """
+    start = timezone.make_aware(datetime.combine(bucket, time.min))
+    if period == Period.DAY:
+        end = bucket + timedelta(days=1)
+    elif period == Period.WEEK:
+        end = bucket + timedelta(weeks=1)
+    else:
+        end = (bucket + timedelta(days=31)).replace(day=1)
+    return start, timezone.make_aware(datetime.combine(end, time.min))
+
+
+def get_scope(period, bucket=None):
+    """
+    Returns the filters selecting the entries of a period's bucket (the current one by default).
+    """
+    return {"period": period, "bucket_start": bucket or get_bucket(period)}
+
+
+def get_version_name(period):
+    """
+    Returns the name of the version (see `caching`) of a period's leaderboards, which changes whenever any of their
+    entries change.
+    """
+    return f"leaderboard:{period}"
+
+
+def get_version(period):
+    """
+    Returns the version of a period's leaderboards.
+    """
+    return caching.get_version(get_version_name(period))
+
+
+def _changed(period):
+    caching.bump_version(get_version_name(period))
+
+
+def live_stats(period=Period.ALL_TIME, bucket=None):
+    """
+    Returns the scored stats of a period's bucket (the current one by default) straight from the stats table, in
+    leaderboard order.
+    """
+    stats = Stat.objects.exclude(score=None)
+    if period != Period.ALL_TIME:
+        start, end = get_bucket_range(period, bucket or get_bucket(period))
+        stats = stats.filter(creation_date__gte=start, creation_date__lt=end)
+    return stats.order_by("-score", "id")
+
+
+def live_top_stats(limit=LEADERBOARD_SIZE, period=Period.ALL_TIME, bucket=None):
+    """
+    Returns the best stats of a period's bucket (the current one by default) straight from the stats table, in
+    leaderboard order.
+    """
+    return live_stats(period, bucket)[:limit]
+
+
+def get_top_entries(limit=LEADERBOARD_SIZE, period=Period.ALL_TIME, bucket=None):
+    """
+    Returns the best leaderboard entries of a period's bucket (the current one by default), with their players loaded.
+    """
+    return LeaderboardEntry.objects.filter(**get_scope(period, bucket)).select_related("player") \
+        .order_by("-score", "stat_id")[:limit]
+
+
+def get_top_players(limit=LEADERBOARD_SIZE, period=Period.ALL_TIME):
+    """
+    Returns the best stat of each of the players with the best scores in a period's current bucket, as (player nickname,
+    score) tuples.
+
+    All time, these are read from the players' best scores (see `ranks`), players with the same best score being listed
+    by id. Otherwise, the period's leaderboard is read first, keeping the first (best) stat of each player; if it holds
+    stats of fewer than `limit` players and may be missing some (it is full), the stats table is then read past its last
+    entry, in leaderboard order (through the score index), skipping the players already listed.
+    """
+    if period == Period.ALL_TIME:
+        return list(PlayerSummary.objects.exclude(best_score=None).order_by("-best_score", "player_id")
+                    .values_list("player__nickname", "best_score")[:limit])
+
+    rows = list(LeaderboardEntry.objects.filter(**get_scope(period)).order_by("-score", "stat_id")
+                .values_list("player_id", "player__nickname", "score", "stat_id"))
+    full = len(rows) >= LEADERBOARD_CAPACITY
+    players = {}
+    while True:
+        for player_id, nickname, score, _ in rows:
+            if player_id not in players and len(players) < limit:
+                players[player_id] = (nickname, score)
+        if len(players) >= limit or not full:
+            return list(players.values())
+        last_score, last_id = rows[-1][2], rows[-1][3]
+        rows = list(live_stats(period).filter(Q(score__lt=last_score) | Q(score=last_score, id__gt=last_id))
+                    .exclude(player_id__in=list(players))
+                    .values_list("player_id", "player__nickname", "score", "id")[:LEADERBOARD_CAPACITY])
+        full = len(rows) >= LEADERBOARD_CAPACITY
+
+
+def rebuild(period=Period.ALL_TIME, bucket=None):
+    """
+    Rebuilds the leaderboard of a period's bucket (the current one by default) from scratch using the stats table.
+    """
+    scope = get_scope(period, bucket)
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(**scope).delete()
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(stat_id=stat_id, player_id=player_id, score=score, **scope)
+            for stat_id, player_id, score in live_top_stats(LEADERBOARD_CAPACITY, period, scope["bucket_start"])
+            .values_list("id", "player_id", "score")
+        ])
+    _changed(period)
+
+
+def rebuild_all():
+    """
+    Rebuilds the all time leaderboard and those of the current day, week and month, dropping any other bucket.
+    """
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        for period in Period:
+            rebuild(period)
+
+
+def _ranks_above(score, stat_id, entry):
+    """
+    Tells whether a stat with the given score and id ranks above the given entry.
+    """
+    return (score, -stat_id) > (entry.score, -entry.stat_id)
+
+
+def _offer_to_bucket(stat, scope):
+    """
+    Updates a single leaderboard after a stat of its bucket has been created or updated.
+    """
+    entries = LeaderboardEntry.objects.filter(**scope)
+    entry = entries.filter(stat_id=stat.pk).first()
+
+    if entry is not None:
+        if stat.score is None or stat.score < entry.score:
+            # The stat may have dropped below stats that are not on the leaderboard.
+            rebuild(scope["period"], scope["bucket_start"])
+        elif stat.score != entry.score or stat.player_id != entry.player_id:
+            entry.score = stat.score
+            entry.player_id = stat.player_id
+            entry.save(update_fields=["score", "player"])
+            _changed(scope["period"])
+        return
+
+    if stat.score is None:
+        return
+
+    entries_count = entries.count()
+    lowest = entries.order_by("score", "-stat_id").first()
+
+    # A leaderboard below capacity holds every scored stat of its bucket, so any new stat belongs to it.
+    if entries_count < LEADERBOARD_CAPACITY or _ranks_above(stat.score, stat.pk, lowest):
+        LeaderboardEntry.objects.create(stat_id=stat.pk, player_id=stat.player_id, score=stat.score, **scope)
+        if entries_count >= LEADERBOARD_CAPACITY:
+            lowest.delete()
+        _changed(scope["period"])
+
+
+def get_stat_scopes(stat):
+    """
+    Returns the scopes (see `get_scope`) of the leaderboards a stat can be on: all time, plus its day, week and month
+    if they are the current ones.
+    """
+    scopes = [get_scope(Period.ALL_TIME)]
+    for period in [Period.DAY, Period.WEEK, Period.MONTH]:
+        bucket = get_bucket(period, stat.creation_date)
+        if bucket == get_bucket(period):
+            scopes.append(get_scope(period, bucket))
+    return scopes
+
+
+def offer(stat):
+    """
+    Updates the leaderboards after a stat has been created or updated.
+    """
+    with transaction.atomic():
+        for scope in get_stat_scopes(stat):
+            _offer_to_bucket(stat, scope)
+
+
+def offer_many(stats):
+    """
+    Updates the leaderboards after stats have been created in bulk. Bulk inserts don't return the ids of the created
+    rows on every database, so rather than offering the stats one by one, each leaderboard that any of them can enter is
+    rebuilt once. New stats rank below older ones with the same score, so only higher scores than a full leaderboard's
+    lowest one can enter it.
+    """
+    best_scores = {}
+    for stat in stats:
+        if stat.score is None:
+            continue
+        for scope in get_stat_scopes(stat):
+            key = (scope["period"], scope["bucket_start"])
+            best_scores[key] = max(best_scores.get(key, stat.score), stat.score)
+
+    for (period, bucket), best_score in best_scores.items():
+        entries = LeaderboardEntry.objects.filter(**get_scope(period, bucket))
+        lowest = entries.order_by("score", "-stat_id").first()
+        if lowest is None or best_score > lowest.score or entries.count() < LEADERBOARD_CAPACITY:
+            rebuild(period, bucket)
+
+
+def _refill(scope, missing):
+    """
+    Adds up to `missing` entries to a leaderboard, with the best stats of its bucket ranking below its lowest entry
+    (read through the score index, from that entry on).
+    """
+    lowest = LeaderboardEntry.objects.filter(**scope).order_by("score", "-stat_id").first()
+    stats = live_stats(scope["period"], scope["bucket_start"])
+    if lowest is not None:
+        stats = stats.filter(Q(score__lt=lowest.score) | Q(score=lowest.score, id__gt=lowest.stat_id))
+    LeaderboardEntry.objects.bulk_create([
+        LeaderboardEntry(stat_id=stat_id, player_id=player_id, score=score, **scope)
+        for stat_id, player_id, score in stats.values_list("id", "player_id", "score")[:missing]
+    ])
+
+
+def withdraw(stat):
+    """
+    Updates the leaderboards after a stat has been deleted. Its entries are removed by the database cascade, so
+    leaderboards left below capacity are refilled with the stats following their lowest entry, rather than rebuilt.
+    Stats deleted together (e.g. by the cascade of a player or game) are all gone by the time this runs, so the first
+    of them refills every missing entry and the others find their leaderboards full.
+    """
+    for scope in get_stat_scopes(stat):
+        entries_count = LeaderboardEntry.objects.filter(**scope).count()
+        if entries_count < LEADERBOARD_CAPACITY:
+            _refill(scope, LEADERBOARD_CAPACITY - entries_count)
+            _changed(scope["period"])
+
+
+def player_changed(player):
+    """
+    Invalidates the cached rankings of the leaderboards listing a player, after it has been updated (e.g. its nickname
+    has changed).
+    """
+    for period in LeaderboardEntry.objects.filter(player=player).values_list("period", flat=True).distinct():
+        _changed(period)
+
+
+def expire_buckets():
+    """
+    Deletes the entries of the days, weeks and months before the current ones.
+
+    Returns:
+    int: Number of deleted entries.
+    """
+    deleted = 0
+    for period in [Period.DAY, Period.WEEK, Period.MONTH]:
+        deleted += LeaderboardEntry.objects.filter(period=period, bucket_start__lt=get_bucket(period)).delete()[0]
+    return deleted
+
+
+def check(limit=LEADERBOARD_SIZE, period=Period.ALL_TIME, bucket=None):
+    """
+    Compares the leaderboard of a period's bucket (the current one by default) against the live stats query.
+
+    Returns:
+    list: (position, leaderboard (stat id, score), live (stat id, score)) tuples for every mismatching position.
+    """
+    stored = list(get_top_entries(limit, period, bucket).values_list("stat_id", "score"))
+    live = list(live_top_stats(limit, period, bucket).values_list("id", "score"))
+    mismatches = []
+    for position in range(max(len(stored), len(live))):
+        stored_item = stored[position] if position < len(stored) else None
+        live_item = live[position] if position < len(live) else None
+        if stored_item != live_item:
+            mismatches.append((position + 1, stored_item, live_item))
+    return mismatches
@@ -0,0 +1,175 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from game_stats import caching, datagen, leaderboard, ranks
+from game_stats.models import User
+
+
+class Command(BaseCommand):
+    """
+    Measures the latency, number of queries and peak memory of the API's hot paths on a throwaway test database seeded
+    with generated data, and writes them to a JSON file that can be compared between releases.
+    """
+
+    help = "Benchmark the list and ranking endpoints on generated data and write the results to a JSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=10_000, help="Number of players to generate.")
+        parser.add_argument("--games", type=int, default=10_000, help="Number of games to generate.")
+        parser.add_argument("--stats", type=int, default=100_000, help="Number of stats to generate.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Number of rows per insert.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated data.")
+        parser.add_argument("--requests", type=int, default=50, help="Number of timed requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=3,
+                            help="Number of untimed requests sent to each endpoint first.")
+        parser.add_argument("--page-size", type=int, default=100, help="Page size of the list endpoints.")
+        parser.add_argument("--output", default="benchmark.json", help="File the results are written to.")
+        parser.add_argument("--compare", default=None,
+                            help="Results of a previous run (e.g. of the last release) to compare the latencies with.")
+
+    def handle(self, *args, **options):
+        """
+        Handles the command execution.
+        Creates a test database, seeds it, benchmarks every endpoint, then destroys the test database and writes the
+        results.
+        """
+        previous = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as file:
+                    previous = json.load(file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read the results to compare with: {e}")
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Seeding {options['players']} players, {options['games']} games and "
+                              f"{options['stats']} stats...")
+            datagen.generate(options["players"], options["games"], options["stats"], batch_size=options["batch_size"],
+                             seed=options["seed"])
+            client = APIClient()
+            client.force_authenticate(User.objects.first())
+            results = {
+                name: self.run_benchmark(client, url, params, setup, options["requests"], options["warmup"])
+                for name, (url, params, setup) in self.get_endpoints(options["page_size"]).items()
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "dataset": {field: options[field] for field in ["players", "games", "stats", "seed"]},
+            "environment": {
+                "database": connection.vendor,
+                "django": django.get_version(),
+                "python": platform.python_version(),
+                "requests": options["requests"],
+                "page_size": options["page_size"],
+            },
+            "created_at": timezone.now().isoformat(),
+            "endpoints": results,
+        }
+        with open(options["output"], "w") as file:
+            json.dump(report, file, indent=2)
+
+        self.write_table(results, previous["endpoints"] if previous else None)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+    def get_endpoints(self, page_size):
+        """
+        Returns the benchmarked requests, by name, as (URL, query parameters, setup) tuples. The setup function, if
+        any, is called (untimed) before each request.
+        """
+        def invalidate(version_name):
+            return lambda: caching.bump_version(version_name)
+
+        return {
+            "GET /players/": (reverse("player-list-or-create"), {"page_size": page_size}, None),
+            "GET /games/": (reverse("game-list-or-create"), {"page_size": page_size}, None),
+            "GET /stats/": (reverse("stat-list-or-create"), {"page_size": page_size}, None),
+            "GET /stats/ (last page)": (reverse("stat-list-or-create"), {"page_size": page_size, "page": "last"},
+                                        None),
+            "GET /stats/ (cursor)": (reverse("stat-list-or-create"), {"page_size": page_size, "pagination": "cursor"},
+                                     None),
+            "GET /stats/ranking/": (reverse("top-10-scores"), {}, None),
+            "GET /stats/ranking/ (uncached)": (reverse("top-10-scores"), {},
+                                               invalidate(leaderboard.get_version_name(leaderboard.Period.ALL_TIME))),
+            "GET /stats/ranking/ (players)": (reverse("top-10-scores"), {"unique_players": "true", "limit": 100},
+                                              invalidate(ranks.VERSION_NAME)),
+        }
+
+    def run_benchmark(self, client, url, params, setup, requests, warmup):
+        """
+        Sends `warmup` requests, then times `requests` requests, counting their queries, and measures the peak memory
+        allocated by one more request (traced separately, since tracing slows requests down).
+
+        Returns:
+        dict: The latency percentiles and mean, in milliseconds, the number of queries, peak memory and response
+        size of a request.
+        """
+        def send():
+            response = client.get(url, params, HTTP_ACCEPT="application/json")
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}.")
+            return response
+
+        for _ in range(warmup):
+            if setup is not None:
+                setup()
+            send()
+
+        timings = []
+        for _ in range(requests):
+            if setup is not None:
+                setup()
+            # The query log is bounded: it is emptied so the queries of each request can be counted.
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = send()
+                timings.append((time.perf_counter() - start) * 1000)
+
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        try:
+            send()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive") if len(timings) > 1 else timings * 99
+        return {
+            "p50_ms": round(statistics.median(timings), 3),
+            "p99_ms": round(percentiles[98], 3),
+            "mean_ms": round(statistics.mean(timings), 3),
+            "queries": len(queries),
+            "peak_memory_kib": round(peak_memory / 1024, 1),
+            "response_bytes": len(response.content),
+        }
+
+    def write_table(self, results, previous=None):
+        """
+        Writes the results as a table, with the change of the median latency since the previous results, if given.
+        """
+        header = f"{'Endpoint':<36}{'p50 (ms)':>10}{'p99 (ms)':>10}{'Queries':>9}{'Peak (KiB)':>12}"
+        self.stdout.write(header + (f"{'p50 change':>12}" if previous else ""))
+        for name, result in results.items():
+            line = f"{name:<36}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['queries']:>9}" \
+                   f"{result['peak_memory_kib']:>12.1f}"
+            if previous:
+                before = previous.get(name)
+                change = f"{(result['p50_ms'] / before['p50_ms'] - 1) * 100:+.0f}%" if before else "new"
+                line += f"{change:>12}"
+            self.stdout.write(line)
@@ -0,0 +1,91 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from game_stats import datagen, leaderboard
+from game_stats.models import Stat, User
+
+
+class Command(BaseCommand):
+    """
+    Measures the latency of the ranking and filtered stat queries with and without the Stat indexes, on a throwaway
+    test database seeded with generated data.
+    """
+
+    help = "Benchmark the ranking and filtered stat queries with and without the Stat indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stats", type=int, default=2_000_000, help="Number of stats to generate.")
+        parser.add_argument("--players", type=int, default=10_000, help="Number of players to generate.")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of times each query is timed.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Number of rows per insert.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated data.")
+
+    def handle(self, *args, **options):
+        """
+        Handles the command execution.
+        Creates a test database, seeds it, times every query with the indexes in place and again after dropping them,
+        then destroys the test database.
+        """
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Seeding {options['players']} players and {options['stats']} stats...")
+            rng = random.Random(options["seed"])
+            player_ids = datagen.create_players(options["players"], options["batch_size"], rng)
+            datagen.create_stats(options["stats"], player_ids, batch_size=options["batch_size"], rng=rng)
+            datagen.rebuild_derived_tables()
+
+            benchmarks = self.get_benchmarks(player_ids[len(player_ids) // 2])
+            with_indexes = self.run_benchmarks(benchmarks, options["repeat"])
+            with connection.schema_editor() as schema_editor:
+                for index in Stat._meta.indexes:
+                    schema_editor.remove_index(Stat, index)
+            without_indexes = self.run_benchmarks(benchmarks, options["repeat"])
+
+            self.stdout.write(f"{'Query':<40}{'No indexes (ms)':>18}{'Indexes (ms)':>18}")
+            for name in benchmarks:
+                self.stdout.write(f"{name:<40}{without_indexes[name]:>18.2f}{with_indexes[name]:>18.2f}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def get_benchmarks(self, player_id):
+        """
+        Returns the timed operations, by name.
+        """
+        client = APIClient()
+        client.force_authenticate(User.objects.first())
+        week_ago = timezone.now() - timedelta(days=7)
+        return {
+            "Top 10 stats (live ranking query)": lambda: list(leaderboard.live_top_stats()),
+            "Leaderboard rebuild": leaderboard.rebuild,
+            "GET /stats/ranking/": lambda: client.get(reverse("top-10-scores"), HTTP_ACCEPT="application/json"),
+            "Best 10 stats of a player": lambda: list(Stat.objects.filter(player_id=player_id).order_by("-score")[:10]),
+            "Stats of the last 7 days (first 100)": lambda: list(
+                Stat.objects.filter(creation_date__gte=week_ago).order_by("creation_date")[:100]),
+        }
+
+    def run_benchmarks(self, benchmarks, repeat):
+        """
+        Times every operation `repeat` times.
+
+        Returns:
+        dict: Median latency of each operation, in milliseconds, by name.
+        """
+        results = {}
+        for name, operation in benchmarks.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                operation()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(timings)
+        return results
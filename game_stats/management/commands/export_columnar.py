@@ -0,0 +1,34 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from game_stats import columnar
+
+
+class Command(BaseCommand):
+    """
+    Exports the players, games and stats tables as columnar (Parquet or Arrow IPC) files.
+    """
+
+    help = "Export the players, games and stats tables as Parquet or Arrow IPC files, for analytics tools."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=columnar.FORMATS, default="parquet",
+                            help="File format: Parquet, or the Arrow IPC file format.")
+        parser.add_argument("--output-dir", default=".", help="Directory the files are written to.")
+        parser.add_argument("--tables", nargs="+", choices=list(columnar.TABLES), default=list(columnar.TABLES),
+                            help="Tables to export (all of them by default).")
+        parser.add_argument("--chunk-size", type=int, default=columnar.CHUNK_SIZE,
+                            help="Number of rows read from the database and written at once.")
+
+    def handle(self, *args, **options):
+        """
+        Handles the command execution.
+        Writes each table to `<output dir>/<table>.<format>`.
+        """
+        os.makedirs(options["output_dir"], exist_ok=True)
+        for table in options["tables"]:
+            path = os.path.join(options["output_dir"], f"{table}.{options['format']}")
+            start = time.perf_counter()
+            rows = columnar.write(table, path, options["format"], chunk_size=options["chunk_size"])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(self.style.SUCCESS(f"Exported {rows} {table} to {path} in {elapsed:.1f} seconds."))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from game_stats import leaderboard
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the materialized leaderboards (all time and current day, week and month) from the stats table and checks
+    them against the live ranking queries.
+    """
+
+    help = "Rebuild the leaderboards from scratch and check them against the live ranking queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check-only", action="store_true",
+                            help="Only compare the leaderboards against the live queries, without rebuilding them.")
+        parser.add_argument("--size", type=int, default=leaderboard.LEADERBOARD_SIZE,
+                            help="Number of top positions to compare.")
+
+    def handle(self, *args, **options):
+        """
+        Handles the command execution.
+        Rebuilds the leaderboards (unless --check-only is given) and reports any position that differs from the live
+        queries.
+        """
+        if not options["check_only"]:
+            leaderboard.rebuild_all()
+            self.stdout.write(self.style.SUCCESS("Leaderboards rebuilt."))
+
+        mismatches_count = 0
+        for period in leaderboard.Period:
+            mismatches = leaderboard.check(options["size"], period)
+            for position, stored, live in mismatches:
+                self.stdout.write(self.style.ERROR(
+                    f"{period.label}, position {position}: leaderboard has {stored}, live query has {live}."))
+            mismatches_count += len(mismatches)
+        if mismatches_count:
+            raise CommandError(f"Leaderboards differ from the live queries in {mismatches_count} position(s).")
+
+        self.stdout.write(self.style.SUCCESS(f"Leaderboards match the live queries (top {options['size']})."))
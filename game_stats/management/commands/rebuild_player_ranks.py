@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from game_stats import ranks
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the counts of players per best score, which player ranks are read from, from the player summaries.
+    """
+
+    help = "Rebuild the counts of players per best score (used by player ranks) from the player summaries."
+
+    def handle(self, *args, **options):
+        """
+        Handles the command execution.
+        Recounts the players of every best score.
+        """
+        ranks.rebuild()
+        self.stdout.write(self.style.SUCCESS("Player ranks rebuilt."))
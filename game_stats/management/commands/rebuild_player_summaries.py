@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from game_stats import rollups
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the player summaries rollup table from the stats and games tables.
+    """
+
+    help = "Rebuild the player summaries from scratch."
+
+    def handle(self, *args, **options):
+        """
+        Handles the command execution.
+        Recomputes the summary of every player.
+        """
+        rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS("Player summaries rebuilt."))
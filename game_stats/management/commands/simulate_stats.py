@@ -1,8 +1,14 @@
 import random
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from game_stats.models import Player, Stat, Game
+from game_stats import datagen
 from django.db import transaction
 
 
@@ -13,13 +19,50 @@ class Command(BaseCommand):
 
     help = "Simulate random Stats, Games, and Players and insert into the database."
 
+    # randomuser.me API settings (see add_arguments).
+    api_url = "https://randomuser.me/api/"
+    results_per_request = 100
+    workers = 4
+    retries = 3
+    timeout = 10
+
+    def add_arguments(self, parser):
+        parser.add_argument("--offline", action="store_true",
+                            help="Generate players locally (no randomuser.me calls) and bulk insert the given number "
+                                 "of players, games and stats.")
+        parser.add_argument("--players", type=int, default=1000, help="Number of players to generate (offline).")
+        parser.add_argument("--games", type=int, default=1000, help="Number of games to generate (offline).")
+        parser.add_argument("--stats", type=int, default=10000, help="Number of stats to generate (offline).")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Number of rows per insert (offline).")
+        parser.add_argument("--seed", type=int, default=None,
+                            help="Random seed, to generate the same dataset on every run (offline).")
+        parser.add_argument("--days", type=int, default=365,
+                            help="Number of past days the stats' creation dates are spread over (offline).")
+        parser.add_argument("--api-url", default=self.api_url,
+                            help="URL of the randomuser.me API, or of a local server stubbing it.")
+        parser.add_argument("--results-per-request", type=int, default=self.results_per_request,
+                            help="Maximum number of players requested from the API in a single call.")
+        parser.add_argument("--workers", type=int, default=self.workers,
+                            help="Maximum number of concurrent API calls.")
+        parser.add_argument("--retries", type=int, default=self.retries,
+                            help="Number of retries of a failed API call.")
+        parser.add_argument("--timeout", type=float, default=self.timeout,
+                            help="Timeout of an API call, in seconds.")
+
     def handle(self, *args, **options):
         """
         Handles the command execution.
         Generates random data for Player, Stat, and Game models and inserts it into the database.
         """
-        with transaction.atomic():
-            try:
+        if options.get("offline"):
+            self.generate_offline_data(options)
+            return
+
+        for option in ["api_url", "results_per_request", "workers", "retries", "timeout"]:
+            setattr(self, option, options.get(option, getattr(self, option)))
+
+        try:
+            with transaction.atomic():
                 print(self.style.SUCCESS("Simulating statistics, games, and players..."))
 
                 # simulate Player data
@@ -34,9 +77,8 @@ class Command(BaseCommand):
                 game.save()
 
                 # simulate Stat data
-                player_data = self.generate_random_player_data()
-                new_player = random.choice(players) if players else Player.objects.create(
-                    nickname=player_data["nickname"], profile_image=player_data["profile_image"])
+                new_player = random.choice(players) if players else self.get_or_create_player(
+                    self.generate_random_player_data())
 
                 Stat.objects.create(
                     player=new_player,
@@ -46,27 +88,76 @@ class Command(BaseCommand):
 
                 print(self.style.SUCCESS("Statistics, games, and players simulation completed."))
 
-            except Exception as e:
-                print(self.style.ERROR(f"An error occurred: {str(e)}"))
+        except Exception as e:
+            print(self.style.ERROR(f"An error occurred: {str(e)}"))
 
-    def generate_random_player_data(self) -> dict:
+    def generate_offline_data(self, options):
         """
-        Generates random player data by calling the randomuser.me API.
+        Generates the requested number of players, games and stats locally and bulk inserts them.
+        """
+        print(self.style.SUCCESS(
+            f"Generating {options['players']} players, {options['games']} games and {options['stats']} stats..."))
+        start = time.perf_counter()
+        datagen.generate(options["players"], options["games"], options["stats"], batch_size=options["batch_size"],
+                         seed=options["seed"], days=options["days"])
+        elapsed = time.perf_counter() - start
+        rows = options["players"] + options["games"] + options["stats"]
+        print(self.style.SUCCESS(f"Generated {rows} rows in {elapsed:.1f} seconds ({rows / elapsed:.0f} rows/s)."))
+
+    def create_session(self) -> requests.Session:
+        """
+        Creates an HTTP session whose connections are pooled (one per worker) and which retries failed calls with an
+        exponential backoff.
+        """
+        retry = Retry(total=self.retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def fetch_random_player_data(self, count) -> list:
+        """
+        Fetches random player data from the randomuser.me API, requesting up to `results_per_request` players per call
+        and running up to `workers` calls concurrently over a pooled session.
 
         Returns:
-        dict: Dictionary containing "nickname" and "profile_image" fields.
+        list: Dictionaries containing "nickname" and "profile_image" fields.
         """
-        try:
-            response = requests.get("https://randomuser.me/api/")
+        def fetch(results):
+            response = session.get(self.api_url, params={"results": results, "inc": "login,picture"},
+                                   timeout=self.timeout)
             response.raise_for_status()
-            data = response.json()["results"][0]
-            return {
-                "nickname": data["login"]["username"],
-                "profile_image": data["picture"]["large"],
-            }
+            return [
+                {"nickname": data["login"]["username"], "profile_image": data["picture"]["large"]}
+                for data in response.json()["results"]
+            ]
+
+        batches = [min(self.results_per_request, count - start) for start in range(0, count, self.results_per_request)]
+        try:
+            with self.create_session() as session, ThreadPoolExecutor(max_workers=self.workers) as executor:
+                return [player_data for batch in executor.map(fetch, batches) for player_data in batch]
         except requests.exceptions.RequestException as e:
             raise Exception(f"Error calling randomuser.me API: {str(e)}")
 
+    def generate_random_player_data(self) -> dict:
+        """
+        Generates random player data by calling the randomuser.me API.
+
+        Returns:
+        dict: Dictionary containing "nickname" and "profile_image" fields.
+        """
+        return self.fetch_random_player_data(1)[0]
+
+    def get_or_create_player(self, player_data) -> Player:
+        """
+        Gets or creates the player (and its user, named after the nickname) for the given player data.
+        """
+        user, _ = User.objects.get_or_create(username=player_data["nickname"])
+        player, _ = Player.objects.get_or_create(user=user, defaults=player_data)
+        return player
+
     def generate_random_players(self) -> list:
         """
         Generates a list of random players.
@@ -76,15 +167,8 @@ class Command(BaseCommand):
         """
         try:
             num_players = random.randint(0, 10)
-            players = []
-
-            for _ in range(num_players):
-                player_data = self.generate_random_player_data()
-                player, _ = Player.objects.get_or_create(nickname=player_data["nickname"],
-                                                         profile_image=player_data["profile_image"])
-                players.append(player)
-
-            return players
+            return [self.get_or_create_player(player_data)
+                    for player_data in self.fetch_random_player_data(num_players)]
 
         except Exception as e:
             raise Exception(f"Error generating random players: {str(e)}")
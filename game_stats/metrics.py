@@ -0,0 +1,269 @@
+"""
+Per-route request metrics: latency, number of database queries, database time and serialization time, aggregated as
+Prometheus histograms.
+
+Requests are measured by `middleware.RequestMetricsMiddleware`, which calls `observe` once per request. Observations are
+added up in each process and flushed to the Django cache (Redis in production) by a background thread, every
+REQUEST_METRICS_FLUSH_INTERVAL seconds, with one atomic increment per changed counter, so the requests of every worker
+end up in the same histograms without any request waiting for the cache. Each route and method pair (a "series") is
+registered in a numbered slot when it is flushed, so `export` can list them all. Durations are summed in microseconds,
+so that sums can be incremented atomically like the bucket counters.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds between flushes of a process' observations to the cache, unless set by REQUEST_METRICS_FLUSH_INTERVAL (None
+# disables the background flushes: observations are then only flushed by explicit calls to `flush`).
+FLUSH_INTERVAL = 10
+
+# Upper bounds of the buckets of the histograms, in seconds or number of queries.
+DURATION_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+QUERY_BUCKETS = [0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500]
+
+# Description, bucket bounds and scale (the unit sums are counted in) of each histogram.
+HISTOGRAMS = {
+    "request_duration_seconds": ("Latency of the requests, through every middleware.", DURATION_BUCKETS, 1_000_000),
+    "db_queries": ("Number of database queries run by each request.", QUERY_BUCKETS, 1),
+    "db_duration_seconds": ("Time spent running database queries, per request.", DURATION_BUCKETS, 1_000_000),
+    "serialization_duration_seconds": (
+        "Time spent serializing and rendering responses, database queries excluded.", DURATION_BUCKETS, 1_000_000),
+}
+
+METRIC_PREFIX = "gamestats_"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestMetrics:
+    """
+    Measurements of a request in progress: the number and total duration of its queries, and the time spent serializing
+    its response outside of them.
+    """
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self._serializing = 0
+
+    def time_query(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper (see `connection.execute_wrapper`) counting the queries and their duration.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    def start_serialization(self):
+        """
+        Starts timing serialization. Nested calls are only timed by the outermost one.
+        """
+        if not self._serializing:
+            self._serialization_start = time.perf_counter()
+            self._serialization_db_time = self.db_time
+        self._serializing += 1
+
+    def end_serialization(self):
+        """
+        Stops timing serialization, counting the time elapsed since it started, minus the time spent in queries.
+        """
+        self._serializing -= 1
+        if not self._serializing:
+            self.serialization_time += time.perf_counter() - self._serialization_start - \
+                (self.db_time - self._serialization_db_time)
+
+
+_current = ContextVar("request_metrics", default=None)
+
+
+def get_current():
+    """
+    Returns the measurements of the request being handled, or None outside of requests.
+    """
+    return _current.get()
+
+
+@contextmanager
+def measure_request():
+    """
+    Makes new measurements current while the block runs, yielding them.
+    """
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def measure_serialization():
+    """
+    Counts the time the block takes as serialization time of the current request, if any.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics.start_serialization()
+    try:
+        yield
+    finally:
+        metrics.end_serialization()
+
+
+def get_server_timing(duration, metrics):
+    """
+    Returns the value of a Server-Timing header describing a request's measurements.
+    """
+    return f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries", ' \
+           f'serialization;dur={metrics.serialization_time * 1000:.1f}, total;dur={duration * 1000:.1f}'
+
+
+_lock = threading.Lock()
+# Counters observed since the last flush, by series, then by (histogram, bucket index or "sum") or "count".
+_pending = {}
+# Thread flushing the observations of this process.
+_flusher = None
+
+
+def get_flush_interval():
+    """
+    Returns the number of seconds between background flushes, or None if they are disabled.
+    """
+    return getattr(settings, "REQUEST_METRICS_FLUSH_INTERVAL", FLUSH_INTERVAL)
+
+
+def _flush_periodically():
+    while (interval := get_flush_interval()) is not None:
+        time.sleep(interval)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Failed to flush the request metrics.")
+
+
+def _start_flusher():
+    """
+    Starts the background flushes of this process, unless they are running (threads don't survive forks, so each
+    worker starts its own) or disabled.
+    """
+    global _flusher
+    if (_flusher is None or not _flusher.is_alive()) and get_flush_interval() is not None:
+        _flusher = threading.Thread(target=_flush_periodically, name="metrics-flusher", daemon=True)
+        _flusher.start()
+
+
+def observe(route, method, duration, metrics):
+    """
+    Adds a request's latency and measurements to the histograms of its route and method, to be flushed by the background
+    flushes.
+    """
+    values = {
+        "request_duration_seconds": duration,
+        "db_queries": metrics.queries,
+        "db_duration_seconds": metrics.db_time,
+        "serialization_duration_seconds": metrics.serialization_time,
+    }
+    with _lock:
+        counters = _pending.setdefault((route, method), {})
+        counters["count"] = counters.get("count", 0) + 1
+        for name, value in values.items():
+            bucket = name, bisect_left(HISTOGRAMS[name][1], value)
+            counters[bucket] = counters.get(bucket, 0) + 1
+            counters[name, "sum"] = counters.get((name, "sum"), 0) + value
+        _start_flusher()
+
+
+def _incr(key, delta):
+    if not cache.add(key, delta, timeout=None):
+        cache.incr(key, delta)
+
+
+def _get_key(route, method, *parts):
+    return ":".join(["metrics", route, method, *map(str, parts)])
+
+
+def flush():
+    """
+    Adds the counters observed by this process since the last flush to the ones in the cache.
+    """
+    global _pending
+    with _lock:
+        pending, _pending = _pending, {}
+    for (route, method), counters in pending.items():
+        if cache.add(_get_key(route, method, "registered"), True, timeout=None):
+            cache.add("metrics:series-count", 0, timeout=None)
+            cache.set(f"metrics:series:{cache.incr('metrics:series-count')}", (route, method), timeout=None)
+        for counter, value in counters.items():
+            if counter == "count":
+                _incr(_get_key(route, method, "count"), value)
+            else:
+                name, part = counter
+                if part == "sum":
+                    value = round(value * HISTOGRAMS[name][2])
+                _incr(_get_key(route, method, name, part), value)
+
+
+def collect():
+    """
+    Returns the flushed histograms of every series.
+
+    Returns:
+    dict: By (route, method), the number of requests ("count"), and for each histogram its cumulative bucket counts
+    ("buckets", one per bound plus +Inf) and the sum of its values ("sum").
+    """
+    slots = cache.get_many([f"metrics:series:{slot}" for slot in range(1, cache.get("metrics:series-count", 0) + 1)])
+    series = sorted(set(slots.values()))
+    keys = []
+    for route, method in series:
+        keys.append(_get_key(route, method, "count"))
+        for name, (_, buckets, _) in HISTOGRAMS.items():
+            keys += [_get_key(route, method, name, index) for index in range(len(buckets) + 1)]
+            keys.append(_get_key(route, method, name, "sum"))
+    values = cache.get_many(keys)
+
+    histograms = {}
+    for route, method in series:
+        histogram = histograms[route, method] = {"count": values.get(_get_key(route, method, "count"), 0)}
+        for name, (_, buckets, scale) in HISTOGRAMS.items():
+            cumulative, observations = [], 0
+            for index in range(len(buckets) + 1):
+                observations += values.get(_get_key(route, method, name, index), 0)
+                cumulative.append(observations)
+            total = values.get(_get_key(route, method, name, "sum"), 0) / scale
+            histogram[name] = {"buckets": cumulative, "sum": total}
+    return histograms
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def export():
+    """
+    Returns the flushed histograms in the Prometheus text exposition format.
+    """
+    histograms = collect()
+    lines = []
+    for name, (description, buckets, _) in HISTOGRAMS.items():
+        metric = METRIC_PREFIX + name
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} histogram"]
+        for (route, method), histogram in histograms.items():
+            labels = f'route="{_escape(route)}",method="{_escape(method)}"'
+            bounds = [f"{bound:g}" for bound in buckets] + ["+Inf"]
+            lines += [f'{metric}_bucket{{{labels},le="{bound}"}} {count}'
+                      for bound, count in zip(bounds, histogram[name]["buckets"])]
+            lines += [f"{metric}_sum{{{labels}}} {histogram[name]['sum']}",
+                      f"{metric}_count{{{labels}}} {histogram['count']}"]
+    return "\n".join(lines) + "\n"
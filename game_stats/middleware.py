@@ -0,0 +1,67 @@
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+from . import metrics, routers
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures the latency, number of queries, database time and serialization time (see `metrics`) of every request,
+    by route (the name of the URL pattern matched) and method. With the REQUEST_METRICS_SERVER_TIMING setting, the
+    measurements are also sent in the response's Server-Timing header, which browsers show in their developer tools.
+
+    Serialization covers the timed serializers (see `serializers.TimedSerializerMixin`) and the rendering of template
+    responses (DRF responses included). Queries run meanwhile are counted as database time only.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with metrics.measure_request() as measurements, ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(measurements.time_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        metrics.observe(match.view_name if match else "unmatched", request.method, duration, measurements)
+        if getattr(settings, "REQUEST_METRICS_SERVER_TIMING", False):
+            response["Server-Timing"] = metrics.get_server_timing(duration, measurements)
+        return response
+
+    def process_template_response(self, request, response):
+        """
+        Times the rendering of the response, which follows once every middleware has processed it.
+        """
+        measurements = metrics.get_current()
+        if measurements is not None:
+            measurements.start_serialization()
+            response.add_post_render_callback(lambda response: measurements.end_serialization())
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sends the reads of safe requests to game_stats views to the read replicas, and pins the clients of requests that
+    write to the primary for a while, so they read their own writes (see `routers`). The bodies of streamed responses
+    are read with the routing of their request.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.route_request(request) as routing:
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = routers.route_stream(routing, response.streaming_content)
+        routing.pin()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = routers.get_current()
+        if routing is not None and request.method in SAFE_METHODS and \
+                getattr(view_func, "__module__", "").startswith("game_stats."):
+            routing.read_from_replica()
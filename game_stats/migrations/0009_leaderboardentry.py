@@ -0,0 +1,67 @@
+# Generated by Django 4.2.8 on 2026-10-18 16:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_leaderboard(apps, schema_editor):
+    Stat = apps.get_model("game_stats", "Stat")
+    LeaderboardEntry = apps.get_model("game_stats", "LeaderboardEntry")
+    top_stats = Stat.objects.exclude(score=None).order_by("-score", "id")[:100]
+    LeaderboardEntry.objects.bulk_create(
+        [
+            LeaderboardEntry(stat_id=stat_id, player_id=player_id, score=score)
+            for stat_id, player_id, score in top_stats.values_list(
+                "id", "player_id", "score"
+            )
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game_stats", "0008_alter_player_user"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.PositiveIntegerField()),
+                (
+                    "player",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="game_stats.player",
+                    ),
+                ),
+                (
+                    "stat",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard_entry",
+                        to="game_stats.stat",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-score", "stat_id"],
+                "indexes": [
+                    models.Index(
+                        fields=["-score", "stat"], name="leaderboard_score_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
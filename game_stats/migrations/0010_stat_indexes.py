@@ -0,0 +1,27 @@
+# Generated by Django 4.2.8 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game_stats", "0009_leaderboardentry"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stat",
+            index=models.Index(fields=["-score", "id"], name="stat_score_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="stat",
+            index=models.Index(
+                fields=["player", "-score"], name="stat_player_score_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stat",
+            index=models.Index(fields=["creation_date"], name="stat_creation_date_idx"),
+        ),
+    ]
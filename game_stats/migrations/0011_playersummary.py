@@ -0,0 +1,70 @@
+# Generated by Django 4.2.8 on 2026-10-18 16:50
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+import django.db.models.deletion
+
+
+def populate_player_summaries(apps, schema_editor):
+    Player = apps.get_model("game_stats", "Player")
+    Stat = apps.get_model("game_stats", "Stat")
+    Game = apps.get_model("game_stats", "Game")
+    PlayerSummary = apps.get_model("game_stats", "PlayerSummary")
+    summaries = {
+        player_id: PlayerSummary(player_id=player_id)
+        for player_id in Player.objects.values_list("id", flat=True)
+    }
+    stats = Stat.objects.values("player_id").annotate(
+        stats_count=Count("id"),
+        scored_stats_count=Count("score"),
+        total_score=Sum("score"),
+        best_score=Max("score"),
+    )
+    for row in stats:
+        summary = summaries[row.pop("player_id")]
+        row["total_score"] = row["total_score"] or 0
+        for field, value in row.items():
+            setattr(summary, field, value)
+    games = Game.players.through.objects.values("player_id").annotate(count=Count("id"))
+    for row in games:
+        summaries[row["player_id"]].games_played = row["count"]
+    wins = (
+        Game.objects.exclude(winner=None)
+        .values("winner_id")
+        .annotate(count=Count("id"))
+    )
+    for row in wins:
+        summaries[row["winner_id"]].wins = row["count"]
+    PlayerSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game_stats", "0010_stat_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayerSummary",
+            fields=[
+                (
+                    "player",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="game_stats.player",
+                    ),
+                ),
+                ("stats_count", models.PositiveIntegerField(default=0)),
+                ("scored_stats_count", models.PositiveIntegerField(default=0)),
+                ("total_score", models.PositiveBigIntegerField(default=0)),
+                ("best_score", models.PositiveIntegerField(blank=True, null=True)),
+                ("games_played", models.PositiveIntegerField(default=0)),
+                ("wins", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_player_summaries, migrations.RunPython.noop),
+    ]
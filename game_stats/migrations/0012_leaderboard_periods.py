@@ -0,0 +1,108 @@
+# Generated by Django 4.2.8 on 2026-10-18 16:51
+
+from datetime import datetime, time, timedelta
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def populate_current_buckets(apps, schema_editor):
+    Stat = apps.get_model("game_stats", "Stat")
+    LeaderboardEntry = apps.get_model("game_stats", "LeaderboardEntry")
+    today = timezone.localdate()
+    buckets = {
+        "day": (today, today + timedelta(days=1)),
+        "week": (
+            today - timedelta(days=today.weekday()),
+            today - timedelta(days=today.weekday()) + timedelta(weeks=1),
+        ),
+        "month": (
+            today.replace(day=1),
+            (today.replace(day=1) + timedelta(days=31)).replace(day=1),
+        ),
+    }
+    for period, (start, end) in buckets.items():
+        top_stats = (
+            Stat.objects.exclude(score=None)
+            .filter(
+                creation_date__gte=timezone.make_aware(
+                    datetime.combine(start, time.min)
+                ),
+                creation_date__lt=timezone.make_aware(datetime.combine(end, time.min)),
+            )
+            .order_by("-score", "id")[:100]
+        )
+        LeaderboardEntry.objects.bulk_create(
+            [
+                LeaderboardEntry(
+                    stat_id=stat_id,
+                    player_id=player_id,
+                    score=score,
+                    period=period,
+                    bucket_start=start,
+                )
+                for stat_id, player_id, score in top_stats.values_list(
+                    "id", "player_id", "score"
+                )
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game_stats", "0011_playersummary"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="leaderboardentry",
+            options={"ordering": ["period", "bucket_start", "-score", "stat_id"]},
+        ),
+        migrations.RemoveIndex(
+            model_name="leaderboardentry",
+            name="leaderboard_score_idx",
+        ),
+        migrations.AddField(
+            model_name="leaderboardentry",
+            name="bucket_start",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="leaderboardentry",
+            name="period",
+            field=models.CharField(
+                choices=[
+                    ("all", "All time"),
+                    ("day", "Day"),
+                    ("week", "Week"),
+                    ("month", "Month"),
+                ],
+                default="all",
+                max_length=5,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="leaderboardentry",
+            name="stat",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="leaderboard_entries",
+                to="game_stats.stat",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["period", "bucket_start", "-score", "stat"],
+                name="leaderboard_bucket_score_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="leaderboardentry",
+            constraint=models.UniqueConstraint(
+                fields=("period", "stat"), name="leaderboard_unique_period_stat"
+            ),
+        ),
+        migrations.RunPython(populate_current_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.8 on 2026-10-18 17:15
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_score_counts(apps, schema_editor):
+    PlayerSummary = apps.get_model("game_stats", "PlayerSummary")
+    ScoreCount = apps.get_model("game_stats", "ScoreCount")
+    counts = (
+        PlayerSummary.objects.exclude(best_score=None)
+        .values("best_score")
+        .annotate(count=Count("player"))
+    )
+    ScoreCount.objects.bulk_create(
+        [ScoreCount(score=row["best_score"], players=row["count"]) for row in counts],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game_stats", "0012_leaderboard_periods"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScoreCount",
+            fields=[
+                (
+                    "score",
+                    models.PositiveIntegerField(primary_key=True, serialize=False),
+                ),
+                ("players", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="playersummary",
+            index=models.Index(
+                fields=["-best_score", "player"], name="summary_best_score_idx"
+            ),
+        ),
+        migrations.RunPython(populate_score_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.8 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+TREE_SIZE = 2**32
+
+
+def populate_score_tree(apps, schema_editor):
+    ScoreCount = apps.get_model("game_stats", "ScoreCount")
+    ScoreTreeNode = apps.get_model("game_stats", "ScoreTreeNode")
+    nodes = {TREE_SIZE: 0}
+    for score, count in ScoreCount.objects.values_list("score", "players"):
+        node = score + 1
+        while node <= TREE_SIZE:
+            nodes[node] = nodes.get(node, 0) + count
+            node += node & -node
+    ScoreTreeNode.objects.bulk_create(
+        [ScoreTreeNode(node=node, players=count) for node, count in nodes.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game_stats", "0013_player_ranks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScoreTreeNode",
+            fields=[
+                (
+                    "node",
+                    models.PositiveBigIntegerField(primary_key=True, serialize=False),
+                ),
+                ("players", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_score_tree, migrations.RunPython.noop),
+    ]
@@ -42,6 +42,104 @@ class Stat(models.Model):
     score = models.PositiveIntegerField(null=True, blank=True)
     game = models.ForeignKey(Game, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Ranking: best scores first (ties broken by id).
+            models.Index(fields=["-score", "id"], name="stat_score_idx"),
+            # Per-player rankings and aggregates: a player's best scores first.
+            models.Index(fields=["player", "-score"], name="stat_player_score_idx"),
+            # Time-window listings.
+            models.Index(fields=["creation_date"], name="stat_creation_date_idx"),
+        ]
+
     def __str__(self):
         return f"(ID: {self.pk}). PLAYER: {self.player.nickname}. SCORE: {self.score}. CREATED: {self.creation_date}." \
                f"GAME: {self.game}"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A stat among the highest scores of all time, or of a day, week or month (the period's "bucket", starting on
+    `bucket_start`). Entries are kept up to date as stats are created, updated or deleted (see game_stats.leaderboard),
+    so rankings can be read without sorting the stats table.
+    """
+    class Period(models.TextChoices):
+        ALL_TIME = "all", "All time"
+        DAY = "day", "Day"
+        WEEK = "week", "Week"
+        MONTH = "month", "Month"
+
+    stat = models.ForeignKey(Stat, on_delete=models.CASCADE, related_name="leaderboard_entries")
+    player = models.ForeignKey(Player, on_delete=models.CASCADE)
+    score = models.PositiveIntegerField()
+    period = models.CharField(max_length=5, choices=Period.choices, default=Period.ALL_TIME)
+    bucket_start = models.DateField(null=True, blank=True)  # None for all time entries
+
+    class Meta:
+        ordering = ["period", "bucket_start", "-score", "stat_id"]
+        indexes = [
+            models.Index(fields=["period", "bucket_start", "-score", "stat"], name="leaderboard_bucket_score_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["period", "stat"], name="leaderboard_unique_period_stat"),
+        ]
+
+    def __str__(self):
+        return f"(ID: {self.pk}). PERIOD: {self.period} {self.bucket_start or ''}. PLAYER: {self.player.nickname}. " \
+               f"SCORE: {self.score}. STAT: {self.stat_id}"
+
+
+class PlayerSummary(models.Model):
+    """
+    Aggregated stats and games of a player. Summaries are kept up to date as stats and games are written (see
+    game_stats.rollups), so they can be read without aggregating the player's stats.
+    """
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, primary_key=True, related_name="summary")
+    stats_count = models.PositiveIntegerField(default=0)
+    scored_stats_count = models.PositiveIntegerField(default=0)
+    total_score = models.PositiveBigIntegerField(default=0)
+    best_score = models.PositiveIntegerField(null=True, blank=True)
+    games_played = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Player ranks (see game_stats.ranks): best scores first (ties broken by player id).
+            models.Index(fields=["-best_score", "player"], name="summary_best_score_idx"),
+        ]
+
+    @property
+    def average_score(self):
+        """
+        Average score of the player's stats that have a score.
+        """
+        return self.total_score / self.scored_stats_count if self.scored_stats_count else None
+
+    def __str__(self):
+        return f"PLAYER: {self.player_id}. STATS: {self.stats_count}. BEST SCORE: {self.best_score}. " \
+               f"GAMES: {self.games_played}. WINS: {self.wins}"
+
+
+class ScoreCount(models.Model):
+    """
+    Number of players whose best score (see PlayerSummary) is a given score. Counts are kept up to date along with the
+    player summaries (see game_stats.ranks), along with their sums in ScoreTreeNode.
+    """
+    score = models.PositiveIntegerField(primary_key=True)
+    players = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"SCORE: {self.score}. PLAYERS: {self.players}"
+
+
+class ScoreTreeNode(models.Model):
+    """
+    Node of the Fenwick tree (binary indexed tree) summing the ScoreCount rows: the number of players whose best score
+    is in the range of scores covered by the node (see game_stats.ranks), so a player's rank is the sum of a few nodes,
+    rather than of the counts of every higher score.
+    """
+    node = models.PositiveBigIntegerField(primary_key=True)
+    players = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"NODE: {self.node}. PLAYERS: {self.players}"
@@ -0,0 +1,159 @@
+"""
+Global ranks of the players, by best score (see PlayerSummary).
+
+Players are ranked by best score, highest first. Players with the same best score share their rank and are listed by
+id; players without scores aren't ranked. The number of players with each best score is kept in the ScoreCount table,
+and summed in a Fenwick tree (binary indexed tree, the ScoreTreeNode table) over every possible score: node i counts
+the players whose best score is in [i - lowbit(i), i - 1], lowbit(i) being the lowest set bit of i. The number of
+players with a best score up to a given one is then the sum of at most 32 nodes, and the root (node TREE_SIZE, which
+covers every score) holds the number of ranked players, so a rank is read from at most 33 rows whatever the number of
+players and distinct scores. A change of a count updates at most 33 nodes too. The players around a rank are read
+through the (best score, player) index of the summaries.
+
+Counts are recomputed, for the scores that were or became the best score of a player, whenever summaries are saved (see
+`rollups`), and the tree is updated with the differences. Every update of the tree updates its root, whose row is
+locked first, so concurrent updates don't interleave.
+"""
+from django.db import transaction
+from django.db.models import Count
+from .models import PlayerSummary, ScoreCount, ScoreTreeNode
+from . import bulk, caching
+
+# Name of the version (see `caching`) of the players' best scores, which changes whenever any of them changes.
+VERSION_NAME = "best-scores"
+
+# Number of scores covered by the tree: scores are PositiveIntegerFields, from 0 to 2 ** 32 - 1, stored in nodes 1 to
+# 2 ** 32.
+TREE_SIZE = 2 ** 32
+
+
+def get_update_nodes(score):
+    """
+    Returns the nodes of the tree covering the given score, from the lowest one to the root.
+    """
+    node, nodes = score + 1, []
+    while node <= TREE_SIZE:
+        nodes.append(node)
+        node += node & -node
+    return nodes
+
+
+def get_prefix_nodes(score):
+    """
+    Returns the nodes of the tree whose sum is the number of players whose best score is at most the given one.
+    """
+    node, nodes = score + 1, []
+    while node:
+        nodes.append(node)
+        node -= node & -node
+    return nodes
+
+
+def get_nodes(nodes):
+    """
+    Returns the number of players counted by each of the given nodes of the tree (0 for nodes not stored yet).
+    """
+    counts = dict(ScoreTreeNode.objects.filter(node__in=set(nodes)).values_list("node", "players"))
+    return {node: counts.get(node, 0) for node in nodes}
+
+
+def _add_to_nodes(deltas):
+    counts = get_nodes(list(deltas))
+    nodes = [ScoreTreeNode(node=node, players=counts[node] + delta) for node, delta in deltas.items()]
+    bulk.upsert(ScoreTreeNode, nodes, ["node"], ["players"])
+
+
+def refresh(scores):
+    """
+    Recomputes the number of players whose best score is one of the given scores, and updates the tree accordingly.
+    """
+    scores = {score for score in scores if score is not None}
+    if not scores:
+        return
+    with transaction.atomic():
+        ScoreTreeNode.objects.select_for_update().get_or_create(node=TREE_SIZE)
+        previous_counts = dict(ScoreCount.objects.filter(score__in=scores).values_list("score", "players"))
+        counts = dict(PlayerSummary.objects.filter(best_score__in=scores).values("best_score")
+                      .annotate(count=Count("player")).values_list("best_score", "count"))
+        bulk.upsert(ScoreCount, [ScoreCount(score=score, players=counts.get(score, 0)) for score in scores], ["score"],
+                    ["players"])
+        deltas = {}
+        for score in scores:
+            delta = counts.get(score, 0) - previous_counts.get(score, 0)
+            if delta:
+                for node in get_update_nodes(score):
+                    deltas[node] = deltas.get(node, 0) + delta
+        if deltas:
+            _add_to_nodes(deltas)
+    caching.bump_version(VERSION_NAME)
+
+
+def build_tree(counts):
+    """
+    Returns the nodes of the tree summing the given numbers of players by score, as a dict.
+    """
+    nodes = {TREE_SIZE: 0}
+    for score, count in counts.items():
+        for node in get_update_nodes(score):
+            nodes[node] = nodes.get(node, 0) + count
+    return nodes
+
+
+def rebuild():
+    """
+    Rebuilds the number of players of every best score, and the tree, from scratch.
+    """
+    counts = dict(PlayerSummary.objects.exclude(best_score=None).values("best_score")
+                  .annotate(count=Count("player")).values_list("best_score", "count"))
+    with transaction.atomic():
+        ScoreCount.objects.all().delete()
+        ScoreTreeNode.objects.all().delete()
+        ScoreCount.objects.bulk_create([ScoreCount(score=score, players=count) for score, count in counts.items()],
+                                       batch_size=1000)
+        ScoreTreeNode.objects.bulk_create([ScoreTreeNode(node=node, players=count)
+                                           for node, count in build_tree(counts).items()], batch_size=1000)
+    caching.bump_version(VERSION_NAME)
+
+
+def _describe(row, rank):
+    player_id, nickname, best_score = row
+    return {"player": player_id, "nickname": nickname, "best_score": best_score, "rank": rank}
+
+
+def get_rank(player_id):
+    """
+    Returns a player's rank, best score and the number of ranked players, along with the players just above and below
+    it (None at the top and bottom of the ranking), or None if the player has no summary or no scores.
+
+    The rank is the number of ranked players (the root of the tree) less those whose best score is at most the
+    player's (a sum of nodes of the tree): at most 33 rows read by primary key.
+    """
+    summaries = PlayerSummary.objects.values_list("player_id", "player__nickname", "best_score")
+    summary = summaries.filter(player_id=player_id).first()
+    if summary is None or summary[2] is None:
+        return None
+    score = summary[2]
+    above = summaries.filter(best_score=score, player_id__lt=player_id).order_by("-player_id").first() or \
+        summaries.filter(best_score__gt=score).order_by("best_score", "-player_id").first()
+    below = summaries.filter(best_score=score, player_id__gt=player_id).order_by("player_id").first() or \
+        summaries.filter(best_score__lt=score).order_by("-best_score", "player_id").first()
+
+    above_score = above[2] if above is not None else score
+    counts = dict(ScoreCount.objects.filter(score__in={score, above_score}).values_list("score", "players"))
+    prefix_nodes = get_prefix_nodes(score)
+    nodes = get_nodes([*prefix_nodes, TREE_SIZE])
+    total = nodes[TREE_SIZE]
+    higher, tied = total - sum(nodes[node] for node in prefix_nodes), counts.get(score, 0)
+    rank = higher + 1
+    # The player above shares the rank, or has the lowest higher score; the player below shares it, or is right after
+    # every player with the same score.
+    above_rank = rank if above_score == score else rank - counts.get(above_score, 0)
+    below_rank = rank if below is not None and below[2] == score else higher + tied + 1
+
+    ranking = _describe(summary, rank)
+    ranking.update({
+        "players": total,
+        "above": _describe(above, above_rank) if above is not None else None,
+        "below": _describe(below, below_rank) if below is not None else None,
+    })
+    return ranking
@@ -0,0 +1,171 @@
+"""
+Maintenance of the per-player rollup table (PlayerSummary).
+
+Whenever stats or games are created or updated, the counters of the summaries of the players involved are incremented
+in place, with F() expressions. Summaries are only recomputed from the players' stats (through the (player, score)
+index) and games when something is deleted or removed, or when a best score may have gone down, since the next best
+score is unknown at that point. Reading a summary is a single primary key lookup.
+"""
+from django.db.models import Case, Count, F, Max, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from .models import Game, Player, PlayerSummary, Stat
+from . import bulk, ranks
+
+SUMMARY_FIELDS = ["stats_count", "scored_stats_count", "total_score", "best_score", "games_played", "wins"]
+
+# Number of players whose summaries are recomputed together when rebuilding.
+REBUILD_BATCH_SIZE = 1000
+
+
+def compute(player_ids):
+    """
+    Computes the summaries of the given players from their stats and games.
+
+    Returns:
+    dict: Unsaved PlayerSummary instances, by player id, for the players that exist.
+    """
+    summaries = {
+        player_id: PlayerSummary(player_id=player_id)
+        for player_id in Player.objects.filter(id__in=player_ids).values_list("id", flat=True)
+    }
+    stats = Stat.objects.filter(player_id__in=list(summaries)).values("player_id").annotate(
+        stats_count=Count("id"), scored_stats_count=Count("score"), total_score=Sum("score"), best_score=Max("score"))
+    for row in stats:
+        summary = summaries[row.pop("player_id")]
+        row["total_score"] = row["total_score"] or 0
+        for field, value in row.items():
+            setattr(summary, field, value)
+
+    games = Game.players.through.objects.filter(player_id__in=list(summaries)).values("player_id").annotate(
+        count=Count("id"))
+    for row in games:
+        summaries[row["player_id"]].games_played = row["count"]
+
+    wins = Game.objects.filter(winner_id__in=list(summaries)).values("winner_id").annotate(count=Count("id"))
+    for row in wins:
+        summaries[row["winner_id"]].wins = row["count"]
+    return summaries
+
+
+def refresh(player_ids, create=True, update_ranks=True):
+    """
+    Recomputes and saves the summaries of the given players. With `create=False`, only existing summaries are updated:
+    this is used while deleting rows, when the player itself (and its summary) may be in the process of being deleted.
+    Unless `update_ranks` is False, the counts of the best scores that changed are refreshed too (see `ranks`).
+
+    Returns:
+    list: The saved PlayerSummary instances.
+    """
+    player_ids = {player_id for player_id in player_ids if player_id is not None}
+    if not player_ids:
+        return []
+    previous_best_scores = dict(PlayerSummary.objects.filter(player_id__in=player_ids)
+                                .values_list("player_id", "best_score"))
+    if not create:
+        summaries = list(compute(list(previous_best_scores)).values())
+        PlayerSummary.objects.bulk_update(summaries, SUMMARY_FIELDS)
+    else:
+        summaries = list(compute(player_ids).values())
+        bulk.upsert(PlayerSummary, summaries, ["player"], SUMMARY_FIELDS)
+
+    if update_ranks:
+        changed_scores = set()
+        for summary in summaries:
+            previous_best_score = previous_best_scores.get(summary.player_id)
+            if summary.best_score != previous_best_score:
+                changed_scores |= {summary.best_score, previous_best_score}
+        ranks.refresh(changed_scores)
+    return summaries
+
+
+def increment(deltas):
+    """
+    Adds to the counters of the given players' summaries, raising their best scores to the given ones if higher, in a
+    single update. Players without a summary yet have theirs computed from scratch instead. The counts of the best scores
+    that changed are refreshed too (see `ranks`).
+
+    Parameters:
+    deltas (dict): By player id, the amounts to add to each counter of SUMMARY_FIELDS (other than "best_score"), and
+    optionally a "best_score" the player has reached.
+    """
+    deltas = {player_id: player_deltas for player_id, player_deltas in deltas.items() if player_id is not None}
+    if not deltas:
+        return
+    previous_best_scores = dict(PlayerSummary.objects.filter(player_id__in=list(deltas))
+                                .values_list("player_id", "best_score"))
+    missing = set(deltas) - set(previous_best_scores)
+    if missing:
+        refresh(missing)
+
+    present = [player_id for player_id in deltas if player_id in previous_best_scores]
+    updates = {}
+    for field in SUMMARY_FIELDS:
+        if field == "best_score":
+            whens = [When(player_id=player_id, then=Greatest(Coalesce(field, Value(score)), Value(score)))
+                     for player_id in present if (score := deltas[player_id].get(field)) is not None]
+            if whens:
+                updates[field] = Case(*whens, default=F(field))
+        else:
+            whens = [When(player_id=player_id, then=Value(deltas[player_id][field]))
+                     for player_id in present if deltas[player_id].get(field)]
+            if whens:
+                updates[field] = F(field) + Case(*whens, default=Value(0))
+    if updates:
+        PlayerSummary.objects.filter(player_id__in=present).update(**updates)
+
+    changed_scores = set()
+    for player_id in present:
+        best_score, previous_best_score = deltas[player_id].get("best_score"), previous_best_scores[player_id]
+        if best_score is not None and (previous_best_score is None or best_score > previous_best_score):
+            changed_scores |= {best_score, previous_best_score}
+    ranks.refresh(changed_scores)
+
+
+def get_stat_deltas(score):
+    """
+    Returns the amounts a stat with the given score adds to its player's counters.
+    """
+    return {"stats_count": 1, "scored_stats_count": int(score is not None), "total_score": score or 0}
+
+
+def stats_created(stats):
+    """
+    Updates the summaries of the players of the given stats after they have been created.
+    """
+    deltas = {}
+    for stat in stats:
+        player_deltas = deltas.setdefault(stat.player_id, {"best_score": None})
+        for field, delta in get_stat_deltas(stat.score).items():
+            player_deltas[field] = player_deltas.get(field, 0) + delta
+        if stat.score is not None:
+            player_deltas["best_score"] = max(player_deltas["best_score"] or 0, stat.score)
+    increment(deltas)
+
+
+def stat_updated(stat, previous_player_id, previous_score):
+    """
+    Updates the summaries of the players of a stat after it has been updated. A stat moved to another player is
+    recomputed out of its previous player's summary, and so is a stat whose score went down, as it may have been its
+    player's best.
+    """
+    if previous_player_id != stat.player_id:
+        stats_created([stat])
+        refresh([previous_player_id])
+    elif previous_score is not None and (stat.score is None or stat.score < previous_score):
+        refresh([stat.player_id])
+    elif stat.score != previous_score:
+        new, old = get_stat_deltas(stat.score), get_stat_deltas(previous_score)
+        increment({stat.player_id: {field: new[field] - old[field] for field in new} | {"best_score": stat.score}})
+
+
+def rebuild():
+    """
+    Rebuilds the summaries of every player, and the counts of their best scores, from scratch.
+    """
+    PlayerSummary.objects.all().delete()
+    player_ids = Player.objects.order_by("id").values_list("id", flat=True)
+    last_id = 0
+    while batch := list(player_ids.filter(id__gt=last_id)[:REBUILD_BATCH_SIZE]):
+        refresh(batch, update_ranks=False)
+        last_id = batch[-1]
+    ranks.rebuild()
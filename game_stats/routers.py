@@ -0,0 +1,190 @@
+"""
+Database router sending the reads of game_stats views to read replicas of the primary database ("default").
+
+While a safe request (GET, HEAD or OPTIONS) to a game_stats view is handled (see
+`middleware.ReplicaRoutingMiddleware`), its reads go to one of the DATABASE_REPLICAS, picked at random for each request.
+Everything else goes to the primary: writes, the reads of other requests, reads outside of requests (Celery tasks,
+commands), and the reads of a request once it has written something.
+
+Replicas lag behind the primary, by up to REPLICA_PIN_SECONDS, so a client that has just written something would not
+always read it back. Clients that write are therefore pinned to the primary for that long: pins are kept in the cache,
+by client (its credentials, or its address when it has none), and only checked by requests that read from the database.
+Views caching what they read under versions don't cache what they read from a replica within that time after the data
+was written either (see `caching.is_settled`).
+
+Streamed responses (e.g. the exports) read the database while their body is sent, after the middleware has returned:
+their reads are routed like those of their request too (see `route_stream`). Replicas get their schema by replication,
+so migrations are only applied to the primary.
+"""
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# Seconds during which a client that has written is pinned to the primary, unless set by REPLICA_PIN_SECONDS.
+PIN_SECONDS = 5
+
+
+def get_pin_seconds():
+    """
+    Returns the number of seconds replicas may lag behind the primary, during which clients that have written are
+    pinned to it (the REPLICA_PIN_SECONDS setting).
+    """
+    return getattr(settings, "REPLICA_PIN_SECONDS", PIN_SECONDS)
+
+
+def get_replicas():
+    """
+    Returns the aliases of the read replicas (the DATABASE_REPLICAS setting).
+    """
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def get_client_key(request):
+    """
+    Returns the cache key of the pin of the client sending a request, identified by its credentials (JWT or session),
+    or by its address. Credentials are hashed, so they aren't kept in the cache.
+    """
+    client = request.headers.get("Authorization") or request.COOKIES.get(settings.SESSION_COOKIE_NAME) or \
+        request.META.get("REMOTE_ADDR", "")
+    return "replica-pin:" + hashlib.sha256(client.encode()).hexdigest()
+
+
+class RequestRouting:
+    """
+    Routing of the queries of a request in progress: the replica its reads go to, if any, and whether it has written.
+    """
+    def __init__(self, request):
+        self.request = request
+        self.replica = None
+        self.written = False
+        self._pinned = None
+
+    def read_from_replica(self):
+        """
+        Sends the request's reads to one of the replicas (or to the primary, if its client turns out to be pinned).
+        """
+        replicas = get_replicas()
+        if replicas:
+            self.replica = random.choice(replicas)
+
+    def get_read_database(self):
+        """
+        Returns the alias of the replica the request reads from, or None to read from the primary.
+        """
+        if self.replica is None or self.written:
+            return None
+        if self._pinned is None:
+            self._pinned = cache.get(get_client_key(self.request)) is not None
+        return None if self._pinned else self.replica
+
+    def pin(self):
+        """
+        Pins the request's client to the primary, if the request has written.
+        """
+        if self.written:
+            cache.set(get_client_key(self.request), True, timeout=get_pin_seconds())
+
+
+_current = ContextVar("request_routing", default=None)
+
+
+def get_current():
+    """
+    Returns the routing of the request being handled, or None outside of requests.
+    """
+    return _current.get()
+
+
+def get_read_database():
+    """
+    Returns the alias of the replica the request being handled reads from, or None if it reads from the primary.
+    """
+    routing = _current.get()
+    return routing.get_read_database() if routing is not None else None
+
+
+@contextmanager
+def use_routing(routing):
+    """
+    Makes the given routing current while the block runs, yielding it.
+    """
+    token = _current.set(routing)
+    try:
+        yield routing
+    finally:
+        _current.reset(token)
+
+
+def route_request(request):
+    """
+    Makes a new routing for the request current while the block runs, yielding it.
+    """
+    return use_routing(RequestRouting(request))
+
+
+def route_stream(routing, content):
+    """
+    Returns an iterator over the given streamed response body (sync or async) whose reads are routed with the given
+    routing, which is only current while each chunk is produced.
+    """
+    if hasattr(content, "__aiter__"):
+        return _route_async_stream(routing, aiter(content))
+    return _route_sync_stream(routing, iter(content))
+
+
+def _route_sync_stream(routing, iterator):
+    end = object()
+    while True:
+        with use_routing(routing):
+            chunk = next(iterator, end)
+        if chunk is end:
+            return
+        yield chunk
+
+
+async def _route_async_stream(routing, iterator):
+    end = object()
+    while True:
+        with use_routing(routing):
+            chunk = await anext(iterator, end)
+        if chunk is end:
+            return
+        yield chunk
+
+
+class ReplicaRouter:
+    """
+    Routes the reads of safe requests to game_stats views to the replicas, and everything else to the primary.
+    """
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        database = routing.get_read_database() if routing is not None else None
+        # The relations of objects read from a replica are read from the primary too, when reads go to the primary.
+        if database is None and self.is_on_replica(hints.get("instance")):
+            return DEFAULT_DB_ALIAS
+        return database
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None:
+            routing.written = True
+        # Objects read from a replica are written to the primary.
+        return DEFAULT_DB_ALIAS if self.is_on_replica(hints.get("instance")) else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary, so objects read from any of them can be related.
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+    @staticmethod
+    def is_on_replica(instance):
+        return instance is not None and instance._state.db in get_replicas()
@@ -1,16 +1,66 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Player, Stat, Game
+from .models import Player, Stat, Game, PlayerSummary
 from django.contrib.auth.models import User
+from . import metrics
 
 # TODO: handle duplicate entries and add more validations.
 
-class PlayerSerializer(serializers.ModelSerializer):
+
+class TimedListSerializer(serializers.ListSerializer):
+    """
+    List serializer counting the time spent serializing its instances as serialization time of the current request
+    (see `metrics`).
+    """
+    @property
+    def data(self):
+        with metrics.measure_serialization():
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Counts the time spent serializing instances as serialization time of the current request (see `metrics`). Lists
+    are timed by setting `list_serializer_class = TimedListSerializer` in the serializer's Meta.
+    """
+    @property
+    def data(self):
+        with metrics.measure_serialization():
+            return super().data
+
+
+class PlayerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Player model.
     """
     class Meta:
         model = Player
         fields = "__all__"
+        list_serializer_class = TimedListSerializer
+
+    representation_fields = ["id", "nickname", "profile_image", "user"]
+    # Relations whose representation can be nested instead of their id (see `represent_values`).
+    expandable = []
+    # Column of each field, as read by `represent_values`.
+    values_columns = {"id": "id", "nickname": "nickname", "profile_image": "profile_image", "user": "user_id"}
+
+    @classmethod
+    def get_values_fields(cls, fields=None, expand=None):
+        """
+        Returns the columns read by `represent_values` to build the given fields (all by default). The id is always
+        read, e.g. for pagination.
+        """
+        return ["id"] + [cls.values_columns[name] for name in select_fields(cls.representation_fields, fields)
+                         if name != "id"]
+
+    @classmethod
+    def represent_values(cls, rows, fields=None, expand=None):
+        """
+        Builds the representations of players, with the given fields (all by default), from their columns (rows of a
+        `values()` queryset, see `get_values_fields`), as the serializer would, without creating model instances.
+        """
+        columns = [(name, cls.values_columns[name]) for name in select_fields(cls.representation_fields, fields)]
+        return [{name: row[column] for name, column in columns} for row in rows]
 
     def validate_nickname(self, value):
         """
@@ -23,13 +73,145 @@ class PlayerSerializer(serializers.ModelSerializer):
         return value
 
 
-class GameSerializer(serializers.ModelSerializer):
+def select_fields(names, fields):
+    """
+    Returns the names that are among the given fields (all of them if no fields are given), in their order.
+    """
+    return [name for name in names if fields is None or name in fields]
+
+
+def get_player_columns(relation):
+    """
+    Returns the columns of the player of a relation (e.g. "game__winner"), in the order `player_values_representation`
+    reads them.
+    """
+    return [f"{relation}_id", f"{relation}__nickname", f"{relation}__profile_image", f"{relation}__user_id"]
+
+
+def player_values_representation(representations, row, columns):
+    """
+    Builds the representation of a player nested in a game or stat from its id, nickname, profile image and user id,
+    read from `row` (a dict or tuple) at the given columns, or returns None without a player. Representations are kept
+    by id in `representations`, so each player is built only once per request.
+    """
+    player_id = row[columns[0]]
+    if player_id is None:
+        return None
+    representation = representations.get(player_id)
+    if representation is None:
+        representation = representations[player_id] = {"id": player_id, "nickname": row[columns[1]],
+                                                        "profile_image": row[columns[2]], "user": row[columns[3]]}
+    return representation
+
+
+def player_representation(player, context):
+    """
+    Serializes a player nested in a game or stat. Representations are cached in the serializer context, which is shared
+    by all the serializers of a request, so each player is serialized only once per request.
+    """
+    cache = context.setdefault("player_representations", {})
+    if player.pk not in cache:
+        cache[player.pk] = PlayerSerializer(player).data
+    return cache[player.pk]
+
+
+class GameSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Game model.
     """
     class Meta:
         model = Game
         fields = "__all__"
+        list_serializer_class = TimedListSerializer
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Loads the players and winner of every game in a fixed number of queries, so that `to_representation` doesn't
+        query the database once per game.
+        """
+        return queryset.select_related("winner").prefetch_related(
+            Prefetch("players", queryset=Player.objects.order_by("id")))
+
+    representation_fields = ["id", "winner", "players"]
+    # Relations whose representation can be nested instead of their id (see `represent_values`).
+    expandable = ["winner", "players"]
+
+    @staticmethod
+    def get_values_fields(fields=None, expand=None, relation=None):
+        """
+        Returns the columns read by `represent_values` to build the given fields (all by default) with the given
+        relations expanded (all by default), from the games' table or, for games nested in another model, through the
+        given relation (e.g. "game"). The id is always read, e.g. for pagination. Players are read separately (see
+        `get_players_values`).
+        """
+        prefix = f"{relation}__" if relation else ""
+        columns = [prefix + "id"]
+        if fields is None or "winner" in fields:
+            winner_columns = get_player_columns(prefix + "winner")
+            columns += winner_columns if expand is None or "winner" in expand else winner_columns[:1]
+        return columns
+
+    @staticmethod
+    def get_players_values(game_ids, representations, expand=True):
+        """
+        Reads the players of the given games in a single query and, if they are expanded, builds their representations
+        (see `player_values_representation`).
+
+        Returns:
+        dict: The lists of representations (or ids) of the games' players, in id order, by game id.
+        """
+        players = {game_id: [] for game_id in game_ids}
+        rows = Game.players.through.objects.filter(game_id__in=players).order_by("game_id", "player_id")
+        if expand:
+            columns = range(1, 5)
+            for row in rows.values_list("game_id", *get_player_columns("player")):
+                players[row[0]].append(player_values_representation(representations, row, columns))
+        else:
+            for game_id, player_id in rows.values_list("game_id", "player_id"):
+                players[game_id].append(player_id)
+        return players
+
+    @classmethod
+    def get_values_builder(cls, fields=None, expand=None, relation=None):
+        """
+        Returns a function building the representation of a game, with the given fields (all by default) and relations
+        expanded (all by default), from a row of its columns (see `get_values_fields`), the players of the games (see
+        `get_players_values`) and the player representations already built.
+        """
+        prefix = f"{relation}__" if relation else ""
+        names = select_fields(cls.representation_fields, fields)
+        id_column = prefix + "id"
+        winner_columns = get_player_columns(prefix + "winner")
+        expand_winner = expand is None or "winner" in expand
+
+        def build(row, players, representations):
+            game = {}
+            if "id" in names:
+                game["id"] = row[id_column]
+            if "winner" in names:
+                game["winner"] = player_values_representation(representations, row, winner_columns) \
+                    if expand_winner else row[winner_columns[0]]
+            if "players" in names:
+                game["players"] = players[row[id_column]]
+            return game
+        return build
+
+    @classmethod
+    def represent_values(cls, rows, fields=None, expand=None):
+        """
+        Builds the representations of games, with the given fields (all by default) and relations expanded (all by
+        default), from their columns (rows of a `values()` queryset, see `get_values_fields`), as the serializer would,
+        without creating model instances. Their players, if shown, are read with one more query.
+        """
+        rows = list(rows)
+        representations = {}
+        players = {}
+        if fields is None or "players" in fields:
+            players = cls.get_players_values([row["id"] for row in rows], representations,
+                                             expand is None or "players" in expand)
+        build = cls.get_values_builder(fields, expand)
+        return [build(row, players, representations) for row in rows]
 
     def validate(self, data):
         """
@@ -54,24 +236,106 @@ class GameSerializer(serializers.ModelSerializer):
         representation = super().to_representation(instance)
         players_instances = instance.players.all()
         if players_instances:
-            representation["players"] = [PlayerSerializer(player).data for player in players_instances]
+            representation["players"] = [player_representation(player, self.context) for player in players_instances]
         else:
             representation["players"] = []
         winner_instance = instance.winner
         if winner_instance is not None:
-            representation["winner"] = PlayerSerializer(winner_instance).data
+            representation["winner"] = player_representation(winner_instance, self.context)
         else:
             representation["winner"] = None
         return representation
 
 
-class StatSerializer(serializers.ModelSerializer):
+class StatSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Stat model.
     """
     class Meta:
         model = Stat
         fields = "__all__"
+        list_serializer_class = TimedListSerializer
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Loads the related player and game (including the game's players and winner) of every stat in a fixed number
+        of queries, so that `to_representation` doesn't query the database once per stat.
+        """
+        return queryset.select_related("player", "game__winner").prefetch_related(
+            Prefetch("game__players", queryset=Player.objects.order_by("id")))
+
+    representation_fields = ["id", "creation_date", "score", "player", "game"]
+    # Relations whose representation can be nested instead of their id (see `represent_values`). The game's relations
+    # can only be expanded along with the game.
+    expandable = ["player", "game", "game.winner", "game.players"]
+
+    @staticmethod
+    def get_game_expand(expand):
+        """
+        Returns the relations of the stats' games to expand, out of the stats' relations to expand.
+        """
+        return None if expand is None else [path.split(".", 1)[1] for path in expand if path.startswith("game.")]
+
+    @classmethod
+    def get_values_fields(cls, fields=None, expand=None):
+        """
+        Returns the columns read by `represent_values` to build the given fields (all by default) with the given
+        relations expanded (all by default). The id is always read, e.g. for pagination.
+        """
+        columns = ["id"] + select_fields(["creation_date", "score"], fields)
+        if fields is None or "player" in fields:
+            player_columns = get_player_columns("player")
+            columns += player_columns if expand is None or "player" in expand else player_columns[:1]
+        if fields is None or "game" in fields:
+            if expand is None or "game" in expand:
+                columns += GameSerializer.get_values_fields(expand=cls.get_game_expand(expand), relation="game")
+            else:
+                columns.append("game_id")
+        return columns
+
+    @classmethod
+    def represent_values(cls, rows, fields=None, expand=None):
+        """
+        Builds the representations of stats, with the given fields (all by default) and relations expanded (all by
+        default), from their columns (rows of a `values()` queryset, see `get_values_fields`), as the serializer would,
+        without creating model instances. The players of their games, if shown, are read with one more query.
+        """
+        rows = list(rows)
+        representations = {}
+        names = select_fields(cls.representation_fields, fields)
+        player_columns = get_player_columns("player")
+        expand_player = expand is None or "player" in expand
+        expand_game = expand is None or "game" in expand
+        if "game" in names and expand_game:
+            game_expand = cls.get_game_expand(expand)
+            build_game = GameSerializer.get_values_builder(expand=game_expand, relation="game")
+            game_ids = {row["game__id"] for row in rows} - {None}
+            game_players = GameSerializer.get_players_values(game_ids, representations,
+                                                             game_expand is None or "players" in game_expand)
+
+        stats = []
+        for row in rows:
+            stat = {}
+            if "id" in names:
+                stat["id"] = row["id"]
+            if "creation_date" in names:
+                stat["creation_date"] = row["creation_date"].strftime("%Y-%m-%d %H:%M:%S")
+            if "score" in names:
+                stat["score"] = row["score"]
+            if "player" in names:
+                stat["player"] = player_values_representation(representations, row, player_columns) \
+                    if expand_player else row["player_id"]
+            if "game" in names:
+                if not expand_game:
+                    stat["game"] = row["game_id"]
+                elif row["game__id"] is None:
+                    # What the game serializer outputs without a game.
+                    stat["game"] = {"winner": None, "players": []}
+                else:
+                    stat["game"] = build_game(row, game_players, representations)
+            stats.append(stat)
+        return stats
 
     def validate(self, data):
         """
@@ -90,17 +354,108 @@ class StatSerializer(serializers.ModelSerializer):
         to its serialized value. Also shows creation_date in the "%Y-%m-%d %H:%M:%S" format.
         """
         representation = super().to_representation(instance)
-        representation["player"] = PlayerSerializer(instance.player).data
+        representation["player"] = player_representation(instance.player, self.context)
         creation_date = instance.creation_date.strftime("%Y-%m-%d %H:%M:%S")
         representation["creation_date"] = creation_date
-        representation["game"] = GameSerializer(instance.game).data
+        representation["game"] = GameSerializer(instance.game, context=self.context).data
         return representation
 
 
-class UserSerializer(serializers.ModelSerializer):
+class BulkStatSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the stats created in bulk. Players and games are given as ids, which `validate_many` checks for all
+    the stats at once instead of once per stat.
+    """
+    player = serializers.IntegerField()
+    # The score column is an unsigned int on MySQL, whose range the single stat serializer gets from the model field.
+    score = serializers.IntegerField(min_value=0, max_value=4294967295, required=False, allow_null=True)
+    game = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Stat
+        fields = ["player", "score", "game"]
+
+    @classmethod
+    def validate_fields(cls, items):
+        """
+        Validates the fields of each stat of a list, without checking their players and games.
+
+        Returns:
+        tuple: The list of validated stats (None for invalid ones), and the list of errors of each stat (empty for
+        valid ones).
+        """
+        serializer = cls()
+        stats, errors = [], []
+        for item in items:
+            try:
+                stats.append(serializer.run_validation(item))
+                errors.append({})
+            except serializers.ValidationError as error:
+                stats.append(None)
+                errors.append(error.detail)
+        return stats, errors
+
+    @staticmethod
+    def validate_relations(stats, errors):
+        """
+        Validates that the players and games of stats with valid fields (see `validate_fields`) exist and that each
+        player is included in its game's players list, looking up all the players in one query and all the games (with
+        their players) in another. Invalid stats are replaced with None in `stats`, and their errors set in `errors`.
+        """
+        valid_stats = [stat for stat in stats if stat is not None]
+        player_ids = set(Player.objects.filter(id__in={stat["player"] for stat in valid_stats})
+                         .values_list("id", flat=True))
+        game_players = {}
+        games = Game.objects.filter(id__in={stat["game"] for stat in valid_stats if stat.get("game") is not None})
+        for game_id, player_id in games.values_list("id", "players"):
+            game_players.setdefault(game_id, set()).add(player_id)
+
+        invalid_pk = serializers.PrimaryKeyRelatedField.default_error_messages["does_not_exist"]
+        for index, stat in enumerate(stats):
+            if stat is None:
+                continue
+            game_id = stat.get("game")
+            if stat["player"] not in player_ids:
+                errors[index] = {"player": [invalid_pk.format(pk_value=stat["player"])]}
+            elif game_id is not None and game_id not in game_players:
+                errors[index] = {"game": [invalid_pk.format(pk_value=game_id)]}
+            elif game_id is not None and stat["player"] not in game_players[game_id]:
+                errors[index] = {"non_field_errors": ["Player must be included in the game's players list."]}
+            else:
+                continue
+            stats[index] = None
+
+    @classmethod
+    def validate_many(cls, items):
+        """
+        Validates a list of stats: their fields, then their players and games (see `validate_relations`).
+
+        Returns:
+        tuple: The list of validated stats (None for invalid ones), and the list of errors of each stat (empty for
+        valid ones).
+        """
+        stats, errors = cls.validate_fields(items)
+        cls.validate_relations(stats, errors)
+        return stats, errors
+
+
+class PlayerSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for the PlayerSummary model (read-only).
+    """
+    average_score = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = PlayerSummary
+        fields = ["player", "stats_count", "total_score", "average_score", "best_score", "games_played", "wins"]
+        read_only_fields = fields
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the User model.
     """
     class Meta:
         model = User
         fields = ["id", "username", "email", "password", "first_name", "last_name", "is_active", "date_joined"]
+        list_serializer_class = TimedListSerializer
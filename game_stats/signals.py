@@ -0,0 +1,166 @@
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.dispatch import receiver, Signal
+from .models import Player, Stat, Game, PlayerSummary
+from . import caching, leaderboard, ranks, rollups
+
+# Sent after stats have been created with bulk_create, which doesn't send post_save. Receives the created stats (whose
+# ids may be unknown) as `stats`.
+stats_bulk_created = Signal()
+
+
+@receiver(post_save, sender=Stat)
+def update_leaderboard_on_save(sender, instance, **kwargs):
+    """
+    Keeps the leaderboard up to date when a stat is created or updated.
+    """
+    leaderboard.offer(instance)
+
+
+@receiver(post_delete, sender=Stat)
+def update_leaderboard_on_delete(sender, instance, **kwargs):
+    """
+    Keeps the leaderboard up to date when a stat is deleted.
+    """
+    leaderboard.withdraw(instance)
+
+
+@receiver(post_save, sender=Player)
+def invalidate_rankings_on_player_save(sender, instance, created, **kwargs):
+    """
+    Invalidates the cached rankings listing a player when it is updated, since they show its nickname.
+    """
+    if not created:
+        leaderboard.player_changed(instance)
+
+
+@receiver(pre_save, sender=Stat)
+def remember_previous_stat_player(sender, instance, **kwargs):
+    """
+    Remembers the player and score of an updated stat, which its player's summary must be updated from.
+    """
+    previous = Stat.objects.filter(pk=instance.pk).values_list("player_id", "score").first() if instance.pk else None
+    instance._previous_player_id, instance._previous_score = previous or (None, None)
+    instance._existed = previous is not None
+
+
+@receiver(post_save, sender=Stat)
+def update_player_summaries_on_stat_save(sender, instance, **kwargs):
+    """
+    Keeps the summaries of the stat's players up to date when a stat is created or updated.
+    """
+    if getattr(instance, "_existed", False):
+        rollups.stat_updated(instance, instance._previous_player_id, instance._previous_score)
+    else:
+        rollups.stats_created([instance])
+
+
+@receiver(post_delete, sender=Stat)
+def update_player_summaries_on_stat_delete(sender, instance, **kwargs):
+    """
+    Keeps the summary of the stat's player up to date when a stat is deleted.
+    """
+    rollups.refresh([instance.player_id], create=False)
+
+
+@receiver(pre_delete, sender=Player)
+def remember_deleted_player_best_score(sender, instance, **kwargs):
+    """
+    Remembers the best score of a player about to be deleted, since its summary is deleted along with it.
+    """
+    instance._deleted_best_score = PlayerSummary.objects.filter(player=instance).values_list("best_score", flat=True) \
+        .first()
+
+
+@receiver(post_delete, sender=Player)
+def update_ranks_on_player_delete(sender, instance, **kwargs):
+    """
+    Keeps the counts of best scores up to date when a player (and its summary) is deleted.
+    """
+    ranks.refresh([getattr(instance, "_deleted_best_score", None)])
+
+
+@receiver(pre_save, sender=Game)
+def remember_previous_winner(sender, instance, **kwargs):
+    """
+    Remembers the winner of an updated game, whose summary must be refreshed too if it changes.
+    """
+    instance._previous_winner_id = Game.objects.filter(pk=instance.pk).values_list("winner_id", flat=True).first() \
+        if instance.pk else None
+
+
+@receiver(post_save, sender=Game)
+def update_player_summaries_on_game_save(sender, instance, **kwargs):
+    """
+    Keeps the wins of the game's winners up to date when a game is created or updated.
+    """
+    previous_winner_id = getattr(instance, "_previous_winner_id", None)
+    if instance.winner_id != previous_winner_id:
+        rollups.increment({instance.winner_id: {"wins": 1}, previous_winner_id: {"wins": -1}})
+
+
+@receiver(pre_delete, sender=Game)
+def remember_deleted_game_players(sender, instance, **kwargs):
+    """
+    Remembers the players of a game about to be deleted, since its players list is deleted along with it.
+    """
+    instance._deleted_player_ids = set(instance.players.values_list("id", flat=True)) | {instance.winner_id}
+
+
+@receiver(post_delete, sender=Game)
+def update_player_summaries_on_game_delete(sender, instance, **kwargs):
+    """
+    Keeps the summaries of the game's players up to date when a game is deleted.
+    """
+    rollups.refresh(getattr(instance, "_deleted_player_ids", {instance.winner_id}), create=False)
+
+
+@receiver(m2m_changed, sender=Game.players.through)
+def update_player_summaries_on_game_players_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keeps the summaries of the players added to or removed from a game up to date.
+    """
+    # pk_set only holds the ids actually added, so additions are counted in place.
+    if reverse:
+        # The players list was changed from the player's side (instance is a player, pk_set holds game ids).
+        if action == "post_add":
+            rollups.increment({instance.pk: {"games_played": len(pk_set)}})
+        elif action in ["post_remove", "post_clear"]:
+            rollups.refresh([instance.pk])
+    elif action == "pre_clear":
+        instance._cleared_player_ids = set(instance.players.values_list("id", flat=True))
+    elif action == "post_clear":
+        rollups.refresh(getattr(instance, "_cleared_player_ids", set()))
+    elif action == "post_add":
+        rollups.increment({player_id: {"games_played": 1} for player_id in pk_set})
+    elif action == "post_remove":
+        rollups.refresh(pk_set)
+
+
+@receiver([post_save, post_delete], sender=Player)
+@receiver([post_save, post_delete], sender=Game)
+@receiver([post_save, post_delete], sender=Stat)
+def bump_collection_version(sender, **kwargs):
+    """
+    Bumps the version of the written model's collection, so the list views stop answering 304 (Not Modified).
+    """
+    caching.bump_version(f"collection:{sender._meta.model_name}")
+
+
+@receiver(m2m_changed, sender=Game.players.through)
+def bump_games_version_on_players_change(sender, action, **kwargs):
+    """
+    Bumps the version of the games collection when the players of a game change.
+    """
+    if action in ["post_add", "post_remove", "post_clear"]:
+        caching.bump_version("collection:game")
+
+
+@receiver(stats_bulk_created, sender=Stat)
+def update_derived_tables_on_bulk_create(sender, stats, **kwargs):
+    """
+    Keeps the leaderboards, the summaries of the stats' players and the stats version up to date when stats are created
+    in bulk.
+    """
+    leaderboard.offer_many(stats)
+    rollups.stats_created(stats)
+    caching.bump_version("collection:stat")
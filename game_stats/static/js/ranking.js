@@ -1,10 +1,24 @@
+// keeps the page's query parameters (e.g. the ranking's time window: ?window=day)
+const rankingUrl = '/stats/ranking/' + window.location.search;
+const rankingStreamUrl = '/stats/ranking/stream/' + window.location.search;
+
+function showRanking(data) {
+    $('#ranking-container').html(renderRanking(data));
+    $('#last-updated').text('Last updated: ' + new Date().toLocaleTimeString());
+}
+
 function updateRanking() {
     $.ajax({
-        url: '/stats/ranking/',
+        url: rankingUrl,
         method: 'GET',
-        success: function (data) {
-            $('#ranking-container').html(renderRanking(data));
-            $('#last-updated').text('Last updated: ' + new Date().toLocaleTimeString());
+        // sends the ETag of the last ranking received: unchanged rankings get an empty 304 response
+        ifModified: true,
+        success: function (data, status) {
+            if (status === 'notmodified') {
+                $('#last-updated').text('Last updated: ' + new Date().toLocaleTimeString());
+            } else {
+                showRanking(data);
+            }
         },
         error: function (error) {
             console.error('Error fetching ranking:', error);
@@ -12,6 +26,33 @@ function updateRanking() {
     });
 }
 
+function pollRanking() {
+    updateRanking();
+    // updates every 10 seconds
+    setInterval(updateRanking, 10000);
+}
+
+// receives the ranking whenever it changes, falling back to polling when streaming isn't available
+function streamRanking() {
+    if (!window.EventSource) {
+        pollRanking();
+        return;
+    }
+    // EventSource can't send the Authorization header: the stream, like the ranking, authenticates the browser's
+    // session cookie, which it sends along
+    const source = new EventSource(rankingStreamUrl);
+    source.addEventListener('ranking', function (event) {
+        showRanking(JSON.parse(event.data));
+    });
+    source.onerror = function () {
+        // the browser reconnects by itself after network errors, but gives up on error responses
+        if (source.readyState === EventSource.CLOSED) {
+            console.error('Ranking stream unavailable, polling instead.');
+            pollRanking();
+        }
+    };
+}
+
 function renderRanking(data) {
     let html = '';
     data.forEach(function (stat, index) {
@@ -22,7 +63,7 @@ function renderRanking(data) {
 
 function exportToCSV() {
     $.ajax({
-        url: '/stats/ranking/',
+        url: rankingUrl,
         method: 'GET',
         headers: {
             'Accept': 'text/csv',
@@ -51,8 +92,5 @@ function exportToCSV() {
 
 
 
-// initial update (on page load)
-updateRanking();
-
-// updates every 10 seconds
-setInterval(updateRanking, 10000);
\ No newline at end of file
+// starts receiving updates (on page load)
+streamRanking();
\ No newline at end of file
@@ -2,6 +2,7 @@ from celery import shared_task
 from django.core.management import call_command
 from django.conf import settings
 from django.db import connections
+from game_stats import analytics, ingest, leaderboard
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,3 +20,34 @@ def simulate_stats_task():
         logger.info("Task executed successfully.")
     except Exception as e:
         logger.error(f"Task failed with error: {e}")
+
+
+@shared_task
+def expire_leaderboard_buckets_task():
+    """
+    Deletes the leaderboards of past days, weeks and months.
+    """
+    deleted = leaderboard.expire_buckets()
+    logger.info(f"Expired {deleted} leaderboard entries.")
+
+
+@shared_task
+def flush_stat_queue_task():
+    """
+    Creates the stats of the queued submissions.
+    """
+    created = ingest.flush()
+    logger.info(f"Flushed {created} queued stats.")
+
+
+@shared_task
+def refresh_analytics_task(window=None):
+    """
+    Refreshes the score analytics of a window, or of every window that is out of date.
+    """
+    if window is None:
+        windows = analytics.refresh_outdated()
+    else:
+        analytics.refresh(window)
+        windows = [window]
+    logger.info(f"Refreshed the score analytics of {windows}.")
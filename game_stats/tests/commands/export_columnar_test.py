@@ -0,0 +1,33 @@
+import os
+import tempfile
+from io import StringIO
+import pyarrow.parquet as pq
+from django.core.management import call_command
+from django.test import TestCase
+from game_stats.models import Player, Stat, User, Game
+
+
+class ExportColumnarTests(TestCase):
+    """
+    Tests for the export_columnar management command.
+    """
+    def test_export_columnar(self):
+        """
+        Tests that the command writes a file per table with every row.
+        """
+        user = User.objects.create(username="test_user", password="test_password")
+        player = Player.objects.create(user=user, nickname="export_columnar_test_player")
+        game = Game.objects.create(winner=player)
+        game.players.set([player])
+        for score in [30, 10, 20]:
+            Stat.objects.create(player=player, game=game, score=score)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            out = StringIO()
+            call_command("export_columnar", output_dir=output_dir, chunk_size=2, stdout=out)
+
+            self.assertEqual(sorted(os.listdir(output_dir)), ["games.parquet", "players.parquet", "stats.parquet"])
+            self.assertEqual(pq.read_table(os.path.join(output_dir, "stats.parquet")).column("score").to_pylist(),
+                             [30, 10, 20])
+            self.assertEqual(pq.read_table(os.path.join(output_dir, "players.parquet")).num_rows, 1)
+            self.assertIn("Exported 3 stats", out.getvalue())
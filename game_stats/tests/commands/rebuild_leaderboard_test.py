@@ -0,0 +1,40 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from game_stats.models import Player, Stat, User, LeaderboardEntry
+
+
+class RebuildLeaderboardTests(TestCase):
+    """
+    Tests for the rebuild_leaderboard management command.
+    """
+    def setUp(self):
+        """
+        Creates test data.
+        """
+        user = User.objects.create(username="test_user", password="test_password")
+        self.player = Player.objects.create(user=user, nickname="rebuild_leaderboard_test_player")
+        self.stats = [Stat.objects.create(player=self.player, score=score) for score in [30, 10, 20]]
+
+    def test_rebuild_leaderboard(self):
+        """
+        Tests that the command rebuilds an out of sync leaderboard and reports that it match the live queries.
+        """
+        LeaderboardEntry.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_leaderboard", stdout=out)
+
+        for period in LeaderboardEntry.Period:
+            self.assertEqual(list(LeaderboardEntry.objects.filter(period=period).values_list("score", flat=True)),
+                             [30, 20, 10])
+        self.assertIn("match the live queries", out.getvalue())
+
+    def test_check_only_reports_mismatches(self):
+        """
+        Tests that the command fails without rebuilding when the leaderboard differs from the live query.
+        """
+        LeaderboardEntry.objects.filter(stat=self.stats[0]).delete()
+        with self.assertRaises(CommandError):
+            call_command("rebuild_leaderboard", "--check-only", stdout=StringIO())
+        self.assertFalse(LeaderboardEntry.objects.filter(stat=self.stats[0]).exists())
@@ -0,0 +1,23 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from game_stats.models import Player, Stat, User, ScoreCount
+
+
+class RebuildPlayerRanksTests(TestCase):
+    """
+    Tests for the rebuild_player_ranks management command.
+    """
+    def test_rebuild_player_ranks(self):
+        """
+        Tests that the command recounts the players of every best score.
+        """
+        for i, score in enumerate([30, 30, 10]):
+            user = User.objects.create(username=f"test_user{i}", password="test_password")
+            Stat.objects.create(player=Player.objects.create(user=user, nickname=f"rebuild_ranks_test_player{i}"),
+                                score=score)
+        ScoreCount.objects.all().delete()
+
+        call_command("rebuild_player_ranks", stdout=StringIO())
+
+        self.assertEqual(dict(ScoreCount.objects.values_list("score", "players")), {30: 2, 10: 1})
@@ -0,0 +1,26 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from game_stats.models import Player, Stat, User, PlayerSummary
+
+
+class RebuildPlayerSummariesTests(TestCase):
+    """
+    Tests for the rebuild_player_summaries management command.
+    """
+    def test_rebuild_player_summaries(self):
+        """
+        Tests that the command rebuilds missing summaries for every player.
+        """
+        user = User.objects.create(username="test_user", password="test_password")
+        player = Player.objects.create(user=user, nickname="rebuild_summaries_test_player")
+        Stat.objects.create(player=player, score=30)
+        Stat.objects.create(player=player, score=10)
+        PlayerSummary.objects.all().delete()
+
+        call_command("rebuild_player_summaries", stdout=StringIO())
+
+        summary = PlayerSummary.objects.get(player=player)
+        self.assertEqual(summary.stats_count, 2)
+        self.assertEqual(summary.best_score, 30)
+        self.assertEqual(summary.average_score, 20)
@@ -1,31 +1,81 @@
+from django.core.management import call_command
 from django.test import TestCase
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
 from game_stats.models import Player, Stat, Game
+from game_stats import caching, leaderboard
 from game_stats.management.commands.simulate_stats import Command
-import requests
+import json
+import threading
+
+
+class RandomUserStubServer(ThreadingHTTPServer):
+    """
+    Local HTTP server stubbing the randomuser.me API: returns as many results as requested, all with the same username
+    (unless `unique_usernames` is set), or fails with `error_status` if set. Requests are recorded in `requests`.
+    """
+    def __init__(self, username="test_user", unique_usernames=False, error_status=None):
+        super().__init__(("127.0.0.1", 0), RandomUserStubHandler)
+        self.username = username
+        self.unique_usernames = unique_usernames
+        self.error_status = error_status
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class RandomUserStubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        results = int(query.get("results", ["1"])[0])
+        with self.server.lock:
+            offset = sum(self.server.requests)
+            self.server.requests.append(results)
+
+        if self.server.error_status:
+            self.send_response(self.server.error_status)
+            self.end_headers()
+            return
+
+        body = json.dumps({"results": [{
+            "login": {"username": f"{self.server.username}{offset + i}" if self.server.unique_usernames
+                      else self.server.username},
+            "picture": {"large": "https://example.com/test_image.jpg"},
+        } for i in range(results)]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
 
 
 class SimulateStatsTests(TestCase):
     """
     Tests for the simulate_stats management command.
     """
-    @patch('game_stats.management.commands.simulate_stats.requests.get')
-    def test_simulate_stats_command(self, mock_requests_get):
+    def test_simulate_stats_command(self):
         """
         Tests the simulate_stats command by running it and asserting the expected database records.
-        Mocks the requests.get() method to generate a new player without actual API calls during testing.
+        Uses a local server stubbing the randomuser.me API to generate a new player without actual API calls during
+        testing.
         """
-        mock_response = {
-            'results': [{
-                'login': {'username': 'test_user'},
-                'picture': {'large': 'https://example.com/test_image.jpg'},
-            }]
-        }
-        mock_requests_get.return_value.json.return_value = mock_response
-
-        # run simulate_stats script
-        command = Command()
-        command.handle()
+        with RandomUserStubServer() as server:
+            call_command("simulate_stats", "--api-url", server.url)
 
         player = Player.objects.latest('id')
         game = Game.objects.latest('id')
@@ -38,47 +88,41 @@ class SimulateStatsTests(TestCase):
 
         self.assertEqual(player.nickname, "test_user")
         self.assertEqual(player.profile_image, "https://example.com/test_image.jpg")
-        self.assertIn(game.winner, game.players.all())
+        # all the players are fetched with a single API call.
+        self.assertEqual(len(server.requests), 1)
+        # a game can randomly have no players (see test_simulate_stats_with_zero_players).
+        if game.players.exists():
+            self.assertIn(game.winner, game.players.all())
+            self.assertEqual(stat.game, game)
         self.assertEqual(stat.player, player)
-        self.assertEqual(stat.game, game)
         self.assertIsNotNone(stat.creation_date)
         self.assertIsNotNone(stat.score)
 
-    @patch('game_stats.management.commands.simulate_stats.requests.get')
-    def test_simulate_stats_exception_handling(self, mock_requests_get):
+    def test_simulate_stats_exception_handling(self):
         """
         Tests the simulate_stats command exception handling.
-        Mocks the requests.get() method to generate a new player without actual API calls during testing.
+        Uses a local server stubbing the randomuser.me API, which fails every call.
         """
-        mock_requests_get.side_effect = requests.exceptions.RequestException("Mocked API error")
-
-        # run simulate_stats script
-        command = Command()
-        command.handle()
+        with RandomUserStubServer(error_status=500) as server:
+            call_command("simulate_stats", "--api-url", server.url, "--retries", "0")
 
         # assert no data has been inserted in the database, due to an exception.
         self.assertEqual(Player.objects.count(), 0)
         self.assertEqual(Stat.objects.count(), 0)
         self.assertEqual(Game.objects.count(), 0)
 
-    @patch('game_stats.management.commands.simulate_stats.requests.get')
     @patch('game_stats.management.commands.simulate_stats.Command.generate_random_players')
-    def test_simulate_stats_with_zero_players(self, mock_generate_random_players, mock_requests_get):
+    def test_simulate_stats_with_zero_players(self, mock_generate_random_players):
         """
         Tests the simulate_stats command when the players list in the Game object is empty.
-        Mocks the requests.get() method to generate a new player without actual API calls during testing.
+        Uses a local server stubbing the randomuser.me API to generate a new player without actual API calls during
+        testing.
         Mocks the generate_random_players() method in the script to return an empty list of players.
         """
-        mock_requests_get.return_value.json.return_value = {
-            'results': [{
-                'login': {'username': 'test_user'},
-                'picture': {'large': 'https://example.com/test_image.jpg'},
-            }]
-        }
         mock_generate_random_players.return_value = []
 
-        command = Command()
-        command.handle()
+        with RandomUserStubServer() as server:
+            call_command("simulate_stats", "--api-url", server.url)
 
         stat = Stat.objects.latest('id')
 
@@ -88,3 +132,60 @@ class SimulateStatsTests(TestCase):
         self.assertIsNotNone(stat.player)
         self.assertEqual(stat.player.nickname, "test_user")
         self.assertEqual(stat.player.profile_image, "https://example.com/test_image.jpg")
+
+    def test_fetch_random_player_data_in_batches(self):
+        """
+        Tests that players are requested from the API in batches of at most `results_per_request` players.
+        """
+        command = Command()
+        command.results_per_request = 100
+        with RandomUserStubServer(unique_usernames=True) as server:
+            command.api_url = server.url
+            players_data = command.fetch_random_player_data(250)
+
+        self.assertEqual(sorted(server.requests), [50, 100, 100])
+        self.assertEqual(len({player_data["nickname"] for player_data in players_data}), 250)
+
+    @patch('game_stats.management.commands.simulate_stats.requests.Session.get')
+    def test_simulate_stats_offline(self, mock_session_get):
+        """
+        Tests the simulate_stats command in offline mode by asserting the number of generated records, that stats
+        belong to players of their game and that no API call was made.
+        """
+        call_command("simulate_stats", "--offline", "--players", "30", "--games", "10", "--stats", "200",
+                     "--batch-size", "50", "--seed", "1")
+
+        mock_session_get.assert_not_called()
+        self.assertEqual(Player.objects.count(), 30)
+        self.assertEqual(Game.objects.count(), 10)
+        self.assertEqual(Stat.objects.count(), 200)
+        for stat in Stat.objects.exclude(game=None).select_related("game"):
+            self.assertIn(stat.player_id, stat.game.players.values_list("id", flat=True))
+        for game in Game.objects.exclude(winner=None):
+            self.assertIn(game.winner, game.players.all())
+        self.assertEqual(leaderboard.check(), [])
+
+    def test_simulate_stats_offline_bumps_collections(self):
+        """
+        Tests that the simulate_stats command in offline mode bumps the versions of the players, games and stats
+        collections, so the list views' ETags change.
+        """
+        names = ["collection:player", "collection:game", "collection:stat"]
+        versions = caching.get_versions(names)
+        call_command("simulate_stats", "--offline", "--players", "5", "--games", "5", "--stats", "20")
+        for name, old_version, new_version in zip(names, versions, caching.get_versions(names)):
+            self.assertNotEqual(old_version, new_version, name)
+
+    def test_simulate_stats_offline_seed(self):
+        """
+        Tests that the simulate_stats command in offline mode generates the same data for the same seed.
+        """
+        def generate():
+            call_command("simulate_stats", "--offline", "--players", "5", "--games", "5", "--stats", "20",
+                         "--seed", "42")
+            data = (list(Player.objects.order_by("id").values_list("nickname", "profile_image")),
+                    list(Stat.objects.order_by("id").values_list("score", flat=True)))
+            Player.objects.all().delete()
+            return data
+
+        self.assertEqual(generate(), generate())
@@ -0,0 +1,139 @@
+import statistics
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from unittest.mock import patch
+from game_stats.models import Stat, Player, User
+from game_stats import analytics, tasks
+
+
+class AnalyticsTest(TestCase):
+	def setUp(self):
+		"""
+		Creates test data: player1 scores 10, 20, 30 and 40, player2 scores 20 and 60 (60 a week ago), and player3 has a
+		stat without score.
+		"""
+		cache.clear()
+		self.players = [
+			Player.objects.create(user=User.objects.create(username=f"test_user{i}", password="test_password"),
+			                      nickname=f"analytics_test_player{i}")
+			for i in range(1, 4)
+		]
+		for score in [10, 20, 30, 40]:
+			Stat.objects.create(player=self.players[0], score=score)
+		Stat.objects.create(player=self.players[1], score=20)
+		old_stat = Stat.objects.create(player=self.players[1], score=60)
+		Stat.objects.filter(id=old_stat.id).update(creation_date=timezone.now() - timedelta(days=40))
+		Stat.objects.create(player=self.players[2], score=None)
+
+	def test_load(self):
+		"""
+		Tests that scored stats are read in chunks, seeking past the last id read.
+		"""
+		with CaptureQueriesContext(connection) as queries:
+			scores, player_ids = analytics.load(analytics.get_stats(), chunk_size=4)
+		self.assertEqual(len(queries), 3)
+		self.assertEqual(scores.tolist(), [10, 20, 30, 40, 20, 60])
+		self.assertEqual(player_ids.tolist(), [self.players[0].id] * 4 + [self.players[1].id] * 2)
+
+	def test_distribution(self):
+		"""
+		Tests the distribution of the scores of all time and of the current month, against the statistics module.
+		"""
+		scores = [10, 20, 30, 40, 20, 60]
+		distribution = analytics.get_distribution(bins=5, score=20)
+		self.assertEqual(distribution["count"], 6)
+		self.assertEqual((distribution["min"], distribution["max"]), (10, 60))
+		self.assertEqual(distribution["mean"], round(statistics.mean(scores), 2))
+		self.assertEqual(distribution["std"], round(statistics.pstdev(scores), 2))
+		self.assertEqual(distribution["percentiles"]["50"], statistics.median(scores))
+		self.assertEqual(distribution["histogram"], {"edges": [10, 20, 30, 40, 50, 60], "counts": [1, 2, 1, 1, 1]})
+		# One score below 20, and two equal to it.
+		self.assertEqual(distribution["percentile"], round(100 * (1 + 2 / 2) / 6, 2))
+
+		self.assertEqual(analytics.get_distribution(analytics.Period.MONTH)["max"], 40)
+
+	def test_summary(self):
+		"""
+		Tests that summaries hold the distinct scores and means with their cumulative counts, rather than every score,
+		and that histograms of any number of bins are computed from them.
+		"""
+		summary = analytics.get_summary()
+		self.assertEqual(summary["scores"].tolist(), [10, 20, 30, 40, 60])
+		self.assertEqual(summary["score_counts"].tolist(), [0, 1, 3, 4, 5, 6])
+		self.assertEqual(summary["means"].tolist(), [25, 40])
+		self.assertEqual(summary["mean_counts"].tolist(), [0, 1, 2])
+		self.assertEqual(analytics.get_distribution(bins=2)["histogram"], {"edges": [10, 35, 60], "counts": [4, 2]})
+
+	def test_player_percentiles(self):
+		"""
+		Tests the moments and percentile ranks of players with and without scores.
+		"""
+		percentiles = analytics.get_player_percentiles(self.players[1].id)
+		self.assertEqual(percentiles["count"], 2)
+		self.assertEqual(percentiles["mean"], 40)
+		self.assertEqual(percentiles["std"], 20)
+		self.assertEqual(percentiles["best_score"], 60)
+		self.assertEqual(percentiles["best_score_percentile"], round(100 * 5.5 / 6, 2))
+		# The means of the players are 25 and 40.
+		self.assertEqual(percentiles["mean_percentile"], 75)
+
+		percentiles = analytics.get_player_percentiles(self.players[2].id)
+		self.assertEqual(percentiles["count"], 0)
+		self.assertIsNone(percentiles["best_score_percentile"])
+
+	def test_empty_distribution(self):
+		"""
+		Tests the distribution of a window without scores.
+		"""
+		Stat.objects.all().delete()
+		distribution = analytics.get_distribution(analytics.Period.DAY, score=10)
+		self.assertEqual(distribution["count"], 0)
+		self.assertIsNone(distribution["mean"])
+		self.assertIsNone(distribution["percentile"])
+		self.assertEqual(distribution["percentiles"], {})
+
+	def test_cache(self):
+		"""
+		Tests that results are cached, and that once stats have been written and they are older than MAX_STALENESS
+		seconds, they are still served while a Celery task refreshes them.
+		"""
+		self.assertEqual(analytics.get_distribution()["count"], 6)
+		self.assertEqual(analytics.get_player_percentiles(self.players[0].id)["count"], 4)
+		with CaptureQueriesContext(connection) as queries:
+			self.assertEqual(analytics.get_distribution()["count"], 6)
+			self.assertEqual(analytics.get_player_percentiles(self.players[0].id)["count"], 4)
+		self.assertEqual(len(queries), 0)
+
+		# Scores share the cached distribution, their percentile ranks being computed from the cached analysis.
+		with patch("game_stats.analytics.cache.set") as cache_set:
+			self.assertEqual(analytics.get_distribution(score=12)["count"], 6)
+			self.assertEqual(analytics.get_distribution(score=13)["score"], 13)
+		cache_set.assert_not_called()
+
+		Stat.objects.create(player=self.players[0], score=50)
+		self.assertEqual(analytics.get_distribution()["count"], 6)
+		with patch("game_stats.analytics.MAX_STALENESS", 0), \
+				patch("game_stats.tasks.refresh_analytics_task.delay") as refresh_analytics:
+			self.assertEqual(analytics.get_distribution()["count"], 6)
+			self.assertEqual(analytics.get_distribution()["count"], 6)
+		# The refresh is only scheduled once.
+		refresh_analytics.assert_called_once_with(analytics.Period.ALL_TIME)
+		tasks.refresh_analytics_task(analytics.Period.ALL_TIME)
+		self.assertEqual(analytics.get_distribution()["count"], 7)
+		self.assertEqual(analytics.get_player_percentiles(self.players[0].id)["count"], 5)
+
+	def test_refresh_outdated(self):
+		"""
+		Tests that the periodic task refreshes the summaries of the windows that have none or are out of date only.
+		"""
+		analytics.get_distribution()
+		self.assertEqual(analytics.refresh_outdated(), [analytics.Period.DAY, analytics.Period.WEEK,
+		                                                analytics.Period.MONTH])
+		self.assertEqual(analytics.refresh_outdated(), [])
+		Stat.objects.create(player=self.players[0], score=50)
+		self.assertEqual(len(analytics.refresh_outdated()), 4)
+		self.assertEqual(analytics.get_distribution(analytics.Period.DAY)["count"], 6)
@@ -0,0 +1,82 @@
+import io
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from game_stats.models import Stat, Player, User, Game
+from game_stats import columnar
+
+
+class ColumnarExportTest(TestCase):
+	def setUp(self):
+		"""
+		Creates test data.
+		"""
+		self.user1 = User.objects.create(username="test_user1", password="test_password")
+		self.user2 = User.objects.create(username="test_user2", password="test_password")
+		self.player1 = Player.objects.create(user=self.user1, nickname="columnar_test_player1")
+		self.player2 = Player.objects.create(user=self.user2, nickname="columnar_test_player2",
+		                                     profile_image="https://example.com/avatar.jpg")
+		self.game1 = Game.objects.create(winner=self.player2)
+		self.game1.players.set([self.player1, self.player2])
+		self.game2 = Game.objects.create()
+		self.game3 = Game.objects.create()
+		self.game3.players.set([self.player1])
+		self.stat1 = Stat.objects.create(player=self.player1, game=self.game1, score=10)
+		self.stat2 = Stat.objects.create(player=self.player2, score=None)
+		self.stat3 = Stat.objects.create(player=self.player2, game=self.game1, score=3000000000)
+
+	def test_write_stats_parquet(self):
+		"""
+		Tests that stats are written to Parquet with compact types, one row group per chunk, and read back unchanged.
+		"""
+		sink = io.BytesIO()
+		with CaptureQueriesContext(connection) as queries:
+			self.assertEqual(columnar.write("stats", sink, "parquet", chunk_size=2), 3)
+		# Two chunks of stats, and the query finding there are no more.
+		self.assertEqual(len(queries), 3)
+
+		parquet_file = pq.ParquetFile(io.BytesIO(sink.getvalue()))
+		self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+		table = parquet_file.read()
+		self.assertEqual(table.schema, columnar.STAT_SCHEMA)
+		self.assertEqual(table.column("id").to_pylist(), [self.stat1.id, self.stat2.id, self.stat3.id])
+		self.assertEqual(table.column("score").to_pylist(), [10, None, 3000000000])
+		self.assertEqual(table.column("game_id").to_pylist(), [self.game1.id, None, self.game1.id])
+		self.assertEqual(table.column("creation_date").to_pylist()[0], self.stat1.creation_date)
+
+	def test_write_games_arrow(self):
+		"""
+		Tests that games are written to an Arrow IPC file along with the ids of their players, across chunks.
+		"""
+		sink = io.BytesIO()
+		self.assertEqual(columnar.write("games", sink, "arrow", chunk_size=2), 3)
+
+		table = pa.ipc.open_file(sink.getvalue()).read_all()
+		self.assertEqual(table.to_pylist(), [
+			{"id": self.game1.id, "winner_id": self.player2.id, "player_ids": [self.player1.id, self.player2.id]},
+			{"id": self.game2.id, "winner_id": None, "player_ids": []},
+			{"id": self.game3.id, "winner_id": None, "player_ids": [self.player1.id]},
+		])
+
+	def test_stream_players(self):
+		"""
+		Tests that the streamed file, joined, is a valid Parquet file, and that a queryset limits the exported rows.
+		"""
+		chunks = list(columnar.stream("players", "parquet", Player.objects.filter(id=self.player2.id), chunk_size=1))
+		self.assertGreater(len(chunks), 1)
+		table = pq.read_table(io.BytesIO(b"".join(chunks)))
+		self.assertEqual(table.to_pylist(), [{
+			"id": self.player2.id,
+			"user_id": self.user2.id,
+			"nickname": "columnar_test_player2",
+			"profile_image": "https://example.com/avatar.jpg",
+		}])
+
+	def test_write_unknown_format(self):
+		"""
+		Tests that writing to an unknown format fails.
+		"""
+		with self.assertRaises(ValueError):
+			columnar.write("stats", io.BytesIO(), "csv")
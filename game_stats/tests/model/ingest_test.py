@@ -0,0 +1,120 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+from game_stats.models import Stat, Player, User, Game
+from game_stats import ingest
+
+
+@patch("game_stats.ingest.schedule_flush")
+class StatQueueTest(TestCase):
+	def setUp(self):
+		"""
+		Creates test data, with an empty queue. Flushes are only run when the tests call them.
+		"""
+		cache.clear()
+		self.user1 = User.objects.create(username="test_user1", password="test_password")
+		self.user2 = User.objects.create(username="test_user2", password="test_password")
+		self.player1 = Player.objects.create(user=self.user1, nickname="ingest_test_player1")
+		self.player2 = Player.objects.create(user=self.user2, nickname="ingest_test_player2")
+		self.game = Game.objects.create()
+		self.game.players.set([self.player1])
+
+	def test_flush_coalesces_submissions(self, schedule_flush):
+		"""
+		Tests that the stats of every queued submission are created with a single insert, and that the queue is then
+		empty.
+		"""
+		for score in [10, 20, 30]:
+			ingest.enqueue([{"player": self.player1.id, "score": score, "game": self.game.id}])
+		self.assertEqual(ingest.get_metrics()["queued_stats"], 3)
+
+		with patch("game_stats.ingest.create", wraps=ingest.create) as create:
+			self.assertEqual(ingest.flush(), 3)
+		create.assert_called_once()
+		self.assertEqual(sorted(Stat.objects.values_list("score", flat=True)), [10, 20, 30])
+		self.assertEqual(self.player1.summary.stats_count, 3)
+
+		metrics = ingest.get_metrics()
+		self.assertEqual(metrics["queued_submissions"], 0)
+		self.assertEqual(metrics["queued_stats"], 0)
+		self.assertEqual(metrics["created_stats"], 3)
+		self.assertEqual(metrics["last_flush"]["submissions"], 3)
+		self.assertGreaterEqual(metrics["last_flush"]["latency_ms"], 0)
+		self.assertEqual(ingest.flush(), 0)
+
+	def test_flush_rejects_invalid_stats(self, schedule_flush):
+		"""
+		Tests that queued stats whose player isn't in their game anymore, or was deleted, are dropped.
+		"""
+		ingest.enqueue([
+			{"player": self.player1.id, "score": 10, "game": self.game.id},
+			{"player": self.player2.id, "score": 20, "game": self.game.id},
+		])
+		ingest.enqueue([{"player": self.player2.id, "score": 30}])
+		self.player2.delete()
+
+		self.assertEqual(ingest.flush(), 1)
+		self.assertEqual(list(Stat.objects.values_list("score", flat=True)), [10])
+		self.assertEqual(ingest.get_metrics()["rejected_stats"], 2)
+
+	def test_flush_skips_lost_submissions(self, schedule_flush):
+		"""
+		Tests that a flush waits for a submission whose slot was taken but which isn't stored, and that the next flush
+		skips it.
+		"""
+		cache.add("stat-queue:tail", 0, timeout=None)
+		cache.incr("stat-queue:tail")
+		ingest.enqueue([{"player": self.player1.id, "score": 10}])
+		schedule_flush.reset_mock()
+
+		self.assertEqual(ingest.flush(), 0)
+		schedule_flush.assert_called_once()
+		self.assertEqual(ingest.flush(), 1)
+		self.assertEqual(ingest.get_metrics()["queued_submissions"], 0)
+
+	def test_late_submission_requeued(self, schedule_flush):
+		"""
+		Tests that a submission stored after its slot has been skipped is queued in the next slot and flushed, and that
+		the number of queued stats stays right.
+		"""
+		cache.add("stat-queue:tail", 0, timeout=None)
+		cache.incr("stat-queue:tail")
+		ingest.flush()
+		ingest.flush()
+
+		# The request that took the skipped slot stores its submission now.
+		incr = cache.incr
+		taken_slots = [1]
+
+		def incr_tail(key, delta=1):
+			return taken_slots.pop() if key == "stat-queue:tail" and taken_slots else incr(key, delta)
+
+		with patch.object(cache, "incr", side_effect=incr_tail):
+			self.assertEqual(ingest.enqueue([{"player": self.player1.id, "score": 10}]), 2)
+		self.assertEqual(ingest.get_metrics()["queued_stats"], 1)
+		self.assertEqual(ingest.flush(), 1)
+		metrics = ingest.get_metrics()
+		self.assertEqual(metrics["queued_submissions"], 0)
+		self.assertEqual(metrics["queued_stats"], 0)
+
+	def test_insert_batches(self, schedule_flush):
+		"""
+		Tests that the stats of a flush are inserted INSERT_BATCH_SIZE rows per statement.
+		"""
+		for score in range(5):
+			ingest.enqueue([{"player": self.player1.id, "score": score}])
+		with patch("game_stats.ingest.INSERT_BATCH_SIZE", 2), CaptureQueriesContext(connection) as queries:
+			self.assertEqual(ingest.flush(), 5)
+		inserts = [query for query in queries if query["sql"].startswith('INSERT INTO "game_stats_stat"')]
+		self.assertEqual(len(inserts), 3)
+
+	def test_flush_runs_once_at_a_time(self, schedule_flush):
+		"""
+		Tests that a flush does nothing while another one is running.
+		"""
+		ingest.enqueue([{"player": self.player1.id, "score": 10}])
+		cache.add("stat-queue:lock", True)
+		self.assertEqual(ingest.flush(), 0)
+		self.assertFalse(Stat.objects.exists())
@@ -0,0 +1,174 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from unittest.mock import patch
+from game_stats.models import Stat, Player, User, LeaderboardEntry
+from game_stats import leaderboard
+
+
+class LeaderboardEntryModelTest(TestCase):
+	def setUp(self):
+		"""
+		Creates test data.
+		"""
+		self.user1 = User.objects.create(username="test_user1", password="test_password")
+		self.user2 = User.objects.create(username="test_user2", password="test_password")
+		self.player1 = Player.objects.create(user=self.user1, nickname="leaderboard_test_player1")
+		self.player2 = Player.objects.create(user=self.user2, nickname="leaderboard_test_player2")
+
+	def assertMatchesLiveQuery(self, size=leaderboard.LEADERBOARD_CAPACITY):
+		self.assertEqual(leaderboard.check(size), [])
+
+	def test_created_stats_are_ranked(self):
+		"""
+		Tests that creating stats adds them to the leaderboard in score order, skipping stats with no score.
+		"""
+		stat1 = Stat.objects.create(player=self.player1, score=10)
+		stat2 = Stat.objects.create(player=self.player2, score=50)
+		Stat.objects.create(player=self.player2)
+
+		self.assertEqual([entry.stat_id for entry in leaderboard.get_top_entries()], [stat2.id, stat1.id])
+		self.assertMatchesLiveQuery()
+
+	def test_updated_stat_is_reranked(self):
+		"""
+		Tests that increasing and decreasing a stat's score moves it on the leaderboard.
+		"""
+		stat1 = Stat.objects.create(player=self.player1, score=10)
+		stat2 = Stat.objects.create(player=self.player2, score=50)
+
+		stat1.score = 90
+		stat1.save()
+		self.assertEqual([entry.stat_id for entry in leaderboard.get_top_entries()], [stat1.id, stat2.id])
+
+		stat1.score = 5
+		stat1.save()
+		self.assertEqual([entry.stat_id for entry in leaderboard.get_top_entries()], [stat2.id, stat1.id])
+		self.assertMatchesLiveQuery()
+
+	def test_deleted_stat_is_removed(self):
+		"""
+		Tests that deleting a stat removes it from the leaderboard.
+		"""
+		stat1 = Stat.objects.create(player=self.player1, score=10)
+		stat2 = Stat.objects.create(player=self.player2, score=50)
+		stat2.delete()
+
+		self.assertEqual([entry.stat_id for entry in leaderboard.get_top_entries()], [stat1.id])
+		self.assertMatchesLiveQuery()
+
+	@patch("game_stats.leaderboard.LEADERBOARD_CAPACITY", 3)
+	def test_leaderboard_at_capacity(self):
+		"""
+		Tests that a full leaderboard drops its lowest entry for a better stat, ignores worse stats and refills itself
+		from the stats table when one of its stats is deleted.
+		"""
+		all_time_entries = LeaderboardEntry.objects.filter(period=leaderboard.Period.ALL_TIME)
+		stats = [Stat.objects.create(player=self.player1, score=score) for score in [10, 20, 30, 40]]
+		self.assertEqual(all_time_entries.count(), 3)
+		self.assertFalse(all_time_entries.filter(stat=stats[0]).exists())
+
+		Stat.objects.create(player=self.player2, score=5)
+		self.assertEqual(all_time_entries.count(), 3)
+
+		stats[3].delete()
+		self.assertEqual(all_time_entries.count(), 3)
+		self.assertTrue(all_time_entries.filter(stat=stats[0]).exists())
+		self.assertMatchesLiveQuery(3)
+
+	@patch("game_stats.leaderboard.LEADERBOARD_CAPACITY", 3)
+	def test_cascade_delete_refills_once(self):
+		"""
+		Tests that deleting a player, and with it several stats on full leaderboards, refills them without rebuilding
+		them.
+		"""
+		all_time_entries = LeaderboardEntry.objects.filter(period=leaderboard.Period.ALL_TIME)
+		for score in [10, 20, 30]:
+			Stat.objects.create(player=self.player1, score=score)
+		for score in [40, 50]:
+			Stat.objects.create(player=self.player2, score=score)
+
+		with patch("game_stats.leaderboard.rebuild") as rebuild:
+			self.player2.delete()
+		rebuild.assert_not_called()
+		self.assertEqual([entry.score for entry in all_time_entries.order_by("-score")], [30, 20, 10])
+		self.assertMatchesLiveQuery(3)
+
+	def test_rebuild(self):
+		"""
+		Tests that rebuilding restores a leaderboard that went out of sync with the stats table.
+		"""
+		Stat.objects.create(player=self.player1, score=10)
+		Stat.objects.create(player=self.player2, score=50)
+		LeaderboardEntry.objects.all().delete()
+		self.assertNotEqual(leaderboard.check(), [])
+
+		leaderboard.rebuild()
+		self.assertMatchesLiveQuery()
+
+	def test_windowed_leaderboards(self):
+		"""
+		Tests that stats are ranked on the leaderboards of their day, week and month, and that older stats only count
+		for the all time leaderboard.
+		"""
+		old_stat = Stat.objects.create(player=self.player1, score=90)
+		Stat.objects.filter(pk=old_stat.pk).update(creation_date=timezone.now() - timedelta(days=40))
+		leaderboard.rebuild_all()
+		stat = Stat.objects.create(player=self.player2, score=50)
+
+		self.assertEqual([entry.stat_id for entry in leaderboard.get_top_entries()], [old_stat.id, stat.id])
+		for period in [leaderboard.Period.DAY, leaderboard.Period.WEEK, leaderboard.Period.MONTH]:
+			self.assertEqual([entry.stat_id for entry in leaderboard.get_top_entries(period=period)], [stat.id])
+			self.assertEqual(leaderboard.check(leaderboard.LEADERBOARD_CAPACITY, period), [])
+
+	def test_expire_buckets(self):
+		"""
+		Tests that the leaderboards of past days, weeks and months are deleted, and current ones are kept.
+		"""
+		stat = Stat.objects.create(player=self.player1, score=10)
+		old_stat = Stat.objects.create(player=self.player2, score=20)
+		LeaderboardEntry.objects.filter(stat=old_stat, period=leaderboard.Period.DAY) \
+			.update(bucket_start=leaderboard.get_bucket(leaderboard.Period.DAY) - timedelta(days=1))
+
+		self.assertEqual(leaderboard.expire_buckets(), 1)
+		self.assertEqual(LeaderboardEntry.objects.filter(stat=stat).count(), 4)
+		self.assertFalse(LeaderboardEntry.objects.filter(stat=old_stat, period=leaderboard.Period.DAY).exists())
+
+	@patch("game_stats.leaderboard.LEADERBOARD_CAPACITY", 3)
+	def test_top_players(self):
+		"""
+		Tests that the best stat of each of the best players is listed, all time and in a window whose leaderboard only
+		holds the stats of a single player, which is then read past.
+		"""
+		player3 = Player.objects.create(user=User.objects.create(username="test_user3", password="test_password"),
+		                                nickname="leaderboard_test_player3")
+		for score in [90, 80, 70, 60]:
+			Stat.objects.create(player=self.player1, score=score)
+		Stat.objects.create(player=self.player2, score=50)
+		Stat.objects.create(player=self.player2, score=55)
+		old_stat = Stat.objects.create(player=player3, score=100)
+		Stat.objects.filter(id=old_stat.id).update(creation_date=timezone.now() - timedelta(days=40))
+		leaderboard.rebuild_all()
+
+		self.assertEqual(leaderboard.get_top_players(2), [("leaderboard_test_player3", 100),
+		                                                  ("leaderboard_test_player1", 90)])
+		self.assertEqual(leaderboard.get_top_players(5, leaderboard.Period.DAY), [("leaderboard_test_player1", 90),
+		                                                              ("leaderboard_test_player2", 55)])
+		self.assertEqual(leaderboard.get_top_players(1, leaderboard.Period.DAY), [("leaderboard_test_player1", 90)])
+
+	@patch("game_stats.leaderboard.LEADERBOARD_CAPACITY", 3)
+	def test_offer_many(self):
+		"""
+		Tests that stats created in bulk are ranked, and that full leaderboards are only rebuilt when a stat can enter
+		them.
+		"""
+		Stat.objects.bulk_create([Stat(player=self.player1, score=score) for score in [10, 20, 30, 40]])
+		leaderboard.offer_many(Stat.objects.all())
+		self.assertMatchesLiveQuery(3)
+
+		with patch("game_stats.leaderboard.rebuild") as rebuild:
+			leaderboard.offer_many(Stat.objects.bulk_create([Stat(player=self.player2, score=20)]))
+		rebuild.assert_not_called()
+
+		leaderboard.offer_many(Stat.objects.bulk_create([Stat(player=self.player2, score=25)]))
+		self.assertEqual([entry.score for entry in leaderboard.get_top_entries()], [40, 30, 25])
@@ -0,0 +1,92 @@
+import time
+from unittest.mock import patch
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from game_stats import metrics
+from game_stats.models import Player
+
+
+class RequestMetricsTest(TestCase):
+	def setUp(self):
+		"""
+		Starts from empty histograms: observations of earlier tests are flushed, then dropped.
+		"""
+		metrics.flush()
+		cache.clear()
+
+	def observe(self, route, duration, queries=0, db_time=0.0, serialization_time=0.0):
+		measurements = metrics.RequestMetrics()
+		measurements.queries, measurements.db_time = queries, db_time
+		measurements.serialization_time = serialization_time
+		metrics.observe(route, "GET", duration, measurements)
+
+	def test_histograms(self):
+		"""
+		Tests that observations are counted in the bucket of the lowest bound they don't exceed, that buckets are
+		cumulative and that sums add the observed values up, once flushed.
+		"""
+		self.observe("player-list-or-create", 0.002, queries=2, db_time=0.001, serialization_time=0.0005)
+		self.observe("player-list-or-create", 0.02, queries=3, db_time=0.01)
+		self.observe("player-list-or-create", 20)
+		self.observe("stat-list-or-create", 0.001, queries=1)
+		self.assertEqual(metrics.collect(), {})
+
+		metrics.flush()
+		histograms = metrics.collect()
+		self.assertEqual(list(histograms), [("player-list-or-create", "GET"), ("stat-list-or-create", "GET")])
+		players = histograms["player-list-or-create", "GET"]
+		self.assertEqual(players["count"], 3)
+		self.assertEqual(players["request_duration_seconds"]["buckets"], [0, 1, 1, 1, 2, 2, 2, 2, 2, 2, 2, 2, 2, 3])
+		self.assertAlmostEqual(players["request_duration_seconds"]["sum"], 20.022)
+		self.assertEqual(players["db_queries"]["buckets"], [1, 1, 2, 3, 3, 3, 3, 3, 3, 3, 3, 3])
+		self.assertEqual(players["db_queries"]["sum"], 5)
+		self.assertAlmostEqual(players["db_duration_seconds"]["sum"], 0.011)
+		self.assertAlmostEqual(players["serialization_duration_seconds"]["sum"], 0.0005)
+		self.assertEqual(histograms["stat-list-or-create", "GET"]["request_duration_seconds"]["buckets"][0], 1)
+
+		# Later flushes add to the flushed counters.
+		self.observe("stat-list-or-create", 0.001)
+		metrics.flush()
+		self.assertEqual(metrics.collect()["stat-list-or-create", "GET"]["count"], 2)
+
+	def test_background_flush(self):
+		"""
+		Tests that observations are flushed by a background thread, every REQUEST_METRICS_FLUSH_INTERVAL seconds.
+		"""
+		with self.settings(REQUEST_METRICS_FLUSH_INTERVAL=0.01):
+			self.observe("player-by-id", 0.003)
+			for _ in range(100):
+				if metrics.collect():
+					break
+				time.sleep(0.01)
+		self.assertEqual(metrics.collect()["player-by-id", "GET"]["count"], 1)
+
+	def test_export(self):
+		"""
+		Tests that histograms are exported in the Prometheus text format.
+		"""
+		self.observe("player-by-id", 0.003, queries=1, db_time=0.001)
+		metrics.flush()
+		lines = metrics.export().splitlines()
+		self.assertIn("# TYPE gamestats_request_duration_seconds histogram", lines)
+		self.assertIn('gamestats_request_duration_seconds_bucket{route="player-by-id",method="GET",le="0.0025"} 0', lines)
+		self.assertIn('gamestats_request_duration_seconds_bucket{route="player-by-id",method="GET",le="0.005"} 1', lines)
+		self.assertIn('gamestats_request_duration_seconds_bucket{route="player-by-id",method="GET",le="+Inf"} 1', lines)
+		self.assertIn('gamestats_request_duration_seconds_sum{route="player-by-id",method="GET"} 0.003', lines)
+		self.assertIn('gamestats_db_queries_bucket{route="player-by-id",method="GET",le="0"} 0', lines)
+		self.assertIn('gamestats_db_queries_count{route="player-by-id",method="GET"} 1', lines)
+
+	def test_serialization_excludes_queries(self):
+		"""
+		Tests that queries run while serializing are counted as database time, not serialization time, and that nested
+		serializations are only timed once.
+		"""
+		with metrics.measure_request() as measurements, connection.execute_wrapper(measurements.time_query):
+			with patch("game_stats.metrics.time.perf_counter", side_effect=[0, 1, 4, 5]):
+				with metrics.measure_serialization(), metrics.measure_serialization():
+					Player.objects.count()
+		self.assertEqual(measurements.queries, 1)
+		self.assertEqual(measurements.db_time, 3)
+		self.assertEqual(measurements.serialization_time, 2)
+		self.assertIsNone(metrics.get_current())
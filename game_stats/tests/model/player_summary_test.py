@@ -0,0 +1,130 @@
+from unittest.mock import patch
+from django.db import connection
+from django.test import TestCase
+from game_stats.models import Stat, Player, User, Game, PlayerSummary
+from game_stats import rollups
+
+
+class PlayerSummaryModelTest(TestCase):
+	def setUp(self):
+		"""
+		Creates test data.
+		"""
+		self.user1 = User.objects.create(username="test_user1", password="test_password")
+		self.user2 = User.objects.create(username="test_user2", password="test_password")
+		self.player1 = Player.objects.create(user=self.user1, nickname="summary_test_player1")
+		self.player2 = Player.objects.create(user=self.user2, nickname="summary_test_player2")
+
+	def assertSummary(self, player, **expected):
+		summary = PlayerSummary.objects.get(player=player)
+		for field, value in expected.items():
+			self.assertEqual(getattr(summary, field), value, field)
+		# The incrementally maintained summary must match one computed from scratch.
+		computed = rollups.compute([player.id])[player.id]
+		for field in rollups.SUMMARY_FIELDS:
+			self.assertEqual(getattr(summary, field), getattr(computed, field), field)
+
+	def test_stats_are_aggregated(self):
+		"""
+		Tests that creating, updating and deleting stats updates the player's stats count and scores.
+		"""
+		stat1 = Stat.objects.create(player=self.player1, score=10)
+		stat2 = Stat.objects.create(player=self.player1, score=30)
+		Stat.objects.create(player=self.player1)
+		self.assertSummary(self.player1, stats_count=3, total_score=40, average_score=20, best_score=30)
+
+		stat1.score = 50
+		stat1.save()
+		self.assertSummary(self.player1, stats_count=3, total_score=80, average_score=40, best_score=50)
+
+		stat1.delete()
+		stat2.delete()
+		self.assertSummary(self.player1, stats_count=1, total_score=0, average_score=None, best_score=None)
+
+	def test_stat_moved_to_other_player(self):
+		"""
+		Tests that moving a stat to another player updates both players' summaries.
+		"""
+		stat = Stat.objects.create(player=self.player1, score=10)
+		stat.player = self.player2
+		stat.save()
+		self.assertSummary(self.player1, stats_count=0, best_score=None)
+		self.assertSummary(self.player2, stats_count=1, best_score=10)
+
+	def test_games_are_aggregated(self):
+		"""
+		Tests that adding players to games, changing winners and deleting games updates games played and wins.
+		"""
+		game1 = Game.objects.create()
+		game1.players.set([self.player1, self.player2])
+		game1.winner = self.player1
+		game1.save()
+		game2 = Game.objects.create(winner=self.player2)
+		game2.players.add(self.player2)
+		self.assertSummary(self.player1, games_played=1, wins=1)
+		self.assertSummary(self.player2, games_played=2, wins=1)
+
+		game1.winner = self.player2
+		game1.save()
+		self.assertSummary(self.player1, games_played=1, wins=0)
+		self.assertSummary(self.player2, games_played=2, wins=2)
+
+		game1.players.clear()
+		self.assertSummary(self.player1, games_played=0)
+
+		game2.delete()
+		self.assertSummary(self.player2, games_played=0, wins=1)
+
+	def test_writes_increment_summaries(self):
+		"""
+		Tests that creating stats and games and raising scores update existing summaries in place, and that only a
+		score going down recomputes them.
+		"""
+		stat = Stat.objects.create(player=self.player1, score=10)
+		with patch("game_stats.rollups.compute", wraps=rollups.compute) as compute:
+			Stat.objects.create(player=self.player1, score=20)
+			Stat.objects.create(player=self.player1)
+			stat.score = 40
+			stat.save()
+			game = Game.objects.create(winner=self.player1)
+			game.players.add(self.player1)
+			compute.assert_not_called()
+		self.assertSummary(self.player1, stats_count=3, total_score=60, best_score=40, games_played=1, wins=1)
+
+		with patch("game_stats.rollups.compute", wraps=rollups.compute) as compute:
+			stat.score = 5
+			stat.save()
+			compute.assert_called_once()
+		self.assertSummary(self.player1, stats_count=3, total_score=25, best_score=20)
+
+	def test_upsert_without_conflict_target(self):
+		"""
+		Tests that summaries are upserted without naming the conflicting fields on databases that can't target them
+		(MySQL).
+		"""
+		with patch.object(connection.features, "supports_update_conflicts_with_target", False), \
+				patch.object(PlayerSummary.objects, "bulk_create") as bulk_create:
+			rollups.refresh([self.player1.id])
+		self.assertIsNone(bulk_create.call_args.kwargs["unique_fields"])
+		self.assertTrue(bulk_create.call_args.kwargs["update_conflicts"])
+
+	def test_player_deletion(self):
+		"""
+		Tests that a player with stats, games and a summary can be deleted.
+		"""
+		game = Game.objects.create(winner=self.player1)
+		game.players.add(self.player1)
+		Stat.objects.create(player=self.player1, score=10, game=game)
+		self.player1.delete()
+		self.assertFalse(PlayerSummary.objects.filter(player_id=self.player1.id).exists())
+
+	def test_rebuild(self):
+		"""
+		Tests that rebuilding restores summaries that went out of sync with the stats and games tables.
+		"""
+		Stat.objects.create(player=self.player1, score=10)
+		PlayerSummary.objects.all().delete()
+
+		rollups.rebuild()
+		self.assertSummary(self.player1, stats_count=1, best_score=10)
+		self.assertSummary(self.player2, stats_count=0, best_score=None)
@@ -0,0 +1,121 @@
+import random
+from unittest.mock import patch
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from game_stats.models import Stat, Player, User, PlayerSummary, ScoreCount, ScoreTreeNode
+from game_stats import ingest, ranks
+
+
+class PlayerRankTest(TestCase):
+	def setUp(self):
+		"""
+		Creates test data: players whose best scores are 50, 30, 30 and 10, and a player without scores.
+		"""
+		self.players = [
+			Player.objects.create(user=User.objects.create(username=f"test_user{i}", password="test_password"),
+			                      nickname=f"rank_test_player{i}")
+			for i in range(1, 6)
+		]
+		for player, scores in zip(self.players, [[50, 20], [30], [10, 30], [10], []]):
+			for score in scores:
+				Stat.objects.create(player=player, score=score)
+
+	def assertCountsMatch(self):
+		# The incrementally maintained counts and tree must match the ones computed from scratch.
+		expected = dict(PlayerSummary.objects.exclude(best_score=None).values("best_score")
+		                .annotate(count=Count("player")).values_list("best_score", "count"))
+		counts = dict(ScoreCount.objects.exclude(players=0).values_list("score", "players"))
+		self.assertEqual(counts, expected)
+		nodes = dict(ScoreTreeNode.objects.exclude(players=0).values_list("node", "players"))
+		self.assertEqual(nodes, {node: count for node, count in ranks.build_tree(expected).items() if count})
+
+	def test_get_rank(self):
+		"""
+		Tests that players with the same best score share their rank, and the players around them.
+		"""
+		self.assertCountsMatch()
+		ranking = ranks.get_rank(self.players[2].id)
+		self.assertEqual((ranking["rank"], ranking["best_score"], ranking["players"]), (2, 30, 4))
+		self.assertEqual((ranking["above"]["player"], ranking["above"]["rank"]), (self.players[1].id, 2))
+		self.assertEqual((ranking["below"]["player"], ranking["below"]["rank"]), (self.players[3].id, 4))
+
+		ranking = ranks.get_rank(self.players[1].id)
+		self.assertEqual((ranking["above"]["nickname"], ranking["above"]["rank"]), ("rank_test_player1", 1))
+
+		ranking = ranks.get_rank(self.players[0].id)
+		self.assertEqual(ranking["rank"], 1)
+		self.assertIsNone(ranking["above"])
+		self.assertIsNone(ranks.get_rank(self.players[3].id)["below"])
+		self.assertIsNone(ranks.get_rank(self.players[4].id))
+
+	def test_ranks_follow_writes(self):
+		"""
+		Tests that ranks are kept up to date when stats are updated, deleted and created in bulk, and when players are
+		deleted.
+		"""
+		stat = Stat.objects.get(player=self.players[3])
+		stat.score = 40
+		stat.save()
+		self.assertEqual(ranks.get_rank(self.players[3].id)["rank"], 2)
+		self.assertCountsMatch()
+
+		Stat.objects.filter(player=self.players[0], score=50).first().delete()
+		self.assertEqual(ranks.get_rank(self.players[0].id)["rank"], 4)
+		self.assertCountsMatch()
+
+		ingest.create([{"player": self.players[4].id, "score": 100}])
+		self.assertEqual(ranks.get_rank(self.players[4].id)["rank"], 1)
+		self.assertEqual(ranks.get_rank(self.players[3].id)["rank"], 2)
+		self.assertCountsMatch()
+
+		self.players[4].delete()
+		self.assertEqual(ranks.get_rank(self.players[3].id)["rank"], 1)
+		self.assertCountsMatch()
+
+	def test_rebuild(self):
+		"""
+		Tests that the counts are rebuilt from the player summaries.
+		"""
+		ScoreCount.objects.all().delete()
+		ScoreCount.objects.create(score=99, players=3)
+		ranks.rebuild()
+		self.assertCountsMatch()
+		self.assertEqual(ranks.get_rank(self.players[3].id)["rank"], 4)
+
+	def test_upsert_without_conflict_target(self):
+		"""
+		Tests that counts are upserted without naming the conflicting fields on databases that can't target them
+		(MySQL).
+		"""
+		with patch.object(connection.features, "supports_update_conflicts_with_target", False), \
+				patch.object(ScoreCount.objects, "bulk_create") as bulk_create:
+			ranks.refresh([30])
+		self.assertIsNone(bulk_create.call_args.kwargs["unique_fields"])
+		self.assertEqual(bulk_create.call_args.kwargs["update_fields"], ["players"])
+
+	def test_many_distinct_scores(self):
+		"""
+		Tests that ranks are right with many distinct best scores, across the whole range of scores, and that each is
+		read from at most 33 nodes of the tree, while scores change.
+		"""
+		rng = random.Random(1)
+		users = User.objects.bulk_create([User(username=f"rank_test_bulk{i}") for i in range(500)])
+		players = Player.objects.bulk_create([Player(user=user, nickname=f"rank_test_bulk{i}")
+		                                      for i, user in enumerate(users)])
+		PlayerSummary.objects.bulk_create([PlayerSummary(player=player, best_score=rng.choice([
+			rng.randrange(2 ** 32), rng.randrange(1000)])) for player in players])
+		ranks.rebuild()
+		for summary in PlayerSummary.objects.filter(player__in=rng.sample(players, 50)):
+			previous_best_score, summary.best_score = summary.best_score, rng.randrange(2 ** 32)
+			summary.save()
+			ranks.refresh([previous_best_score, summary.best_score])
+		self.assertCountsMatch()
+
+		best_scores = list(PlayerSummary.objects.exclude(best_score=None).values_list("best_score", flat=True))
+		for player in rng.sample(players, 50) + [self.players[0]]:
+			with patch("game_stats.ranks.get_nodes", wraps=ranks.get_nodes) as get_nodes:
+				ranking = ranks.get_rank(player.id)
+			self.assertLessEqual(len(set(get_nodes.call_args.args[0])), 33)
+			self.assertEqual(ranking["rank"], sum(score > ranking["best_score"] for score in best_scores) + 1)
+			self.assertEqual(ranking["players"], len(best_scores))
@@ -0,0 +1,65 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+import msgpack
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from game_stats.models import Game, Player, Stat, User
+from game_stats.renderers import MessagePackParser, MessagePackRenderer, ORJSONParser, ORJSONRenderer
+from game_stats.serializers import StatSerializer
+
+
+class RenderersTest(TestCase):
+	def test_orjson_same_as_json(self):
+		"""
+		Tests that the orjson renderer outputs exactly what DRF's JSON renderer does, dates, decimals, non-ASCII
+		characters and JavaScript line separators included.
+		"""
+		user = User.objects.create(username="renderer_test_user", password="test_password")
+		player = Player.objects.create(user=user, nickname="renderer_test_player")
+		game = Game.objects.create(winner=player)
+		game.players.set([player])
+		Stat.objects.create(player=player, score=10, game=game, creation_date=timezone.now() - timedelta(days=1))
+		data = {
+			"results": StatSerializer(StatSerializer.setup_eager_loading(Stat.objects.all()), many=True).data,
+			"decimal": Decimal("1.50"),
+			"duration": timedelta(seconds=90),
+			"text": "plàyer\u2028\u2029",
+			1: None,
+		}
+		self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+		self.assertEqual(ORJSONRenderer().render(None), b"")
+
+	def test_orjson_indent(self):
+		"""
+		Tests that indented JSON is still rendered, by DRF's renderer.
+		"""
+		data = {"player": "renderer_test_player", "score": 10}
+		self.assertEqual(ORJSONRenderer().render(data, "application/json; indent=2"),
+		                 JSONRenderer().render(data, "application/json; indent=2"))
+
+	def test_orjson_parser(self):
+		"""
+		Tests that the orjson parser parses JSON bodies and reports malformed ones as parse errors.
+		"""
+		self.assertEqual(ORJSONParser().parse(io.BytesIO('{"nickname": "plàyer"}'.encode())), {"nickname": "plàyer"})
+		self.assertEqual(ORJSONParser().parse(io.BytesIO('{"nickname": "plàyer"}'.encode("latin-1")), None,
+		                                      {"encoding": "latin-1"}), {"nickname": "plàyer"})
+		with self.assertRaises(ParseError):
+			ORJSONParser().parse(io.BytesIO(b'{"nickname": '))
+
+	def test_msgpack(self):
+		"""
+		Tests that MessagePack round-trips data, with values it can't encode natively converted as in JSON, and that
+		malformed bodies are reported as parse errors.
+		"""
+		date = timezone.now()
+		content = MessagePackRenderer().render({"score": 10, "creation_date": date, "ratio": Decimal("0.5")})
+		self.assertEqual(msgpack.unpackb(content), {"score": 10, "creation_date": date.isoformat().replace("+00:00", "Z"),
+		                                            "ratio": 0.5})
+		self.assertEqual(MessagePackParser().parse(io.BytesIO(msgpack.packb([{"player": 1}]))), [{"player": 1}])
+		for body in [b"\x92\x01", msgpack.packb(1) + b"\x01", b"\xc1", b"\x81\x90\x01"]:
+			with self.assertRaises(ParseError):
+				MessagePackParser().parse(io.BytesIO(body))
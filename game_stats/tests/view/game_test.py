@@ -1,9 +1,13 @@
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import AccessToken
 from game_stats.models import Game, Player, User
+from game_stats.serializers import GameSerializer
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 
 class GameViewsTest(TestCase):
@@ -41,6 +45,72 @@ class GameViewsTest(TestCase):
 		self.assertIn(self.player1.nickname, returned_nicknames)
 		self.assertIn(self.player2.nickname, returned_nicknames)
 
+	def test_get_games_query_count(self):
+		"""
+		Tests that GET to /games/ endpoint runs a fixed number of queries, whatever the number of games (and their
+		players) in the page.
+		"""
+		with CaptureQueriesContext(connection) as small_page_queries:
+			self.admin_client.get(reverse("game-list-or-create"), {"page_size": 100})
+
+		for _ in range(50):
+			game = Game.objects.create(winner=self.player2)
+			game.players.set([self.player1, self.player2])
+		with self.assertNumQueries(len(small_page_queries)):
+			response = self.admin_client.get(reverse("game-list-or-create"), {"page_size": 100})
+		self.assertEqual(len(response.data["results"]), 52)
+		self.assertEqual(response.data["results"][-1]["winner"]["nickname"], self.player2.nickname)
+
+	def test_get_games_same_as_serializer(self):
+		"""
+		Tests that GET to /games/ endpoint, which reads the games' columns with `values()`, returns exactly what the game
+		serializer outputs.
+		"""
+		Game.objects.filter(id=self.game1.id).update(winner=self.player2)
+		game3 = Game.objects.create(winner=self.player1)
+		game3.players.set([self.player2])
+
+		games = GameSerializer.setup_eager_loading(Game.objects.order_by("id"))
+		response = self.admin_client.get(reverse("game-list-or-create"), HTTP_ACCEPT="application/json")
+		self.assertEqual(response.content, JSONRenderer().render(
+			{"next": None, "previous": None, "count": 3, "results": GameSerializer(games, many=True).data}))
+
+	def test_get_games_fields_and_expand(self):
+		"""
+		Tests GET to /games/ endpoint with "fields" and "expand": players are returned as ids unless expanded, and
+		aren't read at all when left out.
+		"""
+		Game.objects.filter(id=self.game1.id).update(winner=self.player1)
+		response = self.admin_client.get(reverse("game-list-or-create"), {"expand": "winner"})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		game = response.data["results"][0]
+		self.assertEqual(game["players"], [self.player1.id, self.player2.id])
+		self.assertEqual(game["winner"]["nickname"], self.player1.nickname)
+
+		with CaptureQueriesContext(connection) as queries:
+			response = self.admin_client.get(reverse("game-by-id", kwargs={"pk": self.game1.id}),
+			                                 {"fields": "id,winner", "expand": ""})
+		self.assertEqual(response.data, {"id": self.game1.id, "winner": self.player1.id})
+		self.assertFalse([query for query in queries if "game_stats_player" in query["sql"]])
+
+	def test_get_games_not_modified(self):
+		"""
+		Tests GET to /games/ with the ETag of the current list, which should get a 304 response without querying the
+		games, until the players of a game change.
+		"""
+		url = reverse("game-list-or-create")
+		etag = self.admin_client.get(url)["ETag"]
+		# Only the authenticated user is queried.
+		with self.assertNumQueries(1):
+			response = self.admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+		self.assertNotEqual(self.admin_client.get(url, {"page": 1})["ETag"], etag)
+
+		self.game2.players.add(self.player1)
+		response = self.admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data["results"][1]["players"][0]["nickname"], self.player1.nickname)
+
 	def test_get_game_detail(self):
 		"""
 		Tests GET to /games/<int:pk>/ endpoint by retrieving a specific game by its id.
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from game_stats import metrics
+from game_stats.models import Player, User
+
+
+class MetricsViewsTest(TestCase):
+	def setUp(self):
+		"""
+		Creates test data, with empty histograms.
+		"""
+		metrics.flush()
+		cache.clear()
+		self.admin_user = User.objects.create(username="test_user1", password="test_password", is_staff=True)
+		self.non_admin_user = User.objects.create(username="test_user2", password="test_password")
+		self.player = Player.objects.create(user=self.admin_user, nickname="metrics_view_test_player")
+
+		self.admin_client = APIClient()
+		self.admin_client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.admin_user)}")
+		self.non_admin_client = APIClient()
+		self.non_admin_client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.non_admin_user)}")
+
+	def test_get_metrics(self):
+		"""
+		Tests GET to /metrics/ endpoint, which only admins can use, by validating that the requests sent before are
+		counted by route and method, along with their queries.
+		"""
+		self.non_admin_client.get(reverse("player-list-or-create"))
+		self.non_admin_client.get(reverse("player-list-or-create"))
+		self.non_admin_client.get(reverse("player-by-id", kwargs={"pk": self.player.id}))
+
+		response = self.admin_client.get(reverse("metrics"))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+		lines = response.content.decode().splitlines()
+		self.assertIn('gamestats_request_duration_seconds_count{route="player-list-or-create",method="GET"} 2', lines)
+		self.assertIn('gamestats_request_duration_seconds_count{route="player-by-id",method="GET"} 1', lines)
+		# Each request gets its user, then the player.
+		self.assertIn('gamestats_db_queries_sum{route="player-by-id",method="GET"} 2.0', lines)
+		serialization = metrics.collect()["player-by-id", "GET"]["serialization_duration_seconds"]
+		self.assertGreater(serialization["sum"], 0)
+
+		response = self.non_admin_client.get(reverse("metrics"))
+		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+		response = APIClient().get(reverse("metrics"))
+		self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+	def test_server_timing(self):
+		"""
+		Tests that the Server-Timing header is only sent with the REQUEST_METRICS_SERVER_TIMING setting.
+		"""
+		with override_settings(REQUEST_METRICS_SERVER_TIMING=True):
+			response = self.non_admin_client.get(reverse("player-by-id", kwargs={"pk": self.player.id}))
+		self.assertRegex(response["Server-Timing"],
+		                 r'^db;dur=[\d.]+;desc="2 queries", serialization;dur=[\d.]+, total;dur=[\d.]+$')
+
+		with override_settings(REQUEST_METRICS_SERVER_TIMING=False):
+			response = self.non_admin_client.get(reverse("player-by-id", kwargs={"pk": self.player.id}))
+		self.assertNotIn("Server-Timing", response)
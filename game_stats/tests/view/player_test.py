@@ -1,10 +1,17 @@
+from unittest.mock import patch
+from django.core.cache import cache
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils.http import http_date
 from rest_framework import status
+from rest_framework.permissions import BasePermission
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import AccessToken
-from game_stats.models import Player
+from game_stats.models import Player, Stat, Game
+from game_stats.serializers import PlayerSerializer
+from game_stats.views import PlayerRetrieveUpdateDestroy
 
 
 class PlayerViewsTest(TestCase):
@@ -34,6 +41,48 @@ class PlayerViewsTest(TestCase):
         self.assertIn(self.player2.nickname, returned_nicknames)
         self.assertIn(self.player3.nickname, returned_nicknames)
 
+    def test_get_players_same_as_serializer(self):
+        """
+        Tests that GET to /players/ endpoint, which reads the players' columns with `values()`, returns exactly what the
+        player serializer outputs.
+        """
+        Player.objects.filter(id=self.player2.id).update(profile_image="https://example.com/player2.png")
+        players = PlayerSerializer(Player.objects.order_by("id"), many=True).data
+        response = self.client.get(reverse("player-list-or-create"), HTTP_ACCEPT="application/json")
+        self.assertEqual(response.content, JSONRenderer().render(
+            {"next": None, "previous": None, "count": 3, "results": players}))
+
+    def test_get_players_fields(self):
+        """
+        Tests GET to /players/ and /players/{id}/ endpoints with "fields", which only returns the fields asked for.
+        """
+        response = self.client.get(reverse("player-list-or-create"), {"fields": "nickname"})
+        self.assertEqual(response.data["results"], [{"nickname": player.nickname}
+                                                    for player in [self.player1, self.player2, self.player3]])
+        response = self.client.get(reverse("player-by-id", kwargs={"pk": self.player2.id}), {"fields": "id,user"})
+        self.assertEqual(response.data, {"id": self.player2.id, "user": self.user2.id})
+        response = self.client.get(reverse("player-list-or-create"), {"expand": "user"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_players_not_modified(self):
+        """
+        Tests GET to /players/ with the ETag of the current list, which should get a 304 response until a player is
+        written. Modification times, whole seconds in HTTP, aren't used: If-Modified-Since alone always gets the list.
+        """
+        url = reverse("player-list-or-create")
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response["ETag"]
+        self.player3.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+
     def test_get_player_detail(self):
         """
         Tests GET to /players/<int:pk>/ endpoint by retrieving a specific player by its id.
@@ -42,6 +91,20 @@ class PlayerViewsTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["nickname"], self.player1.nickname)
 
+    def test_get_player_object_permissions(self):
+        """
+        Tests that GET to /players/<int:pk>/ checks the object permissions of the view, with the player's fields.
+        """
+        class IsPlayer1(BasePermission):
+            def has_object_permission(self, request, view, obj):
+                return obj.nickname == "player_view_test_player1"
+
+        with patch.object(PlayerRetrieveUpdateDestroy, "get_permissions", return_value=[IsPlayer1()]):
+            response = self.client.get(reverse("player-by-id", args=[self.player1.id]))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.get(reverse("player-by-id", args=[self.player2.id]))
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_get_player_no_trailing_slash(self):
         """
         Tests GET to /players/<int:pk> (no trailing slash) endpoint by retrieving a specific player by its id.
@@ -50,6 +113,81 @@ class PlayerViewsTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["nickname"], self.player1.nickname)
 
+    def test_get_player_summary(self):
+        """
+        Tests GET to /players/<int:pk>/summary/ endpoint by retrieving the aggregated stats and games of a player.
+        """
+        game = Game.objects.create(winner=self.player1)
+        game.players.set([self.player1, self.player2])
+        Stat.objects.create(player=self.player1, score=10, game=game)
+        Stat.objects.create(player=self.player1, score=20)
+
+        with self.assertNumQueries(2):  # authenticated user and summary
+            response = self.client.get(reverse("player-summary", args=[self.player1.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            "player": self.player1.id, "stats_count": 2, "total_score": 30, "average_score": 15.0, "best_score": 20,
+            "games_played": 1, "wins": 1,
+        })
+
+    def test_get_player_summary_without_activity(self):
+        """
+        Tests GET to /players/<int:pk>/summary/ endpoint for a player with no stats or games, and for a missing player.
+        """
+        response = self.client.get(reverse("player-summary", args=[self.player3.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["stats_count"], 0)
+        self.assertIsNone(response.data["average_score"])
+
+        response = self.client.get(reverse("player-summary", args=[self.player3.id + 100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_player_rank(self):
+        """
+        Tests GET to /players/<int:pk>/rank/ endpoint by retrieving a player's rank and neighbours with a few primary key
+        and index lookups, for a player without scores, and for a missing player.
+        """
+        for player, score in [(self.player1, 30), (self.player2, 50), (self.player3, 10)]:
+            Stat.objects.create(player=player, score=score)
+
+        # Authenticated user, summary, players above and below (with the same score, then with another one), counts and
+        # tree nodes.
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse("player-rank", args=[self.player1.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["rank"], 2)
+        self.assertEqual(response.data["players"], 3)
+        self.assertEqual(response.data["above"]["nickname"], self.player2.nickname)
+        self.assertEqual(response.data["below"]["best_score"], 10)
+
+        Stat.objects.filter(player=self.player3).delete()
+        response = self.client.get(reverse("player-rank", args=[self.player3.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["rank"])
+
+        response = self.client.get(reverse("player-rank", args=[self.player3.id + 100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_player_percentile(self):
+        """
+        Tests GET to /players/<int:pk>/percentile/ endpoint by comparing a player's scores to everyone's, and for a
+        missing player.
+        """
+        cache.clear()
+        for player, score in [(self.player1, 30), (self.player1, 10), (self.player2, 20)]:
+            Stat.objects.create(player=player, score=score)
+
+        response = self.client.get(reverse("player-percentile", args=[self.player1.id]), {"window": "week"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["mean"], 20)
+        self.assertEqual(response.data["best_score"], 30)
+        self.assertEqual(response.data["best_score_percentile"], round(100 * 2.5 / 3, 2))
+        self.assertEqual(response.data["mean_percentile"], 50)
+
+        response = self.client.get(reverse("player-percentile", args=[self.player3.id + 100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_create_player(self):
         """
         Tests POST to /players/ to create a new player.
@@ -0,0 +1,166 @@
+import asyncio
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from game_stats import routers
+from game_stats.models import Game, LeaderboardEntry, Player, Stat, User
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTest(TestCase):
+	databases = {"default", "replica"}
+
+	@classmethod
+	def setUpClass(cls):
+		"""
+		Creates the tables read in the replica, to which migrations aren't applied.
+		"""
+		with connections["replica"].schema_editor() as editor:
+			for model in [User, Player, Game, Stat, LeaderboardEntry]:
+				editor.create_model(model)
+		super().setUpClass()
+
+	@classmethod
+	def tearDownClass(cls):
+		super().tearDownClass()
+		with connections["replica"].schema_editor() as editor:
+			for model in [LeaderboardEntry, Stat, Game, Player, User]:
+				editor.delete_model(model)
+
+	def setUp(self):
+		"""
+		Creates test data in the primary database. Only the users are copied to the replica, which otherwise never
+		catches up, so that what is read from it is known.
+		"""
+		cache.clear()
+		self.user1 = User.objects.create(username="replica_test_user1", password="test_password")
+		self.user2 = User.objects.create(username="replica_test_user2", password="test_password")
+		for user in [self.user1, self.user2]:
+			User.objects.using("replica").create(id=user.id, username=user.username, password=user.password)
+		self.player = Player.objects.create(user=self.user1, nickname="replica_test_player")
+		self.game = Game.objects.create(winner=self.player)
+		Stat.objects.create(player=self.player, game=self.game, score=10)
+
+		self.client1 = APIClient()
+		self.client1.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user1)}")
+		self.client2 = APIClient()
+		self.client2.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user2)}")
+
+	def test_reads_from_replica(self):
+		"""
+		Tests that GET requests to game_stats views read from the replica only, and that reads outside of requests
+		don't.
+		"""
+		with self.assertNumQueries(0, using="default"):
+			response = self.client1.get(reverse("game-by-id", args=[self.game.id]))
+		self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+		self.assertEqual(Game.objects.count(), 1)
+
+	def test_versioned_views_wait_for_replicas(self):
+		"""
+		Tests that lists and rankings read from the replica within REPLICA_PIN_SECONDS of a write are neither cached nor
+		given an ETag, so that clients don't keep them once the replica has caught up, and that they are afterwards.
+		"""
+		with self.assertNumQueries(0, using="default"):
+			response = self.client1.get(reverse("game-list-or-create"))
+			self.assertEqual(response.data["count"], 0)
+			self.assertNotIn("ETag", response)
+			self.assertEqual(self.client1.get(reverse("top-10-scores"), format="json").data, [])
+			response = self.client1.get(reverse("top-10-scores"), format="json")
+			self.assertEqual(response["X-Cache"], "MISS")
+			self.assertNotIn("ETag", response)
+
+		with self.settings(REPLICA_PIN_SECONDS=0):
+			response = self.client1.get(reverse("game-list-or-create"))
+			self.assertIn("ETag", response)
+			response = self.client1.get(reverse("game-list-or-create"), HTTP_IF_NONE_MATCH=response["ETag"])
+			self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+			self.client1.get(reverse("top-10-scores"), format="json")
+			self.assertEqual(self.client1.get(reverse("top-10-scores"), format="json")["X-Cache"], "HIT")
+
+	def test_streamed_export_reads_from_replica(self):
+		"""
+		Tests that the stats of the CSV export, read while its body is streamed, are read from the replica.
+		"""
+		with self.assertNumQueries(0, using="default"):
+			response = self.client1.get(reverse("stat-export"))
+			content = b"".join(response.streaming_content).decode()
+		# The header only.
+		self.assertEqual(len(content.splitlines()), 1)
+
+		with self.settings(DATABASE_REPLICAS=[]):
+			response = self.client1.get(reverse("stat-export"))
+			self.assertEqual(len(b"".join(response.streaming_content).decode().splitlines()), 2)
+
+	def test_route_async_stream(self):
+		"""
+		Tests that the routing of a request is current while the chunks of its asynchronous streamed body are produced
+		only.
+		"""
+		routing = routers.RequestRouting(None)
+
+		async def content():
+			for _ in range(2):
+				yield routers.get_current()
+
+		async def read():
+			return [chunk async for chunk in routers.route_stream(routing, content())], routers.get_current()
+
+		self.assertEqual(asyncio.run(read()), ([routing, routing], None))
+
+	def test_read_your_writes(self):
+		"""
+		Tests that writes go to the primary, as do the reads of the request writing (the game's players are validated
+		against the primary), and that the client that wrote reads from the primary until its pin expires, while other
+		clients keep reading from the replica.
+		"""
+		data = {"players": [self.player.id], "winner": self.player.id}
+		response = self.client1.post(reverse("game-list-or-create"), data, format="json")
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		self.assertEqual(Game.objects.count(), 2)
+
+		game_id = response.data["id"]
+		self.assertEqual(self.client1.get(reverse("game-by-id", args=[game_id])).status_code, status.HTTP_200_OK)
+		self.assertEqual(self.client1.get(reverse("player-by-id", args=[self.player.id])).status_code,
+			status.HTTP_200_OK)
+		self.assertEqual(self.client2.get(reverse("game-by-id", args=[game_id])).status_code,
+			status.HTTP_404_NOT_FOUND)
+
+		# The pin expires.
+		cache.clear()
+		self.assertEqual(self.client1.get(reverse("game-by-id", args=[game_id])).status_code,
+			status.HTTP_404_NOT_FOUND)
+
+	def test_failed_write_not_pinned(self):
+		"""
+		Tests that a request that doesn't write (here, an invalid one) doesn't pin its client to the primary.
+		"""
+		response = self.client1.post(reverse("game-list-or-create"), {"players": [0]}, format="json")
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertEqual(self.client1.get(reverse("game-by-id", args=[self.game.id])).status_code,
+			status.HTTP_404_NOT_FOUND)
+
+	def test_no_replicas(self):
+		"""
+		Tests that everything goes to the primary without replicas.
+		"""
+		with self.settings(DATABASE_REPLICAS=[]), self.assertNumQueries(0, using="replica"):
+			response = self.client1.get(reverse("game-by-id", args=[self.game.id]))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+	def test_replica_objects_written_to_primary(self):
+		"""
+		Tests that objects read from the replica are saved to the primary, and can be related to objects of the primary.
+		"""
+		user = User.objects.using("replica").get(id=self.user2.id)
+		user.first_name = "replica"
+		user.save()
+		self.assertEqual(User.objects.get(id=self.user2.id).first_name, "replica")
+		self.assertEqual(User.objects.using("replica").get(id=self.user2.id).first_name, "")
+
+		player = Player.objects.create(user=user, nickname="replica_test_player2")
+		self.assertEqual(player.user_id, self.user2.id)
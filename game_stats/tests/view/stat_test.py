@@ -1,10 +1,25 @@
+import io
+import json
+import msgpack
+import pyarrow as pa
+import pyarrow.parquet as pq
+from asgiref.sync import sync_to_async
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import AccessToken
-from game_stats.models import Stat, Player, User
+from game_stats.models import Stat, Player, User, Game
+from game_stats.serializers import StatSerializer
+from game_stats.views import StatExport, StatRankingStreamView
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from datetime import timedelta
+from game_stats import leaderboard
+from django.core.cache import cache
+from unittest.mock import patch
 
 
 class StatViewsTest(TestCase):
@@ -42,6 +57,126 @@ class StatViewsTest(TestCase):
 		self.assertEqual(self.stat3.score, returned_stats[2]["score"])
 		self.assertEqual(self.stat3.player.nickname, returned_stats[2]["player"]["nickname"])
 
+	def test_get_stats_query_count(self):
+		"""
+		Tests that GET to /stats/ endpoint runs a fixed number of queries, whatever the number of stats (and their games
+		and players) in the page.
+		"""
+		def create_game_stats():
+			game = Game.objects.create(winner=self.player2)
+			game.players.set([self.player1, self.player2])
+			Stat.objects.create(player=self.player1, score=20, game=game)
+			Stat.objects.create(player=self.player2, score=30, game=game)
+
+		create_game_stats()
+		with CaptureQueriesContext(connection) as small_page_queries:
+			self.admin_client.get(reverse("stat-list-or-create"), {"page_size": 100})
+
+		for _ in range(20):
+			create_game_stats()
+		with self.assertNumQueries(len(small_page_queries)):
+			response = self.admin_client.get(reverse("stat-list-or-create"), {"page_size": 100})
+		self.assertEqual(len(response.data["results"]), 45)
+		self.assertEqual(response.data["results"][-1]["game"]["winner"]["id"], self.player2.id)
+
+	def test_get_stats_same_as_serializer(self):
+		"""
+		Tests that GET to /stats/ endpoint, which reads the stats' columns with `values()`, returns exactly what the
+		stat serializer outputs, with page number and cursor pagination.
+		"""
+		game = Game.objects.create(winner=self.player2)
+		game.players.set([self.player2, self.player1])
+		Stat.objects.create(player=self.player1, score=None, game=game)
+		Stat.objects.create(player=self.player2, score=30, game=game)
+		Player.objects.filter(id=self.player2.id).update(profile_image="https://example.com/player2.png")
+
+		stats = StatSerializer.setup_eager_loading(Stat.objects.order_by("id"))
+		expected_results = StatSerializer(stats, many=True).data
+		response = self.admin_client.get(reverse("stat-list-or-create"), HTTP_ACCEPT="application/json")
+		self.assertEqual(response.content, JSONRenderer().render(
+			{"next": None, "previous": None, "count": 5, "results": expected_results}))
+
+		response = self.admin_client.get(reverse("stat-list-or-create"), {"pagination": "cursor", "page_size": 4},
+		                                 HTTP_ACCEPT="application/json")
+		self.assertEqual(JSONRenderer().render(response.data["results"]), JSONRenderer().render(expected_results[:4]))
+
+	def test_get_stats_fields_and_expand(self):
+		"""
+		Tests GET to /stats/ endpoint with "fields" and "expand": only the fields asked for are returned, relations not
+		expanded are returned as ids, and the columns and queries they would need aren't read.
+		"""
+		game = Game.objects.create(winner=self.player2)
+		game.players.set([self.player1, self.player2])
+		stat = Stat.objects.create(player=self.player1, score=20, game=game)
+		url = reverse("stat-list-or-create")
+
+		with CaptureQueriesContext(connection) as queries:
+			response = self.admin_client.get(url, {"fields": "id,score,game", "expand": ""})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data["results"][-1], {"id": stat.id, "score": 20, "game": game.id})
+		self.assertEqual(response.data["results"][0], {"id": self.stat1.id, "score": 10, "game": None})
+		page_query = queries[-1]["sql"]
+		self.assertNotIn("game_stats_player", page_query)
+		self.assertNotIn("game_stats_game_players", " ".join(query["sql"] for query in queries))
+
+		response = self.admin_client.get(url, {"fields": "player,game", "expand": "game"})
+		self.assertEqual(response.data["results"][-1], {
+			"player": self.player1.id, "game": {"id": game.id, "winner": self.player2.id,
+			                                    "players": [self.player1.id, self.player2.id]}})
+
+		response = self.admin_client.get(url, {"fields": "game", "expand": "game.players"})
+		game_representation = response.data["results"][-1]["game"]
+		self.assertEqual(game_representation["winner"], self.player2.id)
+		self.assertEqual([player["nickname"] for player in game_representation["players"]],
+		                 [self.player1.nickname, self.player2.nickname])
+
+		# Without "expand", every relation is expanded, as before.
+		response = self.admin_client.get(url, {"fields": "player"})
+		self.assertEqual(response.data["results"][0]["player"]["nickname"], self.player1.nickname)
+
+		response = self.admin_client.get(reverse("stat-by-id", kwargs={"pk": stat.id}),
+		                                 {"fields": "score,player", "expand": "player"})
+		self.assertEqual(response.data, {"score": 20, "player": {
+			"id": self.player1.id, "nickname": self.player1.nickname, "profile_image": None, "user": self.admin_user.id}})
+
+	def test_get_stats_invalid_fields_and_expand(self):
+		"""
+		Tests that unknown fields or relations get a 400 response.
+		"""
+		response = self.admin_client.get(reverse("stat-list-or-create"), {"fields": "id,password"})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertIn("password", response.data["fields"])
+		response = self.admin_client.get(reverse("stat-by-id", kwargs={"pk": self.stat1.id}), {"expand": "player.user"})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertIn("expand", response.data)
+
+	def test_get_stats_cursor_pagination(self):
+		"""
+		Tests GET to /stats/ endpoint in cursor pagination mode by following the "next" links through every stat, in id
+		order, without running a COUNT query for each page.
+		"""
+		response = self.admin_client.get(reverse("stat-list-or-create"), {"pagination": "cursor", "page_size": 2})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data["count"], 3)
+		self.assertEqual([stat["id"] for stat in response.data["results"]], [self.stat1.id, self.stat2.id])
+		self.assertIsNone(response.data["previous"])
+
+		with CaptureQueriesContext(connection) as queries:
+			response = self.admin_client.get(response.data["next"])
+		self.assertFalse([query for query in queries if "COUNT(" in query["sql"].upper()])
+		self.assertEqual([stat["id"] for stat in response.data["results"]], [self.stat3.id])
+		self.assertIsNone(response.data["next"])
+		self.assertIsNotNone(response.data["previous"])
+
+	def test_get_stats_cursor_pagination_without_count(self):
+		"""
+		Tests that the count can be left out of cursor paginated responses.
+		"""
+		response = self.admin_client.get(reverse("stat-list-or-create"), {"pagination": "cursor", "count": "none"})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertNotIn("count", response.data)
+		self.assertEqual(len(response.data["results"]), 3)
+
 	def test_get_stat_detail(self):
 		"""
 		Tests GET to stats/<int:pk>/ endpoint by retrieving a specific stat by its id.
@@ -121,3 +256,500 @@ class StatViewsTest(TestCase):
 		except Stat.DoesNotExist:
 			stat1 = None
 		self.assertIsNotNone(stat1, "Stat should still exist after deletion attempt.")
+
+	def test_get_ranking(self):
+		"""
+		Tests GET to /stats/ranking/ endpoint by validating that stats are returned from highest to lowest score, with
+		flattened player nicknames.
+		"""
+		response = self.non_admin_client.get(reverse("top-10-scores"), HTTP_ACCEPT="application/json")
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data, [
+			{"player": self.player1.nickname, "score": 10},
+			{"player": self.player1.nickname, "score": 5},
+			{"player": self.player1.nickname, "score": 1},
+		])
+
+	def test_get_ranking_window(self):
+		"""
+		Tests GET to /stats/ranking/?window=day, validating that only stats created today are ranked.
+		"""
+		Stat.objects.filter(id=self.stat1.id).update(creation_date=timezone.now() - timedelta(days=40))
+		leaderboard.rebuild_all()
+		response = self.non_admin_client.get(reverse("top-10-scores"), {"window": "day"}, HTTP_ACCEPT="application/json")
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data, [
+			{"player": self.player1.nickname, "score": 5},
+			{"player": self.player1.nickname, "score": 1},
+		])
+
+	def test_get_ranking_invalid_window(self):
+		"""
+		Tests GET to /stats/ranking/ with an unknown window, which should be rejected.
+		"""
+		response = self.non_admin_client.get(reverse("top-10-scores"), {"window": "year"}, HTTP_ACCEPT="application/json")
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_get_ranking_options(self):
+		"""
+		Tests GET to /stats/ranking/ with a limit, and with one stat per player, in JSON, CSV and HTML.
+		"""
+		Stat.objects.create(player=self.player2, score=7)
+		url = reverse("top-10-scores")
+		response = self.non_admin_client.get(url, {"limit": 3}, HTTP_ACCEPT="application/json")
+		self.assertEqual(response.data, [
+			{"player": self.player1.nickname, "score": 10},
+			{"player": self.player2.nickname, "score": 7},
+			{"player": self.player1.nickname, "score": 5},
+		])
+
+		for window in ["all", "week"]:
+			response = self.non_admin_client.get(url, {"window": window, "unique_players": "true"},
+			                                     HTTP_ACCEPT="application/json")
+			self.assertEqual(response.data, [
+				{"player": self.player1.nickname, "score": 10},
+				{"player": self.player2.nickname, "score": 7},
+			])
+
+		response = self.non_admin_client.get(url, {"unique_players": "true", "limit": 1}, HTTP_ACCEPT="text/csv")
+		self.assertEqual(response["Content-Disposition"], 'attachment; filename="top_players.csv"')
+		self.assertEqual(response.content.decode().splitlines(), ["Rank,Player,Score", f"1,{self.player1.nickname},10"])
+
+		response = self.non_admin_client.get(url, {"unique_players": "true", "limit": 5}, HTTP_ACCEPT="text/html")
+		self.assertContains(response, "Ranking: top 5 players</h1>")
+
+		for params in [{"limit": 0}, {"limit": leaderboard.LEADERBOARD_CAPACITY + 1}, {"unique_players": "yes"}]:
+			response = self.non_admin_client.get(url, params, HTTP_ACCEPT="application/json")
+			self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_get_ranking_unique_players_cached(self):
+		"""
+		Tests that rankings of players are cached until a player's best score or nickname changes.
+		"""
+		url = reverse("top-10-scores")
+		params = {"unique_players": "true"}
+		self.assertEqual(self.non_admin_client.get(url, params, HTTP_ACCEPT="application/json")["X-Cache"], "MISS")
+		# The player's best score doesn't change.
+		Stat.objects.create(player=self.player1, score=3)
+		self.assertEqual(self.non_admin_client.get(url, params, HTTP_ACCEPT="application/json")["X-Cache"], "HIT")
+
+		Stat.objects.create(player=self.player2, score=3)
+		response = self.non_admin_client.get(url, params, HTTP_ACCEPT="application/json")
+		self.assertEqual(response["X-Cache"], "MISS")
+		self.assertEqual(len(response.json()), 2)
+
+		self.player2.nickname = "stat_view_test_renamed"
+		self.player2.save()
+		response = self.non_admin_client.get(url, params, HTTP_ACCEPT="application/json")
+		self.assertEqual(response.json()[1]["player"], "stat_view_test_renamed")
+
+	def test_get_ranking_cached(self):
+		"""
+		Tests that rankings are served from the cache until a stat written changes the leaderboard, or a ranked player is
+		updated.
+		"""
+		url = reverse("top-10-scores")
+		response = self.non_admin_client.get(url, HTTP_ACCEPT="application/json")
+		self.assertEqual(response["X-Cache"], "MISS")
+		cached_response = self.non_admin_client.get(url, HTTP_ACCEPT="application/json")
+		self.assertEqual(cached_response["X-Cache"], "HIT")
+		self.assertEqual(cached_response.content, response.content)
+		self.assertEqual(self.non_admin_client.get(url, HTTP_ACCEPT="text/csv")["X-Cache"], "MISS")
+
+		# The leaderboard is full, so this stat can't enter it.
+		with patch.object(leaderboard, "LEADERBOARD_CAPACITY", 3):
+			Stat.objects.create(player=self.player2, score=0)
+		self.assertEqual(self.non_admin_client.get(url, HTTP_ACCEPT="application/json")["X-Cache"], "HIT")
+
+		Stat.objects.create(player=self.player2, score=20)
+		response = self.non_admin_client.get(url, HTTP_ACCEPT="application/json")
+		self.assertEqual(response["X-Cache"], "MISS")
+		self.assertEqual(response.json()[0], {"player": self.player2.nickname, "score": 20})
+
+		self.player2.nickname = "stat_view_test_renamed"
+		self.player2.save()
+		response = self.non_admin_client.get(url, HTTP_ACCEPT="application/json")
+		self.assertEqual(response["X-Cache"], "MISS")
+		self.assertEqual(response.json()[0], {"player": "stat_view_test_renamed", "score": 20})
+
+	def test_get_ranking_cache_stats(self):
+		"""
+		Tests GET to /stats/ranking/cache/ endpoint, which only admins can use, by validating the hit and miss counters.
+		"""
+		cache.clear()
+		self.non_admin_client.get(reverse("top-10-scores"), HTTP_ACCEPT="application/json")
+		self.non_admin_client.get(reverse("top-10-scores"), HTTP_ACCEPT="application/json")
+
+		response = self.admin_client.get(reverse("ranking-cache-stats"))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data, {"hits": 1, "misses": 1})
+		response = self.non_admin_client.get(reverse("ranking-cache-stats"))
+		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+	def test_get_ranking_not_modified(self):
+		"""
+		Tests GET to /stats/ranking/ with the ETag of the current ranking, which should get an empty 304 response.
+		"""
+		url = reverse("top-10-scores")
+		etag = self.non_admin_client.get(url, HTTP_ACCEPT="application/json")["ETag"]
+		response = self.non_admin_client.get(url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+		self.assertEqual(response.content, b"")
+
+		Stat.objects.create(player=self.player2, score=20)
+		response = self.non_admin_client.get(url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertNotEqual(response["ETag"], etag)
+
+	def test_get_ranking_not_modified_formats(self):
+		"""
+		Tests that the HTML, CSV and JSON rankings have their own ETags, and get 304 responses while unchanged without
+		reading the leaderboard.
+		"""
+		url = reverse("top-10-scores")
+		etags = set()
+		for accept in ["text/html", "text/csv", "application/json"]:
+			response = self.non_admin_client.get(url, HTTP_ACCEPT=accept)
+			etags.add(response["ETag"])
+			# Only the authenticated user is queried.
+			with self.assertNumQueries(1):
+				response = self.non_admin_client.get(url, HTTP_ACCEPT=accept, HTTP_IF_NONE_MATCH=response["ETag"])
+			self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+		self.assertEqual(len(etags), 3)
+
+	def test_get_msgpack(self):
+		"""
+		Tests GET to /stats/ and /stats/ranking/ endpoints with "Accept: application/msgpack", validating that the same
+		data as in JSON is returned in MessagePack, and that the ranking is cached separately.
+		"""
+		for url in [reverse("stat-list-or-create"), reverse("top-10-scores")]:
+			json_response = self.non_admin_client.get(url, HTTP_ACCEPT="application/json")
+			response = self.non_admin_client.get(url, HTTP_ACCEPT="application/msgpack")
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+			self.assertEqual(response["Content-Type"], "application/msgpack")
+			self.assertEqual(msgpack.unpackb(response.content), json.loads(json_response.content))
+
+		response = self.non_admin_client.get(reverse("top-10-scores"), HTTP_ACCEPT="application/msgpack")
+		self.assertEqual(response["X-Cache"], "HIT")
+		self.assertEqual(response["Content-Type"], "application/msgpack")
+		self.assertNotEqual(response["ETag"], json_response["ETag"])
+
+	def test_get_stats_not_modified(self):
+		"""
+		Tests GET to /stats/ with the ETag of the current list, which should get a 304 response until a stat, or a game
+		or player shown with the stats, is written.
+		"""
+		url = reverse("stat-list-or-create")
+		etag = self.non_admin_client.get(url)["ETag"]
+		self.assertEqual(self.non_admin_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+		                 status.HTTP_304_NOT_MODIFIED)
+
+		self.player1.nickname = "stat_view_test_renamed"
+		self.player1.save()
+		response = self.non_admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data["results"][0]["player"]["nickname"], "stat_view_test_renamed")
+
+	async def read_ranking_events(self, response, on_event=None):
+		"""
+		Reads a ranking stream until it ends, calling `on_event` (if given) after each event.
+
+		Returns:
+		list: The data of the "ranking" events received.
+		"""
+		rankings = []
+		async for chunk in response.streaming_content:
+			event = chunk.decode()
+			if event.startswith("event: ranking"):
+				rankings.append(json.loads(event.split("data: ", 1)[1]))
+				if on_event:
+					await on_event()
+		return rankings
+
+	async def test_stream_ranking(self):
+		"""
+		Tests GET to /stats/ranking/stream/ endpoint, validating that the ranking is sent when the stream opens and then
+		only when it changes.
+		"""
+		headers = {"Authorization": f"Bearer {self.non_admin_access_token}"}
+		with patch.object(StatRankingStreamView, "poll_interval", 0.01), \
+				patch.object(StatRankingStreamView, "max_duration", 0.3):
+			response = await self.async_client.get(reverse("ranking-stream"), headers=headers)
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+			self.assertEqual(response["Content-Type"], "text/event-stream")
+
+			async def add_stat():
+				if not await Stat.objects.filter(score=20).aexists():
+					await Stat.objects.acreate(player=self.player2, score=20)
+
+			rankings = await self.read_ranking_events(response, add_stat)
+		self.assertEqual(len(rankings), 2)
+		self.assertEqual(rankings[0][0], {"player": self.player1.nickname, "score": 10})
+		self.assertEqual(rankings[1][0], {"player": self.player2.nickname, "score": 20})
+
+	async def test_stream_ranking_resumed(self):
+		"""
+		Tests that a client reconnecting to /stats/ranking/stream/ with the id of the last ranking it received doesn't get
+		the same ranking again.
+		"""
+		headers = {"Authorization": f"Bearer {self.non_admin_access_token}"}
+		with patch.object(StatRankingStreamView, "poll_interval", 0.01), \
+				patch.object(StatRankingStreamView, "max_duration", 0.1):
+			response = await self.async_client.get(reverse("ranking-stream"), headers=headers)
+			chunks = [chunk async for chunk in response.streaming_content]
+			event_id = chunks[0].decode().split("id: ", 1)[1].split("\n", 1)[0]
+			response = await self.async_client.get(reverse("ranking-stream"),
+			                                       headers={**headers, "Last-Event-ID": event_id})
+			self.assertEqual(await self.read_ranking_events(response), [])
+
+	async def test_stream_ranking_unauthenticated(self):
+		"""
+		Tests GET to /stats/ranking/stream/ without credentials, or through WSGI, which should be rejected.
+		"""
+		response = await self.async_client.get(reverse("ranking-stream"))
+		self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+		response = await sync_to_async(self.non_admin_client.get)(reverse("ranking-stream"))
+		self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+	async def test_stream_ranking_session(self):
+		"""
+		Tests GET to /stats/ranking/stream/ and /stats/ranking/ with the session of a logged in user, as sent by the
+		ranking page.
+		"""
+		await sync_to_async(self.async_client.force_login)(self.non_admin_user)
+		with patch.object(StatRankingStreamView, "max_duration", 0):
+			response = await self.async_client.get(reverse("ranking-stream"))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		response = await self.async_client.get(reverse("top-10-scores"), headers={"Accept": "application/json"})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+	def test_bulk_create_stats(self):
+		"""
+		Tests POST to /stats/bulk/ endpoint with a list of stats, validating that they are created and ranked, and that
+		the players' summaries are updated.
+		"""
+		game = Game.objects.create()
+		game.players.set([self.player1, self.player2])
+		data = [
+			{"player": self.player2.id, "score": 30, "game": game.id},
+			{"player": self.player2.id, "score": 20},
+			{"player": self.player1.id},
+		]
+		response = self.non_admin_client.post(reverse("stat-bulk-create"), data, format="json")
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		self.assertEqual(response.data, {"created": 3, "game": None})
+		self.assertEqual(Stat.objects.filter(player=self.player2, game=game, score=30).count(), 1)
+		self.assertEqual([entry.score for entry in leaderboard.get_top_entries()], [30, 20, 10, 5, 1])
+		self.assertEqual(leaderboard.check(), [])
+		self.assertEqual(self.player2.summary.stats_count, 2)
+		self.assertEqual(self.player2.summary.best_score, 30)
+
+	def test_bulk_create_game_with_stats(self):
+		"""
+		Tests POST to /stats/bulk/ endpoint with a new game and its stats, validating that the stats belong to the game.
+		"""
+		data = {
+			"game": {"players": [self.player1.id, self.player2.id], "winner": self.player2.id},
+			"stats": [{"player": self.player1.id, "score": 3}, {"player": self.player2.id, "score": 7}],
+		}
+		response = self.non_admin_client.post(reverse("stat-bulk-create"), data, format="json")
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		game = Game.objects.get(id=response.data["game"])
+		self.assertEqual(game.winner, self.player2)
+		self.assertEqual(sorted(game.stat_set.values_list("score", flat=True)), [3, 7])
+
+	def test_bulk_create_stats_errors(self):
+		"""
+		Tests POST to /stats/bulk/ endpoint with invalid stats, validating that the errors of each stat are returned and
+		that nothing is created.
+		"""
+		game = Game.objects.create()
+		game.players.set([self.player1])
+		data = {
+			"game": {"players": [self.player1.id]},
+			"stats": [
+				{"player": self.player1.id, "score": 3},
+				{"player": self.player2.id, "score": 7},
+				{"player": 0},
+				{"player": self.player1.id, "score": -1},
+				{"player": self.player1.id, "score": 4294967296},
+			],
+		}
+		stats_count = Stat.objects.count()
+		response = self.non_admin_client.post(reverse("stat-bulk-create"), data, format="json")
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		errors = response.data["stats"]
+		self.assertEqual(errors[0], {})
+		self.assertEqual(errors[1], {"non_field_errors": ["Player must be included in the game's players list."]})
+		self.assertEqual(list(errors[2]), ["player"])
+		self.assertEqual(list(errors[3]), ["score"])
+		self.assertEqual(list(errors[4]), ["score"])
+		self.assertEqual(Stat.objects.count(), stats_count)
+		self.assertEqual(Game.objects.count(), 1)
+
+		data = [{"player": self.player1.id, "game": game.id + 1}]
+		response = self.non_admin_client.post(reverse("stat-bulk-create"), data, format="json")
+		self.assertEqual(list(response.data["stats"][0]), ["game"])
+
+	def test_bulk_create_stats_msgpack(self):
+		"""
+		Tests POST to /stats/bulk/ endpoint with a MessagePack body, validating that the stats are created, and that a
+		malformed body is rejected.
+		"""
+		data = [{"player": self.player2.id, "score": 30}, {"player": self.player1.id, "score": 20}]
+		response = self.non_admin_client.post(reverse("stat-bulk-create"), msgpack.packb(data),
+		                                      content_type="application/msgpack", HTTP_ACCEPT="application/msgpack")
+		self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+		self.assertEqual(msgpack.unpackb(response.content), {"created": 2, "game": None})
+		self.assertEqual(Stat.objects.filter(player=self.player2, score=30).count(), 1)
+
+		response = self.non_admin_client.post(reverse("stat-bulk-create"), msgpack.packb(data)[:-1],
+		                                      content_type="application/msgpack")
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_bulk_create_stats_query_count(self):
+		"""
+		Tests that POST to /stats/bulk/ endpoint runs a fixed number of queries, whatever the number of stats.
+		"""
+		game = Game.objects.create()
+		game.players.set([self.player1, self.player2])
+		players = [self.player1.id, self.player2.id]
+
+		def post(count):
+			data = [{"player": players[index % 2], "score": index, "game": game.id} for index in range(count)]
+			with CaptureQueriesContext(connection) as queries:
+				response = self.non_admin_client.post(reverse("stat-bulk-create"), data, format="json")
+			self.assertEqual(response.data["created"], count)
+			return len(queries)
+
+		self.assertEqual(post(10), post(200))
+
+	def test_queued_bulk_create_stats(self):
+		"""
+		Tests POST to /stats/bulk/?queued=true, validating that the stats are accepted and then created by the flush
+		task (run right away in tests), and that the queue's metrics are shown at /stats/queue/.
+		"""
+		cache.clear()
+		data = {
+			"game": {"players": [self.player1.id, self.player2.id]},
+			"stats": [{"player": self.player1.id, "score": 3}, {"player": self.player2.id, "score": 7}],
+		}
+		response = self.non_admin_client.post(reverse("stat-bulk-create") + "?queued=true", data, format="json")
+		self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+		self.assertEqual(response.data["queued"], 2)
+		self.assertEqual(sorted(Game.objects.get(id=response.data["game"]).stat_set.values_list("score", flat=True)),
+		                 [3, 7])
+
+		response = self.admin_client.get(reverse("stat-queue"))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data["queued_submissions"], 0)
+		self.assertEqual(response.data["created_stats"], 2)
+		self.assertEqual(self.non_admin_client.get(reverse("stat-queue")).status_code, status.HTTP_403_FORBIDDEN)
+
+	def test_queued_create_stat(self):
+		"""
+		Tests POST to /stats/?queued=true, validating that invalid fields are rejected right away and that valid stats
+		are accepted.
+		"""
+		url = reverse("stat-list-or-create") + "?queued=true"
+		response = self.non_admin_client.post(url, {"player": self.player2.id, "score": -1}, format="json")
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertIn("score", response.data)
+
+		response = self.non_admin_client.post(url, {"player": self.player2.id, "score": 8}, format="json")
+		self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+		self.assertTrue(Stat.objects.filter(player=self.player2, score=8).exists())
+
+	def test_export_stats(self):
+		"""
+		Tests GET to /stats/export.csv endpoint, validating that every stat is streamed in id order, reading them a few
+		at a time.
+		"""
+		with patch.object(StatExport, "chunk_size", 2):
+			response = self.non_admin_client.get(reverse("stat-export"))
+			self.assertEqual(response.status_code, status.HTTP_200_OK)
+			self.assertEqual(response["Content-Type"], "text/csv")
+			with CaptureQueriesContext(connection) as queries:
+				lines = b"".join(response.streaming_content).decode().splitlines()
+		# Two chunks of stats, and the query finding there are no more.
+		self.assertEqual(len(queries), 3)
+		self.assertEqual(lines[0], "Stat,Player,Score,Game,Creation date")
+		self.assertEqual(len(lines), 4)
+		self.assertEqual(lines[1], f"{self.stat1.id},{self.player1.nickname},10,,"
+		                           f"{self.stat1.creation_date.strftime('%Y-%m-%d %H:%M:%S')}")
+		self.assertEqual([line.split(",")[2] for line in lines[1:]], ["10", "5", "1"])
+
+	def test_export_stats_filters(self):
+		"""
+		Tests GET to /stats/export.csv endpoint with player, game and date filters.
+		"""
+		game = Game.objects.create()
+		game.players.set([self.player2])
+		Stat.objects.create(player=self.player2, game=game, score=7)
+		Stat.objects.filter(id=self.stat1.id).update(creation_date=timezone.now() - timedelta(days=10))
+
+		def export(params):
+			response = self.non_admin_client.get(reverse("stat-export"), params)
+			return [line.split(",")[2] for line in b"".join(response.streaming_content).decode().splitlines()[1:]]
+
+		self.assertEqual(export({"player": self.player2.id}), ["7"])
+		self.assertEqual(export({"game": game.id}), ["7"])
+		self.assertEqual(export({"player": self.player1.id, "from": str(timezone.localdate() - timedelta(days=1))}),
+		                 ["5", "1"])
+		self.assertEqual(export({"to": (timezone.now() - timedelta(days=1)).isoformat()}), ["10"])
+
+		response = self.non_admin_client.get(reverse("stat-export"), {"from": "yesterday"}, HTTP_ACCEPT="text/csv")
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertIn("from", response.json())
+
+	def test_columnar_export(self):
+		"""
+		Tests GET to /stats/export.parquet and /players/export.arrow endpoints, validating that the files are streamed
+		one record batch at a time, and that stats can be filtered.
+		"""
+		response = self.admin_client.get(reverse("columnar-export", args=["stats", "parquet"]), {"player": self.player1.id})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response["Content-Type"], "application/vnd.apache.parquet")
+		self.assertEqual(response["Content-Disposition"], 'attachment; filename="stats.parquet"')
+		table = pq.read_table(io.BytesIO(b"".join(response.streaming_content)))
+		self.assertEqual(table.column("score").to_pylist(), [10, 5, 1])
+
+		response = self.admin_client.get(reverse("columnar-export", args=["players", "arrow"]))
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		table = pa.ipc.open_file(b"".join(response.streaming_content)).read_all()
+		self.assertEqual(table.column("nickname").to_pylist(), [self.player1.nickname, self.player2.nickname])
+
+		response = self.admin_client.get(reverse("columnar-export", args=["stats", "arrow"]), {"from": "yesterday"})
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_columnar_export_non_admin(self):
+		"""
+		Tests that only admin users can use the columnar export.
+		"""
+		response = self.non_admin_client.get(reverse("columnar-export", args=["stats", "parquet"]))
+		self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+	def test_distribution(self):
+		"""
+		Tests GET to /stats/distribution/ endpoint, with and without a score, and with invalid parameters.
+		"""
+		cache.clear()
+		url = reverse("stat-distribution")
+		response = self.non_admin_client.get(url, {"window": "day", "bins": 3, "score": 5})
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		self.assertEqual(response.data["count"], 3)
+		self.assertEqual(response.data["histogram"]["counts"], [1, 1, 1])
+		self.assertEqual(response.data["percentile"], 50)
+
+		for params in [{"bins": 0}, {"bins": 1000}, {"score": "high"}, {"window": "year"}]:
+			self.assertEqual(self.non_admin_client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+	async def test_export_stats_asgi(self):
+		"""
+		Tests GET to /stats/export.csv endpoint through ASGI, where the export is streamed asynchronously.
+		"""
+		headers = {"Authorization": f"Bearer {self.non_admin_access_token}"}
+		response = await self.async_client.get(reverse("stat-export"), headers=headers)
+		self.assertEqual(response.status_code, status.HTTP_200_OK)
+		content = b"".join([chunk async for chunk in response.streaming_content]).decode()
+		self.assertEqual(len(content.splitlines()), 4)
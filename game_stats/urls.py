@@ -5,11 +5,23 @@ from game_stats.views import *
 urlpatterns = [
    re_path(r"^players/?$", PlayerListCreate.as_view(), name="player-list-or-create"),
    re_path(r"^players/(?P<pk>\d+)/?$", PlayerRetrieveUpdateDestroy.as_view(), name="player-by-id"),
+   re_path(r"^players/(?P<pk>\d+)/summary/?$", PlayerSummaryView.as_view(), name="player-summary"),
+   re_path(r"^players/(?P<pk>\d+)/percentile/?$", PlayerPercentileView.as_view(), name="player-percentile"),
+   re_path(r"^players/(?P<pk>\d+)/rank/?$", PlayerRankView.as_view(), name="player-rank"),
    re_path(r"^stats/?$", StatListCreate.as_view(), name="stat-list-or-create"),
+   re_path(r"^stats/export\.csv$", StatExport.as_view(), name="stat-export"),
+   re_path(r"^(?P<table>players|games|stats)/export\.(?P<file_format>parquet|arrow)$", ColumnarExport.as_view(),
+           name="columnar-export"),
+   re_path(r"^stats/distribution/?$", StatDistributionView.as_view(), name="stat-distribution"),
+   re_path(r"^stats/bulk/?$", StatBulkCreate.as_view(), name="stat-bulk-create"),
+   re_path(r"^stats/queue/?$", StatQueueView.as_view(), name="stat-queue"),
    re_path(r"^stats/(?P<pk>\d+)/?$", StatRetrieveUpdateDestroy.as_view(), name="stat-by-id"),
    re_path(r"^games/?$", GameListCreate.as_view(), name="game-list-or-create"),
    re_path(r"^games/(?P<pk>\d+)/?$", GameRetrieveUpdateDestroy.as_view(), name="game-by-id"),
    re_path(r"^stats/ranking/?$", StatRankingView.as_view(), name="top-10-scores"),
+   re_path(r"^stats/ranking/stream/?$", StatRankingStreamView.as_view(), name="ranking-stream"),
+   re_path(r"^stats/ranking/cache/?$", RankingCacheStatsView.as_view(), name="ranking-cache-stats"),
+   re_path(r"^metrics/?$", MetricsView.as_view(), name="metrics"),
    re_path(r"^users/?$", UserListCreate.as_view(), name="user-list-or-create"),
    re_path(r"^users/(?P<pk>\d+)/?$", UserRetrieveUpdateDestroy.as_view(), name="user-by-id"),
 ]
@@ -1,14 +1,112 @@
-from .models import Player, Stat, Game
-from .serializers import PlayerSerializer, StatSerializer, GameSerializer, UserSerializer
-from rest_framework import generics
-from rest_framework.pagination import PageNumberPagination
+import asyncio
+import hashlib
+import time
+from datetime import datetime
+from itertools import islice
+from asgiref.sync import sync_to_async
+from .models import Player, Stat, Game, PlayerSummary
+from .serializers import PlayerSerializer, StatSerializer, GameSerializer, UserSerializer, PlayerSummarySerializer, \
+    BulkStatSerializer
+from rest_framework import generics, status
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.renderers import JSONRenderer, TemplateHTMLRenderer
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.renderers import TemplateHTMLRenderer
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.permissions import AllowAny, IsAdminUser
-from django.shortcuts import render
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import quote_etag
+from django.views import View
+from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.models import User
-from .renderers import CustomCSVRenderer
+from .renderers import CustomCSVRenderer, MessagePackRenderer, ORJSONRenderer, StatExportCSVRenderer
+from . import analytics, caching, columnar, ingest, leaderboard, metrics, ranks
+
+
+def get_content_digest(content):
+    """
+    Returns a hash of the given bytes, used in ETags and event ids.
+    """
+    return hashlib.md5(content).hexdigest()
+
+
+def get_not_modified_response(request, etag):
+    """
+    Returns a 304 (Not Modified) response if the request's If-None-Match header matches the given ETag, or None if the
+    full response must be sent. Responses have no Last-Modified header: HTTP dates are in whole seconds, so a write
+    in the same second as a response would go unnoticed by clients sending If-Modified-Since.
+    """
+    validators = HttpResponse()
+    set_etag(validators, etag)
+    response = get_conditional_response(request, etag=etag, response=validators)
+    return None if response is validators else response
+
+
+def set_etag(response, etag):
+    """
+    Adds the ETag header to a response.
+    """
+    response["ETag"] = etag
+
+
+class ConditionalGetMixin:
+    """
+    Answers GET requests with 304 (Not Modified) when the collections shown (the model names in `collections`) haven't
+    been written since the client last fetched them. Their version tokens (see `caching`), bumped whenever their rows
+    are written, are read from the cache, so unchanged responses are answered without querying or serializing anything.
+    Rows written with queryset updates or bulk inserts don't send signals, so they don't bump the versions. Responses
+    read from a replica that may not have caught up with the last writes have no ETag (see `caching.is_settled`).
+    """
+    collections = []
+
+    def get_etag(self, request):
+        """
+        Returns the response's ETag, made of the collections' versions, the requested URL and the format.
+        """
+        versions = caching.get_versions([f"collection:{name}" for name in self.collections])
+        etag = f"{request.get_full_path()}:{request.accepted_renderer.format}:{versions}"
+        return quote_etag(get_content_digest(etag.encode()))
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        response = get_not_modified_response(request, etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if caching.is_settled([f"collection:{name}" for name in self.collections]):
+                set_etag(response, etag)
+        return response
+
+
+class QueuedCreationMixin:
+    """
+    Adds an optional queued mode to views creating stats: with "?queued=true", the stats' fields are validated and the
+    stats are queued (see `ingest`) to be created by a Celery task shortly afterwards, and a 202 (Accepted) response is
+    returned right away. Their players and games are checked when they are created: stats with invalid ones are
+    dropped.
+    """
+    queued_query_param = "queued"
+
+    def is_queued(self):
+        """
+        Tells whether the request asks for queued mode.
+        """
+        return self.request.query_params.get(self.queued_query_param) == "true"
+
+    def queue(self, stats, **data):
+        """
+        Queues validated stats, returning the 202 response.
+        """
+        return Response({"queued": len(stats), **data, "submission": ingest.enqueue(stats)},
+                        status=status.HTTP_202_ACCEPTED)
 
 
 class CustomPagination(PageNumberPagination):
@@ -30,7 +128,167 @@ class CustomPagination(PageNumberPagination):
         )
 
 
-class PlayerListCreate(generics.ListCreateAPIView):
+class KeysetPagination(CursorPagination):
+    """
+    Adds keyset (cursor) pagination to endpoints: pages are fetched by seeking past the last primary key seen instead
+    of using an OFFSET, so deep pages cost the same as the first one. No COUNT(*) is run: the "count" field holds an
+    estimate of the total number of rows, or is left out with `?count=none`.
+    """
+    ordering = "id"
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    count_query_param = "count"
+    count_cache_timeout = 60
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.model = queryset.model
+        self.include_count = request.query_params.get(self.count_query_param) != "none"
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count_estimate(self):
+        """
+        Estimates the number of rows in the paginated table. MySQL keeps an estimate in its table statistics; other
+        databases get an exact count that is cached for `count_cache_timeout` seconds.
+        """
+        table = self.model._meta.db_table
+        if connection.vendor == "mysql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() "
+                    "AND table_name = %s", [table])
+                row = cursor.fetchone()
+            return row[0] if row else None
+        return cache.get_or_set(f"row-count-estimate:{table}", self.model.objects.count, self.count_cache_timeout)
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+        }
+        if self.include_count:
+            response["count"] = self.get_count_estimate()
+        response["results"] = data
+        return Response(response)
+
+
+class PaginationModeMixin:
+    """
+    Lets clients opt into keyset pagination on a list endpoint by adding `?pagination=cursor` (links to other pages
+    carry a `cursor` parameter, which keeps that mode). Otherwise, the view's `pagination_class` is used.
+    """
+    pagination_mode_query_param = "pagination"
+    cursor_pagination_class = KeysetPagination
+
+    def uses_cursor_pagination(self):
+        if self.request is None:
+            return False
+        query_params = self.request.query_params
+        return query_params.get(self.pagination_mode_query_param) == "cursor" or \
+            self.cursor_pagination_class.cursor_query_param in query_params
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator") and self.uses_cursor_pagination():
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+
+class ValuesProjection:
+    """
+    The rows of a queryset projected on some of their fields (see `QuerySet.values`), read once sliced. Unlike the
+    projected queryset, it is counted without the joins of the projection, so pages are counted as fast as before.
+    """
+    def __init__(self, queryset, fields):
+        self.queryset = queryset
+        self.fields = fields
+
+    def count(self):
+        return self.queryset.count()
+
+    def __getitem__(self, key):
+        return self.queryset.values(*self.fields)[key]
+
+
+class RepresentationOptionsMixin:
+    """
+    Reads the shape of the representations of a view's rows: the fields shown ("fields", all by default), and the
+    relations expanded into nested representations ("expand", all by default: with "expand=" none are, and relations
+    are shown as ids). Expanding a relation of a relation (e.g. "game.players") expands its parent too.
+    """
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+
+    def get_query_param_list(self, name, choices):
+        """
+        Obtains a comma-separated list of the given choices from a query parameter, or None if it is missing.
+        """
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        items = [item.strip() for item in value.split(",") if item.strip()]
+        unknown = [item for item in items if item not in choices]
+        if unknown:
+            raise ValidationError({name: f"Unknown: {', '.join(unknown)}. Must be among: {', '.join(choices)}."})
+        return items
+
+    def get_representation_options(self):
+        """
+        Obtains the fields to show and the relations to expand (None for all).
+        """
+        serializer_class = self.get_serializer_class()
+        fields = self.get_query_param_list(self.fields_query_param, serializer_class.representation_fields) or None
+        expand = self.get_query_param_list(self.expand_query_param, serializer_class.expandable)
+        if expand is not None:
+            expand = set(expand) | {path.split(".", 1)[0] for path in expand}
+        return fields, expand
+
+
+class ValuesListMixin(RepresentationOptionsMixin):
+    """
+    Serves GET list requests from `values()` projections: only the columns shown are read, and the serializer's
+    `represent_values` builds the same representations as the serializer from plain dicts, skipping the creation of
+    model instances and the serializer fields (3 times less CPU per page of players, over 15 times less for games
+    and stats). Unexpanded relations and fields left out aren't read at all.
+    """
+    def list(self, request, *args, **kwargs):
+        fields, expand = self.get_representation_options()
+        serializer_class = self.get_serializer_class()
+        values_fields = serializer_class.get_values_fields(fields, expand)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        if self.paginator is None:
+            page = None
+        elif self.uses_cursor_pagination():
+            # Cursor pages don't count rows: the projected queryset is paginated directly.
+            page = self.paginate_queryset(queryset.values(*values_fields))
+        else:
+            page = self.paginate_queryset(ValuesProjection(queryset, values_fields))
+        rows = queryset.values(*values_fields) if page is None else page
+        with metrics.measure_serialization():
+            data = serializer_class.represent_values(rows, fields, expand)
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+
+class ValuesRetrieveMixin(RepresentationOptionsMixin):
+    """
+    Serves GET requests for a single row like `ValuesListMixin` serves lists. Object permissions are checked like
+    `get_object` does, against an instance whose fields are all deferred: they are only read if a permission uses them.
+    """
+    def retrieve(self, request, *args, **kwargs):
+        fields, expand = self.get_representation_options()
+        serializer_class = self.get_serializer_class()
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(queryset.values(*serializer_class.get_values_fields(fields, expand)),
+                                **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        pk_name = queryset.model._meta.pk.attname
+        self.check_object_permissions(request, queryset.model.from_db(queryset.db, [pk_name], [row[pk_name]]))
+        with metrics.measure_serialization():
+            data = serializer_class.represent_values([row], fields, expand)[0]
+        return Response(data)
+
+
+class PlayerListCreate(ConditionalGetMixin, PaginationModeMixin, ValuesListMixin, generics.ListCreateAPIView):
     """
     Allows players to be listed or created.
     TODO: user can only associate a player to themselves. Admins can associate players to any user.
@@ -38,9 +296,10 @@ class PlayerListCreate(generics.ListCreateAPIView):
     queryset = Player.objects.all().order_by("id")
     serializer_class = PlayerSerializer
     pagination_class = CustomPagination
+    collections = ["player"]
 
 
-class PlayerRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class PlayerRetrieveUpdateDestroy(ValuesRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Allows a single player to be viewed, updated or deleted.
     TODO: Only admins or user associated with the player can PUT or PATCH.
@@ -67,20 +326,55 @@ class PlayerRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
         return super().finalize_response(request, response, *args, **kwargs)
 
 
-class GameListCreate(generics.ListCreateAPIView):
+class PlayerSummaryView(generics.RetrieveAPIView):
+    """
+    Allows viewing a player's aggregated stats (total, average and best score, games played and wins), read from the
+    player summaries rollup table.
+    """
+    serializer_class = PlayerSummarySerializer
+
+    def get_object(self):
+        """
+        Obtains the player's summary. Players without stats or games have no summary yet, so an empty one is returned.
+        """
+        summary = PlayerSummary.objects.filter(player_id=self.kwargs["pk"]).first()
+        if summary is None:
+            summary = PlayerSummary(player=get_object_or_404(Player, pk=self.kwargs["pk"]))
+        return summary
+
+
+class PlayerRankView(APIView):
+    """
+    Allows viewing a player's global rank by best score, along with the players just above and below it (see `ranks`).
+    Each request reads at most 33 nodes of the tree of the best scores' counts (see `ranks.get_rank`).
+    """
+    def get(self, request, pk):
+        """
+        Implements GET HTTP method. Players without scores have no rank.
+        """
+        ranking = ranks.get_rank(int(pk))
+        if ranking is None:
+            player = get_object_or_404(Player, pk=pk)
+            ranking = {"player": player.pk, "nickname": player.nickname, "best_score": None, "rank": None,
+                       "players": None, "above": None, "below": None}
+        return Response(ranking)
+
+
+class GameListCreate(ConditionalGetMixin, PaginationModeMixin, ValuesListMixin, generics.ListCreateAPIView):
     """
     Allows games to be listed or created.
     """
-    queryset = Game.objects.all().order_by("id")
+    queryset = GameSerializer.setup_eager_loading(Game.objects.all()).order_by("id")
     serializer_class = GameSerializer
     pagination_class = CustomPagination
+    collections = ["game", "player"]
 
 
-class GameRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class GameRetrieveUpdateDestroy(ValuesRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Allows a single game to be viewed, updated or deleted.
     """
-    queryset = Game.objects.all()
+    queryset = GameSerializer.setup_eager_loading(Game.objects.all())
     serializer_class = GameSerializer
 
     def get_permissions(self):
@@ -102,20 +396,33 @@ class GameRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
         return super().finalize_response(request, response, *args, **kwargs)
 
 
-class StatListCreate(generics.ListCreateAPIView):
+class StatListCreate(QueuedCreationMixin, ConditionalGetMixin, PaginationModeMixin, ValuesListMixin,
+                     generics.ListCreateAPIView):
     """
     Allows stats to be listed or created.
     """
-    queryset = Stat.objects.all().order_by("id")
+    queryset = StatSerializer.setup_eager_loading(Stat.objects.all()).order_by("id")
     serializer_class = StatSerializer
     pagination_class = CustomPagination
+    collections = ["stat", "game", "player"]
+
+    def create(self, request, *args, **kwargs):
+        """
+        Creates the stat, or queues it in queued mode.
+        """
+        if not self.is_queued():
+            return super().create(request, *args, **kwargs)
+        stats, errors = BulkStatSerializer.validate_fields([request.data])
+        if errors[0]:
+            raise ValidationError(errors[0])
+        return self.queue(stats)
 
 
-class StatRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class StatRetrieveUpdateDestroy(ValuesRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Allows a single stat to be viewed, updated or deleted.
     """
-    queryset = Stat.objects.all()
+    queryset = StatSerializer.setup_eager_loading(Stat.objects.all())
     serializer_class = StatSerializer
 
     def get_permissions(self):
@@ -137,45 +444,356 @@ class StatRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
         return super().finalize_response(request, response, *args, **kwargs)
 
 
-class StatRankingView(APIView):
+class StatBulkCreate(QueuedCreationMixin, APIView):
+    """
+    Allows stats to be created in bulk: either a list of stats, or a new game together with its stats (e.g.: {"game":
+    {"players": [1, 2], "winner": 1}, "stats": [{"player": 1, "score": 10}, {"player": 2, "score": 5}]}). Players and
+    games are validated for all the stats at once and the stats are inserted with a single bulk insert, in the same
+    transaction as the game: nothing is created if anything is invalid. In queued mode, the game is created right away
+    and its stats are queued.
+    """
+    max_stats = 1000
+
+    def post(self, request):
+        """
+        Implements POST HTTP method. Returns the number of stats created (or queued) and the id of the game created (if
+        any), or the errors of each stat, in the order given.
+        """
+        game_data = None
+        items = request.data
+        if isinstance(items, dict):
+            game_data, items = items.get("game"), items.get("stats")
+        if not isinstance(items, list):
+            raise ValidationError({"non_field_errors": ["Expected a list of stats, or a game with its stats."]})
+        if len(items) > self.max_stats:
+            raise ValidationError({"stats": [f"Ensure this field has no more than {self.max_stats} elements."]})
+
+        queued = self.is_queued()
+        with transaction.atomic():
+            game = None
+            if game_data is not None:
+                game_serializer = GameSerializer(data=game_data)
+                if not game_serializer.is_valid():
+                    raise ValidationError({"game": game_serializer.errors})
+                game = game_serializer.save()
+                items = [{**item, "game": game.pk} if isinstance(item, dict) else item for item in items]
+
+            if queued:
+                stats, errors = BulkStatSerializer.validate_fields(items)
+            else:
+                stats, errors = BulkStatSerializer.validate_many(items)
+            if any(errors):
+                raise ValidationError({"stats": errors})
+            if not queued:
+                created = ingest.create(stats)
+
+        if queued:
+            return self.queue(stats, game=game.pk if game else None)
+        return Response({"created": len(created), "game": game.pk if game else None}, status=status.HTTP_201_CREATED)
+
+
+class StatQueueView(APIView):
+    """
+    Allows admins to monitor the queue of stats to be created (see `QueuedCreationMixin`).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Implements GET HTTP method.
+        """
+        return Response(ingest.get_metrics())
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """
+    Always selects the view's first parser and renderer, whatever the request accepts.
+    """
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+async def iterate_async(iterator):
+    """
+    Iterates a synchronous iterator (e.g. one reading the database) from async code, item by item, so that ASGI servers
+    can stream it without reading it whole first.
+    """
+    iterator = iter(iterator)
+    end = object()
+    while (item := await sync_to_async(next)(iterator, end)) is not end:
+        yield item
+
+
+class StatExport(APIView):
+    """
+    Allows every stat to be downloaded as a CSV file, optionally filtered by player, game and creation date ("from",
+    included, and "to", excluded, as dates or ISO 8601 date times). Stats are read `chunk_size` at a time, seeking past
+    the last id read, and rows are sent as they are read, so memory use doesn't depend on the number of stats exported.
+    """
+    # Errors are always returned as JSON: only the exported stats are CSV.
+    renderer_classes = [ORJSONRenderer]
+    content_negotiation_class = IgnoreClientContentNegotiation
+    chunk_size = 2000
+    date_format = "%Y-%m-%d %H:%M:%S"
+
+    def parse_date_param(self, param):
+        """
+        Parses a date (as midnight) or date time query parameter, in the current time zone unless one is given.
+        """
+        value = self.request.query_params[param]
+        try:
+            moment = parse_datetime(value)
+            if moment is None and (date := parse_date(value)) is not None:
+                moment = datetime.combine(date, datetime.min.time())
+        except ValueError:
+            moment = None
+        if moment is None:
+            raise ValidationError({param: ["Enter a valid date (YYYY-MM-DD) or date and time (ISO 8601)."]})
+        return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+    def get_queryset(self):
+        """
+        Obtains the stats to export, filtered according to the query parameters.
+        """
+        stats = Stat.objects.all()
+        params = self.request.query_params
+        for param in ["player", "game"]:
+            if param in params:
+                if not params[param].isdigit():
+                    raise ValidationError({param: ["A valid integer is required."]})
+                stats = stats.filter(**{f"{param}_id": int(params[param])})
+        if "from" in params:
+            stats = stats.filter(creation_date__gte=self.parse_date_param("from"))
+        if "to" in params:
+            stats = stats.filter(creation_date__lt=self.parse_date_param("to"))
+        return stats
+
+    def get_rows(self, stats):
+        """
+        Yields the rows of the exported stats, in id order.
+        """
+        rows = stats.order_by("id").values_list("id", "player__nickname", "score", "game_id", "creation_date")
+        last_id = 0
+        while chunk := list(rows.filter(id__gt=last_id)[:self.chunk_size]):
+            for stat_id, nickname, score, game_id, creation_date in chunk:
+                yield stat_id, nickname, score, game_id, creation_date.strftime(self.date_format)
+            last_id = chunk[-1][0]
+
+    def get_content(self, stats):
+        """
+        Yields the CSV file, `chunk_size` lines at a time.
+        """
+        lines = StatExportCSVRenderer().render(self.get_rows(stats))
+        while chunk := list(islice(lines, self.chunk_size)):
+            yield b"".join(chunk)
+
+    def get(self, request):
+        """
+        Implements GET HTTP method.
+        """
+        content = self.get_content(self.get_queryset())
+        if isinstance(request._request, ASGIRequest):
+            content = iterate_async(content)
+        response = StreamingHttpResponse(content, content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="stats.csv"'
+        return response
+
+
+class ColumnarExport(StatExport):
+    """
+    Allows admins to download the players, games or stats table as a Parquet or Arrow IPC file (see `columnar`), e.g.
+    to load it into a notebook. Stats can be filtered like in the CSV export. Files are streamed one record batch of
+    `chunk_size` rows at a time.
+    """
+    permission_classes = [IsAdminUser]
+    chunk_size = columnar.CHUNK_SIZE
+    content_types = {
+        "parquet": "application/vnd.apache.parquet",
+        "arrow": "application/vnd.apache.arrow.file",
+    }
+
+    def get_queryset(self):
+        """
+        Obtains the rows to export: the filtered stats, or every player or game.
+        """
+        if self.kwargs["table"] == "stats":
+            return super().get_queryset()
+        return columnar.TABLES[self.kwargs["table"]][0].objects.all()
+
+    def get(self, request, table, file_format):
+        """
+        Implements GET HTTP method.
+        """
+        content = columnar.stream(table, file_format, self.get_queryset(), self.chunk_size)
+        if isinstance(request._request, ASGIRequest):
+            content = iterate_async(content)
+        response = StreamingHttpResponse(content, content_type=self.content_types[file_format])
+        response["Content-Disposition"] = f'attachment; filename="{table}.{file_format}"'
+        return response
+
+
+class WindowMixin:
     """
-    Allows listing the stats with top 10 scores.
+    Reads the time window (all time, or the current day, week or month) a view's results are computed over.
     """
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer, CustomCSVRenderer]
+    window_query_param = "window"
+
+    def get_window(self):
+        """
+        Obtains the time window from the "window" query parameter: "all" (default), "day", "week" or "month".
+        """
+        # Query parameters are read from GET, which DRF requests proxy, so plain Django views can use it too.
+        window = self.request.GET.get(self.window_query_param, leaderboard.Period.ALL_TIME)
+        if window not in leaderboard.Period.values:
+            raise ValidationError({self.window_query_param: f"Must be one of: {', '.join(leaderboard.Period.values)}."})
+        return window
+
+
+class RankingOptionsMixin(WindowMixin):
+    """
+    Reads the options of a ranking: its time window, its number of positions ("limit", up to the leaderboards'
+    capacity) and whether it lists the best stat of each player ("unique_players=true") rather than the best stats.
+    """
+    limit_query_param = "limit"
+    unique_players_query_param = "unique_players"
+
+    def get_limit(self):
+        """
+        Obtains the number of positions from the "limit" query parameter, 10 by default.
+        """
+        limit = self.request.GET.get(self.limit_query_param, str(leaderboard.LEADERBOARD_SIZE))
+        if not limit.isdigit() or not 1 <= int(limit) <= leaderboard.LEADERBOARD_CAPACITY:
+            raise ValidationError({
+                self.limit_query_param: f"Must be an integer between 1 and {leaderboard.LEADERBOARD_CAPACITY}."})
+        return int(limit)
+
+    def get_unique_players(self):
+        """
+        Tells whether the ranking lists the best stat of each player, from the "unique_players" query parameter.
+        """
+        unique_players = self.request.GET.get(self.unique_players_query_param, "false")
+        if unique_players not in ["true", "false"]:
+            raise ValidationError({self.unique_players_query_param: "Must be true or false."})
+        return unique_players == "true"
+
+    def get_options(self):
+        """
+        Obtains the window, limit and unique players options.
+        """
+        return self.get_window(), self.get_limit(), self.get_unique_players()
+
+
+class StatRankingView(RankingOptionsMixin, APIView):
+    """
+    Allows listing the stats with top scores (10 by default), or the best stat of the players with top scores, of all
+    time or of the current day, week or month.
+    """
+    renderer_classes = [ORJSONRenderer, MessagePackRenderer, TemplateHTMLRenderer, CustomCSVRenderer]
+    # The HTML page's own requests (updates, CSV download) are authenticated by the browser's session.
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
     serializer_class = StatSerializer
+    cache_name = "ranking"
+    cache_timeout = 60 * 60
 
-    def get_top_scores(self):
+    @staticmethod
+    def get_top_scores(window=leaderboard.Period.ALL_TIME, limit=leaderboard.LEADERBOARD_SIZE, unique_players=False):
+        """
+        Obtains the top stats of the given time window according to highest scores, read from the materialized
+        leaderboards, or the best stat of the top players (see `leaderboard.get_top_players`).
         """
-        Obtains the top 10 stats according to highest scores.
+        if unique_players:
+            return [{"player": nickname, "score": score} for nickname, score in leaderboard.get_top_players(limit, window)]
+        return [
+            {"player": entry.player.nickname, "score": entry.score}
+            for entry in leaderboard.get_top_entries(limit, window)
+        ]
+
+    @staticmethod
+    def get_version_names(window, unique_players=False):
         """
-        top_scores = Stat.objects.order_by("-score")[:10]
-        serializer = StatSerializer(top_scores, many=True)
-        data = serializer.data
+        Returns the names of the versions (see `caching`) that change whenever the ranking may have changed. Rankings of
+        players depend on their nicknames, and on the players' best scores (all time) or on every stat (other windows,
+        whose rankings may be read past the leaderboards).
+        """
+        if not unique_players:
+            return [leaderboard.get_version_name(window)]
+        if window == leaderboard.Period.ALL_TIME:
+            return [ranks.VERSION_NAME, "collection:player"]
+        return ["collection:stat", "collection:player"]
+
+    def get_cache_key(self, window, limit, unique_players, versions):
+        """
+        Builds the key of the cached ranking for the given options, versions and the requested format. It includes the
+        window's current bucket, so it changes with the day, week or month too.
+        """
+        return f"{self.cache_name}:{window}:{leaderboard.get_bucket(window)}:{limit}:{int(unique_players)}:" \
+               f"{self.request.accepted_renderer.format}:{'-'.join(map(str, versions))}"
 
-        # Flatten the player data and remove unused game data
-        for item in data:
-            item["player"] = item["player"]["nickname"]
-            item.pop("id", None)
-            item.pop("creation_date", None)
-            item.pop("game", None)
+    def cache_response(self, response, cache_key):
+        """
+        Stores the response's content and headers in the cache once it has been rendered.
+        """
+        def store(rendered_response):
+            headers = {name: value for name, value in rendered_response.items() if name != "X-Cache"}
+            cache.set(cache_key, {"content": rendered_response.content, "headers": headers}, self.cache_timeout)
 
-        return data if data else []
+        if hasattr(response, "add_post_render_callback"):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
 
     def get(self, request):
         """
-        Implements GET HTTP method for html and json requests, as well as serve the csv download feature.
+        Implements GET HTTP method for html and json requests, as well as serve the csv download feature. Rendered
+        rankings are cached, per options and format, until a stat written changes the leaderboards (or the data the
+        ranking is read from, see `get_version_names`). Clients sending the ETag of the current ranking
+        get a 304 (Not Modified) response, checked against the versions without reading the ranking. Rankings read
+        from a replica that may not have caught up with the last writes are neither cached nor given an ETag.
+        """
+        window, limit, unique_players = self.get_options()
+        version_names = self.get_version_names(window, unique_players)
+        versions = caching.get_versions(version_names)
+        cache_key = self.get_cache_key(window, limit, unique_players, versions)
+        etag = quote_etag(get_content_digest(cache_key.encode()))
+        response = get_not_modified_response(request, etag)
+        if response is not None:
+            return response
+
+        cached = cache.get(cache_key)
+        caching.record(self.cache_name, cached is not None)
+        if cached is not None:
+            response = HttpResponse(cached["content"], headers=cached["headers"])
+            response["X-Cache"] = "HIT"
+            return response
+
+        response = self.get_ranking_response(window, limit, unique_players)
+        response["X-Cache"] = "MISS"
+        if caching.is_settled(version_names):
+            set_etag(response, etag)
+            self.cache_response(response, cache_key)
+        return response
+
+    def get_ranking_response(self, window, limit=leaderboard.LEADERBOARD_SIZE, unique_players=False):
+        """
+        Builds the ranking's response in the requested format.
         """
-        top_scores = self.get_top_scores()
+        top_scores = self.get_top_scores(window, limit, unique_players)
 
         # Check if the request accepts HTML content
-        if request.accepted_renderer.format == "html":
-            context = {"ranking_data": top_scores}
-            return render(request, "report.html", context)
+        if self.request.accepted_renderer.format == "html":
+            context = {"ranking_data": top_scores, "window": leaderboard.Period(window), "limit": limit,
+                       "unique_players": unique_players}
+            return render(self.request, "report.html", context)
 
         # CSV export
-        elif request.accepted_renderer.format == "csv":
+        elif self.request.accepted_renderer.format == "csv":
+            filename = "top_players" if unique_players else "top_scores"
+            filename += ".csv" if window == leaderboard.Period.ALL_TIME else f"_{window}.csv"
             response = Response(top_scores, content_type='text/csv')
-            response["Content-Disposition"] = 'attachment; filename="top_scores.csv"'
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
             return response
 
         # Return JSON response for other cases
@@ -183,7 +801,182 @@ class StatRankingView(APIView):
             return Response(top_scores)
 
 
-class UserListCreate(generics.ListCreateAPIView):
+class StatRankingStreamView(RankingOptionsMixin, View):
+    """
+    Streams the ranking, with the same options as StatRankingView, as Server-Sent Events ("ranking" events, whose data
+    is the JSON ranking and whose id is the ranking's ETag). The current ranking is sent when the stream opens, unless
+    the client already has it (per the Last-Event-ID header sent when reconnecting), and then only when it changes: the
+    stream checks the ranking's versions every `poll_interval` seconds, which is a single cache read, and only renders
+    the ranking again (once for every client, through the cache) when they have changed. Rankings read from a replica
+    that may be behind (see `caching.is_settled`) are read again at every poll until they are settled.
+
+    Streams stay open for `max_duration` seconds, after which clients reconnect. Since they hold a connection open,
+    they are only served through ASGI (exercise/asgi.py).
+    """
+    poll_interval = 1
+    keepalive_interval = 15
+    max_duration = 5 * 60
+
+    async def get(self, request):
+        """
+        Implements GET HTTP method. Authenticates like the API (JWT), also accepting the access token as a "token" query
+        parameter, since browsers can't send headers with EventSource, or the browser's session, like the ranking.
+        """
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"detail": "Streaming is only available through ASGI."},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        user = await sync_to_async(self.authenticate)(request)
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."},
+                                status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            options = self.get_options()
+        except ValidationError as e:
+            return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(self.events(*options, request.headers.get("Last-Event-ID")),
+                                         content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Disables response buffering in nginx.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @staticmethod
+    def authenticate(request):
+        """
+        Returns the user authenticated by the request's access token, or by its session, or None.
+        """
+        authentication = JWTAuthentication()
+        try:
+            if "token" in request.GET:
+                return authentication.get_user(authentication.get_validated_token(request.GET["token"]))
+            credentials = authentication.authenticate(request)
+        except AuthenticationFailed:
+            return None
+        if credentials:
+            return credentials[0]
+        return request.user if request.user.is_active else None
+
+    @staticmethod
+    def get_version(window, unique_players=False):
+        """
+        Returns a value that changes whenever the ranking of the window may have changed.
+        """
+        versions = caching.get_versions(StatRankingView.get_version_names(window, unique_players))
+        return leaderboard.get_bucket(window), "-".join(map(str, versions))
+
+    @staticmethod
+    def get_ranking(window, limit, unique_players, version):
+        """
+        Returns the ranking rendered as JSON, rendering it only once per version, and whether it is settled (see
+        `caching.is_settled`). Rankings that aren't, read from a replica that may be behind, aren't cached.
+        """
+        if not caching.is_settled(StatRankingView.get_version_names(window, unique_players)):
+            return ORJSONRenderer().render(StatRankingView.get_top_scores(window, limit, unique_players)), False
+        bucket, version = version
+        return cache.get_or_set(
+            f"{StatRankingView.cache_name}-stream:{window}:{bucket}:{limit}:{int(unique_players)}:{version}",
+            lambda: ORJSONRenderer().render(StatRankingView.get_top_scores(window, limit, unique_players)),
+            StatRankingView.cache_timeout), True
+
+    async def events(self, window, limit=leaderboard.LEADERBOARD_SIZE, unique_players=False, last_event_id=None):
+        """
+        Yields the stream's events until `max_duration` is reached.
+        """
+        started = last_sent = time.monotonic()
+        version = None
+        while time.monotonic() - started < self.max_duration:
+            current_version = await sync_to_async(self.get_version)(window, unique_players)
+            if current_version != version:
+                ranking, settled = await sync_to_async(self.get_ranking)(window, limit, unique_players, current_version)
+                # Rankings that aren't settled are read again at the next poll.
+                if settled:
+                    version = current_version
+                event_id = get_content_digest(ranking)
+                if event_id != last_event_id:
+                    last_event_id = event_id
+                    last_sent = time.monotonic()
+                    yield f"event: ranking\nid: {event_id}\ndata: {ranking.decode()}\n\n"
+            if time.monotonic() - last_sent >= self.keepalive_interval:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+            await asyncio.sleep(self.poll_interval)
+
+
+class RankingCacheStatsView(APIView):
+    """
+    Allows admins to see the hit and miss counters of the ranking cache.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Implements GET HTTP method.
+        """
+        return Response(caching.get_counters(StatRankingView.cache_name))
+
+
+class MetricsView(APIView):
+    """
+    Allows admins (or a Prometheus server authenticated as one) to scrape the request metrics (see `metrics`) in the
+    Prometheus text format.
+    """
+    permission_classes = [IsAdminUser]
+    # Errors are returned as JSON: only the metrics are plain text.
+    renderer_classes = [ORJSONRenderer]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request):
+        """
+        Implements GET HTTP method. The requests observed by this process are flushed first, so they are included.
+        """
+        metrics.flush()
+        return HttpResponse(metrics.export(), content_type=metrics.CONTENT_TYPE)
+
+
+class StatDistributionView(WindowMixin, APIView):
+    """
+    Allows viewing the distribution of the scores of all time or of the current day, week or month: their number,
+    minimum, maximum, mean, standard deviation, percentiles and histogram (see `analytics`). With a "score" query
+    parameter, the percentile rank of that score is included.
+    """
+    def get_int_param(self, param, default=None, min_value=0, max_value=None):
+        """
+        Parses an optional integer query parameter, within the given bounds.
+        """
+        value = self.request.query_params.get(param)
+        if value is None:
+            return default
+        if not value.isdigit() or int(value) < min_value or (max_value is not None and int(value) > max_value):
+            bounds = f"between {min_value} and {max_value}" if max_value is not None else f"at least {min_value}"
+            raise ValidationError({param: [f"Must be an integer {bounds}."]})
+        return int(value)
+
+    def get(self, request):
+        """
+        Implements GET HTTP method.
+        """
+        bins = self.get_int_param("bins", analytics.HISTOGRAM_BINS, 1, analytics.MAX_HISTOGRAM_BINS)
+        score = self.get_int_param("score")
+        return Response(analytics.get_distribution(self.get_window(), bins, score))
+
+
+class PlayerPercentileView(WindowMixin, APIView):
+    """
+    Allows viewing how a player's scores of all time or of the current day, week or month compare to everyone's: the
+    number, mean, standard deviation and best of its scores, and the percentile ranks of its best score and of its mean
+    (see `analytics`).
+    """
+    def get(self, request, pk):
+        """
+        Implements GET HTTP method.
+        """
+        window = self.get_window()
+        player = get_object_or_404(Player, pk=pk)
+        return Response(analytics.get_player_percentiles(player.pk, window))
+
+
+class UserListCreate(PaginationModeMixin, generics.ListCreateAPIView):
     """
     Allows users to be listed or created.
     """